@@ -4,43 +4,49 @@
 import os
 import sys
 import json
+import argparse
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import logging
-import watchtower
 from datetime import datetime
-from collections import defaultdict
+from pathlib import Path
 
 # === PATH DEL PROYECTO ===
 sys.path.append("/home/ubuntu/tr")
 BASE_DIR = "/home/ubuntu/tr"
-from my_modules.email_sender import enviar_email
+from my_modules.email_sender import ENVIADOS, encolar_alerta, estado_mensaje, iniciar_cartero
+from my_modules.historico import load_history
+from my_modules.logs_async import configurar, salida_archivo, salida_cloudwatch
+from my_modules.senales import BUY, HOLD, SELL, SENALES_PATH, fechas_disponibles, leer_senales
+from my_modules.ultimas_barras import ULTIMAS_PATH, UltimasBarras
 
 # === RUTAS ===
 SENALES_DIR = f"{BASE_DIR}/reports/senales_heuristicas/diarias"
-HISTORIC_DIR = f"{BASE_DIR}/data/historic"
 LOG_DIR = f"{BASE_DIR}/logs/alerts"
 SUMMARY_PATH = f"{BASE_DIR}/reports/summary/system_status.json"
 DESTINATARIO = os.getenv("EMAIL_TRADING")
 LOG_GROUP = "EC2AlertasSenales"
 fecha_hoy = datetime.utcnow().strftime("%Y-%m-%d")
+COLUMNAS_SENAL = ["fecha", "simbolo", "estrategia", "signal"]
+COLUMNAS_TABLA = ["Simbolo", "Cierre", "Estrategias BUY", "Estrategias SELL"]
 
 # === LOGGING ===
-os.makedirs(LOG_DIR, exist_ok=True)
-log_file = os.path.join(LOG_DIR, f"alertas_{fecha_hoy}.csv")
-log_persistente = os.path.join(LOG_DIR, "alertas.log")
-
+# Sin handlers al importar: main() (o quien use el modulo) llama a configurar_logger()
 logger = logging.getLogger("AlertasSenales")
 logger.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s,alertas,%(levelname)s,%(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-
-for handler_path in [log_file, log_persistente]:
-    fh = logging.FileHandler(handler_path)
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
 
-cw_handler = watchtower.CloudWatchLogHandler(log_group=LOG_GROUP)
-cw_handler.setFormatter(formatter)
-logger.addHandler(cw_handler)
+def configurar_logger(fecha=fecha_hoy):
+    # Archivos y CloudWatch por lotes desde un hilo (my_modules/logs_async.py)
+    columnas = ["ts", "modulo", "nivel", "mensaje"]
+    return configurar("AlertasSenales", [
+        salida_archivo(os.path.join(LOG_DIR, f"alertas_{fecha}.csv"), columnas=columnas),
+        salida_archivo(os.path.join(LOG_DIR, "alertas.log"), columnas=columnas),
+        salida_cloudwatch(LOG_GROUP, columnas=columnas),
+    ], campos_fijos={"modulo": "alertas"})
 
 # === FUNCION DE ESTADO ===
 def guardar_estado(modulo, status, mensaje):
@@ -58,65 +64,115 @@ def guardar_estado(modulo, status, mensaje):
     with open(SUMMARY_PATH, "w") as f:
         json.dump(status_obj, f, indent=2)
 
-# === PROCESAR Y AGRUPAR SENALES ===
-senales_dict = defaultdict(lambda: {"buy": [], "sell": [], "close": "N/D"})
+# === LECTURA DE SENALES ===
+def fecha_procesada(ultimas=None):
+    # Fecha de la ultima barra consolidada por upd.py (indice de ultimas barras); sin indice, hoy
+    if ultimas is not None and len(ultimas.fechas):
+        return str(ultimas.fechas.max())
+    return fecha_hoy
 
-for archivo in os.listdir(SENALES_DIR):
-    if not archivo.endswith(".csv"):
-        continue
-    try:
-        ruta = os.path.join(SENALES_DIR, archivo)
-        df = pd.read_csv(ruta)
-
-        if "fecha" in df.columns and "signal" in df.columns:
-            df["fecha"] = pd.to_datetime(df["fecha"]).dt.date
-            fila = df[df["fecha"] == df["fecha"].max()]
-            if fila.empty:
-                continue
-            for _, row in fila.iterrows():
-                signal = row["signal"].lower()
-                if signal not in ["buy", "sell"]:
-                    continue
-
-                symbol = row.get("simbolo", "UNKNOWN")
-                estrategia = row.get("estrategia", "N/A")
-                fecha = row["fecha"]
-
-                if senales_dict[symbol]["close"] == "N/D":
-                    ruta_hist = os.path.join(HISTORIC_DIR, f"{symbol}.parquet")
-                    if os.path.exists(ruta_hist):
-                        df_hist = pd.read_parquet(ruta_hist)
-                        if "fecha" in df_hist.columns:
-                            df_hist["fecha"] = pd.to_datetime(df_hist["fecha"]).dt.date
-                            match = df_hist[df_hist["fecha"] == fecha]
-                            if not match.empty and "close" in match.columns:
-                                senales_dict[symbol]["close"] = round(match["close"].iloc[-1], 2)
-
-                senales_dict[symbol][signal].append(estrategia)
-
-    except Exception as e:
-        logger.error(f"Error procesando {archivo}: {str(e)}")
-
-# === FORMAR TABLA FINAL AGRUPADA ===
-if senales_dict:
-    df_final = pd.DataFrame([
-        {
-            "Simbolo": simbolo,
-            "Cierre": data["close"],
-            "Estrategias BUY": ", ".join(sorted(set(data["buy"]))),
-            "Estrategias SELL": ", ".join(sorted(set(data["sell"])))
-        }
-        for simbolo, data in sorted(senales_dict.items())
-        if data["buy"] or data["sell"]
-    ])
-
-    if not df_final.empty:
-        conteo_total = df_final["Estrategias BUY"].apply(lambda x: len(x.split(",")) if x else 0).sum(), \
-                       df_final["Estrategias SELL"].apply(lambda x: len(x.split(",")) if x else 0).sum()
-        logger.info(f"Resumen de señales enviadas: BUY: {conteo_total[0]}, SELL: {conteo_total[1]}")
-
-        tabla = df_final.to_html(index=False, border=0, justify="center", classes="tabla")
-        html = f"""<html>
+def leer_dataset_dia(fecha=None, base=SENALES_PATH, ultimas=None):
+    # Dataset Parquet de shu_cro.py (--formato parquet): solo se abre la particion de la fecha
+    fechas = fechas_disponibles(base)
+    if not fechas:
+        return None, None
+    # El dataset solo guarda filas BUY/SELL: un dia sin señales no tiene particion y
+    # la ultima existente es de otro dia, asi que por defecto se usa la de las barras procesadas
+    fecha = str(fecha or fecha_procesada(ultimas))[:10]
+    if fecha not in fechas:
+        return fecha, pd.DataFrame(columns=["simbolo", "estrategia", "signal"])
+    df = leer_senales(base, fecha=fecha, decodificar_signal=False)
+    df = df[df["signal"] != HOLD]
+    return fecha, pd.DataFrame({
+        "simbolo": df["simbolo"].astype(str).to_numpy(),
+        "estrategia": df["estrategia"].astype(str).to_numpy(),
+        "signal": df["signal"].to_numpy(),
+    })
+
+def leer_csv_dia(fecha=None, senales_dir=SENALES_DIR):
+    """
+    CSV por simbolo (fecha, signal, estrategia, simbolo): un unico escaneo de todos
+    los archivos leyendo solo esas columnas. De cada bloque se guardan solo las
+    filas BUY/SELL (de la fecha pedida si se conoce). Sin fecha se usa la ultima
+    presente en los archivos, con o sin señales.
+    """
+    archivos = sorted(str(p) for p in Path(senales_dir).glob("*.csv"))
+    if not archivos:
+        return None, None
+    # Esquema explicito: se ignoran columnas extra y las ausentes llegan como null
+    esquema = pa.schema([(c, pa.string()) for c in COLUMNAS_SENAL])
+    formato = ds.CsvFileFormat(convert_options=pacsv.ConvertOptions(column_types={c: pa.string() for c in COLUMNAS_SENAL}))
+    dataset = ds.dataset(archivos, schema=esquema, format=formato)
+
+    fecha = str(fecha)[:10] if fecha else None
+    ultima, bloques = None, []
+    activas = pa.array(["buy", "sell"])
+    for bloque in dataset.to_batches(columns=COLUMNAS_SENAL):
+        # fecha como texto AAAA-MM-DD (o con hora): se compara por los 10 primeros caracteres
+        dias = pc.utf8_slice_codeunits(bloque.column("fecha"), 0, 10)
+        if fecha is None:
+            maximo = pc.max(dias).as_py()
+            ultima = maximo if ultima is None or (maximo is not None and maximo > ultima) else ultima
+        mascara = pc.is_in(pc.utf8_lower(bloque.column("signal")), value_set=activas)
+        if fecha is not None:
+            mascara = pc.and_(mascara, pc.equal(dias, fecha))
+        bloques.append(pa.record_batch([dias] + bloque.columns[1:], schema=esquema).filter(mascara))
+
+    fecha = fecha or ultima
+    if fecha is None:
+        return None, None
+    tabla = pa.Table.from_batches(bloques, schema=esquema)
+    tabla = tabla.filter(pc.equal(tabla.column("fecha"), fecha))
+    signal = pc.utf8_lower(tabla.column("signal")).to_numpy(zero_copy_only=False)
+    return fecha, pd.DataFrame({
+        "simbolo": tabla.column("simbolo").fill_null("UNKNOWN").to_numpy(zero_copy_only=False),
+        "estrategia": tabla.column("estrategia").fill_null("N/A").to_numpy(zero_copy_only=False),
+        "signal": np.where(signal == "buy", BUY, SELL).astype(np.int8),
+    })
+
+def leer_senales_dia(fecha=None, ultimas=None):
+    # El dataset Parquet tiene prioridad; si no existe se usan los CSV por simbolo
+    fecha_dataset, df = leer_dataset_dia(fecha, ultimas=ultimas)
+    if df is not None:
+        return fecha_dataset, df
+    return leer_csv_dia(fecha)
+
+# === AGREGACION ===
+def cierres(simbolos, fecha, ultimas=None):
+    # Indice de ultimas barras de upd.py; fuera del indice, la particion del año de la señal
+    valores = []
+    for simbolo in simbolos:
+        cierre = ultimas.cierre(simbolo, fecha) if ultimas is not None else None
+        if cierre is None:
+            match = load_history(simbolo, start=fecha, end=fecha, columns=["close"])
+            if not match.empty and "close" in match.columns:
+                cierre = match["close"].iloc[-1]
+        valores.append("N/D" if cierre is None else round(cierre, 2))
+    return valores
+
+def agrupar(df, fecha, ultimas=None):
+    """
+    Tabla por simbolo (Simbolo, Cierre, Estrategias BUY, Estrategias SELL) y conteo
+    de estrategias por señal, desde las filas BUY/SELL de un dia.
+    """
+    unicas = df.drop_duplicates(["simbolo", "signal", "estrategia"]).sort_values(["simbolo", "estrategia"])
+    conteo = {"BUY": int((unicas["signal"] == BUY).sum()), "SELL": int((unicas["signal"] == SELL).sum())}
+    if unicas.empty:
+        return pd.DataFrame(columns=COLUMNAS_TABLA), conteo
+
+    listas = unicas.groupby(["simbolo", "signal"], sort=True)["estrategia"].agg(", ".join).unstack("signal")
+    df_final = pd.DataFrame({
+        "Simbolo": listas.index.to_numpy(),
+        "Cierre": cierres(listas.index, fecha, ultimas),
+        "Estrategias BUY": listas.get(BUY, pd.Series(index=listas.index, dtype=object)).fillna("").to_numpy(),
+        "Estrategias SELL": listas.get(SELL, pd.Series(index=listas.index, dtype=object)).fillna("").to_numpy(),
+    })
+    return df_final, conteo
+
+# === CORREO ===
+def generar_html(df_final, fecha=fecha_hoy):
+    tabla = df_final.to_html(index=False, border=0, justify="center", classes="tabla")
+    return f"""<html>
 <head>
 <style>
 .tabla {{
@@ -137,26 +193,82 @@ if senales_dict:
 </style>
 </head>
 <body>
-<h3 style="font-family:Arial;">{df_final.shape[0]} símbolos con señales heurísticas BUY/SELL ({fecha_hoy})</h3>
+<h3 style="font-family:Arial;">{df_final.shape[0]} símbolos con señales heurísticas BUY/SELL ({fecha})</h3>
 {tabla}
 </body>
 </html>
 """
-        asunto = f"Senales heuristicas del dia - {fecha_hoy}"
-        if DESTINATARIO:
-            exito = enviar_email(asunto=asunto, cuerpo=html, destinatario=DESTINATARIO, html=True)
-            if exito is True:
-                logger.info("Correo enviado exitosamente.")
-                guardar_estado("alertas", "OK", f"{df_final.shape[0]} simbolos enviados")
-            else:
-                logger.error(f"Fallo el envio del correo: {exito}")
-                guardar_estado("alertas", "ERROR", "Fallo envio de correo")
-        else:
-            logger.error("EMAIL_TRADING no esta definido.")
-            guardar_estado("alertas", "ERROR", "EMAIL_TRADING no definido")
-    else:
-        logger.info("No se encontraron señales BUY/SELL.")
-        guardar_estado("alertas", "OK", "0 senales agrupadas")
-else:
-    logger.info("No se encontraron señales heuristicas.")
-    guardar_estado("alertas", "OK", "0 senales encontradas")
+
+def enviar_alertas(df_final, fecha=fecha_hoy):
+    # Deja el correo en la bandeja de salida (my_modules/email_sender.py); lo envia el cartero
+    asunto = f"Senales heuristicas del dia - {fecha}"
+    if not DESTINATARIO:
+        logger.error("EMAIL_TRADING no esta definido.")
+        guardar_estado("alertas", "ERROR", "EMAIL_TRADING no definido")
+        return None
+    archivo = encolar_alerta(asunto, generar_html(df_final, fecha), destinatario=DESTINATARIO,
+                             grupo="senales", html=True)
+    logger.info("Correo encolado en la bandeja de salida.")
+    return archivo
+
+def confirmar_envio(archivo, n_simbolos):
+    if estado_mensaje(archivo) == ENVIADOS:
+        logger.info("Correo enviado exitosamente.")
+        guardar_estado("alertas", "OK", f"{n_simbolos} simbolos enviados")
+        return True
+    # Sigue en la bandeja: el cartero lo reintenta con espera exponencial
+    logger.error(f"Fallo el envio del correo: {estado_mensaje(archivo)}")
+    guardar_estado("alertas", "ERROR", "Fallo envio de correo")
+    return False
+
+# === PIPELINE ===
+def generar_alertas(fecha=None):
+    """
+    Lectura del dia + agregacion. Devuelve (fecha de las señales, tabla, conteo);
+    tabla es None si no hay señales. No envia nada: sirve para pruebas y benchmarks.
+    """
+    ultimas = UltimasBarras() if ULTIMAS_PATH.exists() else None
+    fecha, df = leer_senales_dia(fecha, ultimas)
+    if df is None or df.empty:
+        return fecha, None, {"BUY": 0, "SELL": 0}
+    df_final, conteo = agrupar(df, fecha, ultimas)
+    return fecha, df_final, conteo
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Alertas diarias de señales heuristicas")
+    parser.add_argument("--fecha", default=None, help="fecha de las señales (por defecto la de las ultimas barras)")
+    parser.add_argument("--no-enviar", action="store_true", help="muestra la tabla sin enviar correo")
+    args = parser.parse_args()
+
+    configurar_logger()
+    # Cartero en segundo plano: envia lo que otros jobs dejaron en la bandeja mientras se
+    # leen las señales; al detenerlo hace una ultima pasada con el correo de este job
+    cartero = None if args.no_enviar else iniciar_cartero()
+    archivo = None
+    try:
+        try:
+            fecha, df_final, conteo = generar_alertas(args.fecha)
+        except Exception as e:
+            logger.error(f"Error procesando senales: {e}")
+            guardar_estado("alertas", "ERROR", "Error leyendo senales")
+            return
+
+        if df_final is None:
+            logger.info("No se encontraron señales heuristicas.")
+            guardar_estado("alertas", "OK", "0 senales encontradas")
+            return
+
+        logger.info(f"Resumen de señales enviadas: BUY: {conteo['BUY']}, SELL: {conteo['SELL']}")
+        if args.no_enviar:
+            print(df_final.to_string(index=False))
+            return
+        archivo = enviar_alertas(df_final, fecha)
+    finally:
+        if cartero is not None:
+            cartero.detener()
+    if archivo is not None:
+        confirmar_envio(archivo, df_final.shape[0])
+
+if __name__ == "__main__":
+    main()
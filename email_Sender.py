@@ -1,7 +1,40 @@
 # /home/ubuntu/tr/my_modules/email_sender.py
+"""
+Envio de correos por SES con cliente cacheado, cuota diaria compartida entre
+procesos y bandeja de salida persistente.
 
-import boto3
+- enviar_email(): envio directo. Usa un unico cliente SES por proceso y descuenta
+  de la cuota diaria en disco (MAX_EMAILS_PER_DAY entre todos los jobs).
+- encolar_alerta(): los jobs (alc_v1.py) dejan la alerta como un JSON en la
+  bandeja (data/outbox/pendientes) y siguen; no hay red ni espera.
+- Cartero: agrupa las alertas pendientes por destinatario y grupo en un solo
+  correo (digest) y las envia con reintentos y espera exponencial. Corre como hilo
+  en un proceso (iniciar_cartero) o como job (python -m my_modules.email_sender --cartero).
+
+Cada bandeja lleva su cuota (<bandeja>/cuota.json): una bandeja de pruebas no
+descuenta de la de produccion.
+
+Con EMAIL_SINK=archivo los correos se escriben en data/outbox/enviados_local en
+vez de ir a SES (pruebas).
+
+Uso:
+    encolar_alerta("upd: 3 simbolos con error", texto, grupo="ingesta")
+    python -m my_modules.email_sender --vaciar      # una pasada del cartero
+    python -m my_modules.email_sender --cuota
+"""
+
+import argparse
+import fcntl
+import html as html_lib
+import json
 import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import boto3
 import logging
 from my_modules.config import MAX_EMAILS_PER_DAY, SES_PROFILE_NAME, LOCAL_LOG_PATH
 
@@ -10,44 +43,359 @@ SENDER_EMAIL = os.getenv("EMAIL_TRADING")
 if not SENDER_EMAIL:
     raise ValueError("La variable de entorno EMAIL_TRADING no está definida.")
 
-def enviar_email(asunto, cuerpo, destinatario, adjuntos=None, html=False):
-    session = boto3.Session(profile_name=SES_PROFILE_NAME)
-    ses = session.client("ses", region_name="eu-central-1")
+# === CONFIGURACION ===
+REGION = "eu-central-1"
+OUTBOX_DIR = Path("/home/ubuntu/tr/data/outbox")
+CUOTA_NOMBRE = "cuota.json"
+EMAIL_SINK = os.getenv("EMAIL_SINK", "ses")   # "ses" o "archivo"
+INTERVALO_CARTERO = 30      # segundos entre pasadas del cartero en segundo plano
+MAX_INTENTOS = 5
+BACKOFF_BASE = 30           # segundos; se dobla en cada intento
+BACKOFF_MAX = 3600
+RECLAMO_CADUCADO = 3600     # un mensaje reclamado por un proceso que murio vuelve a pendientes
 
-    if html:
-        body = {"Html": {"Data": cuerpo}}
-    else:
-        body = {"Text": {"Data": cuerpo}}
+PENDIENTES = "pendientes"
+PROCESANDO = "procesando"
+ENVIADOS = "enviados"
+FALLIDOS = "fallidos"
+ENVIADOS_LOCAL = "enviados_local"
 
-    msg = {
-        "Subject": {"Data": asunto},
-        "Body": body
-    }
+# === CLIENTE SES ===
+_ses = None
+_ses_lock = threading.Lock()
+
+def cliente_ses():
+    # Un cliente por proceso: crear la Session y el cliente cuesta mas que el envio
+    global _ses
+    if _ses is None:
+        with _ses_lock:
+            if _ses is None:
+                _ses = boto3.Session(profile_name=SES_PROFILE_NAME).client("ses", region_name=REGION)
+    return _ses
+
+def _tras_fork():
+    global _ses, _ses_lock, _cartero
+    _ses, _ses_lock, _cartero = None, threading.Lock(), None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+# === SALIDAS ===
+def _enviar_ses(asunto, cuerpo, destinatario, html=False):
+    body = {"Html": {"Data": cuerpo}} if html else {"Text": {"Data": cuerpo}}
+    response = cliente_ses().send_email(
+        Source=SENDER_EMAIL,
+        Destination={"ToAddresses": [destinatario]},
+        Message={"Subject": {"Data": asunto}, "Body": body}
+    )
+    return response["MessageId"]
+
+def _enviar_archivo(asunto, cuerpo, destinatario, html=False, base=None):
+    directorio = Path(base or OUTBOX_DIR) / ENVIADOS_LOCAL
+    directorio.mkdir(parents=True, exist_ok=True)
+    mensaje_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    with open(directorio / f"{mensaje_id}.{'html' if html else 'txt'}", "w") as f:
+        f.write(f"To: {destinatario}\nSubject: {asunto}\n\n{cuerpo}")
+    return mensaje_id
+
+def _salida(asunto, cuerpo, destinatario, html=False, base=None):
+    if EMAIL_SINK == "archivo":
+        return _enviar_archivo(asunto, cuerpo, destinatario, html, base)
+    return _enviar_ses(asunto, cuerpo, destinatario, html)
+
+# === CUOTA DIARIA ===
+def _hoy():
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+class _Bloqueo:
+    # flock exclusivo sobre un archivo auxiliar: valido entre procesos
+    def __init__(self, path):
+        self.path = Path(str(path) + ".lock")
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a")
+        fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
 
+def _cuota_path(base=None):
+    return Path(base or OUTBOX_DIR) / CUOTA_NOMBRE
+
+def _leer_cuota(path):
     try:
-        response = ses.send_email(
-            Source=SENDER_EMAIL,
-            Destination={"ToAddresses": [destinatario]},
-            Message=msg
-        )
-        logging.info(f"Email enviado exitosamente: {response['MessageId']}")
+        with open(path) as f:
+            cuota = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cuota = {}
+    if cuota.get("fecha") != _hoy():
+        cuota = {"fecha": _hoy(), "enviados": 0}
+    return cuota
+
+def reservar_cuota(n=1, base=None, maximo=None):
+    """
+    Descuenta n envios de la cuota del dia de la bandeja `base` si caben.
+    Devuelve True si se reservaron.
+    """
+    maximo = MAX_EMAILS_PER_DAY if maximo is None else maximo
+    path = _cuota_path(base)
+    with _Bloqueo(path):
+        cuota = _leer_cuota(path)
+        if cuota["enviados"] + n > maximo:
+            return False
+        cuota["enviados"] += n
+        tmp = Path(f"{path}.tmp{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(cuota, f)
+        os.replace(tmp, path)
+        return True
+
+def liberar_cuota(n=1, base=None):
+    # Devuelve envios reservados que al final no salieron
+    path = _cuota_path(base)
+    with _Bloqueo(path):
+        cuota = _leer_cuota(path)
+        cuota["enviados"] = max(0, cuota["enviados"] - n)
+        tmp = Path(f"{path}.tmp{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(cuota, f)
+        os.replace(tmp, path)
+
+def cuota_restante(base=None):
+    path = _cuota_path(base)
+    with _Bloqueo(path):
+        return max(0, MAX_EMAILS_PER_DAY - _leer_cuota(path)["enviados"])
+
+def puede_enviar_mas_emails(contador_actual=None):
+    # La cuota persistente manda; contador_actual se mantiene por compatibilidad
+    if contador_actual is not None and contador_actual >= MAX_EMAILS_PER_DAY:
+        return False
+    return cuota_restante() > 0
+
+# === ENVIO DIRECTO ===
+def enviar_email(asunto, cuerpo, destinatario, adjuntos=None, html=False):
+    if not reservar_cuota():
+        logging.error("Cuota diaria de emails agotada: no se envia")
+        return False
+    try:
+        mensaje_id = _salida(asunto, cuerpo, destinatario, html)
+        logging.info(f"Email enviado exitosamente: {mensaje_id}")
         return True
     except Exception as e:
+        liberar_cuota()
         logging.error(f"Error al enviar email: {str(e)}")
         return False
 
-def puede_enviar_mas_emails(contador_actual):
-    return contador_actual < MAX_EMAILS_PER_DAY
+# === BANDEJA DE SALIDA ===
+def _directorio(nombre, base=None):
+    directorio = Path(base or OUTBOX_DIR) / nombre
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
 
-if __name__ == "__main__":
-    log_path = os.path.join(LOCAL_LOG_PATH, "email_sender.log")
+def _escribir_json(datos, destino):
+    tmp = destino.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(tmp, destino)
+
+def encolar_alerta(asunto, cuerpo, destinatario=None, grupo="alertas", html=False, base=None):
+    """
+    Deja la alerta en la bandeja y vuelve (un archivo, sin red). El cartero la
+    envia junto con las demas del mismo destinatario y grupo.
+    """
+    mensaje = {
+        "id": f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}",
+        "creado": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "asunto": asunto,
+        "cuerpo": cuerpo,
+        "html": html,
+        "destinatario": destinatario or SENDER_EMAIL,
+        "grupo": grupo,
+        "intentos": 0,
+        "proximo": 0,
+    }
+    destino = _directorio(PENDIENTES, base) / f"{mensaje['id']}.json"
+    _escribir_json(mensaje, destino)
+    return destino
+
+def estado_mensaje(archivo, base=None):
+    # Carpeta en la que esta ahora un mensaje encolado (None si no se encuentra)
+    nombre = Path(archivo).name
+    for estado in (ENVIADOS, FALLIDOS, PROCESANDO, PENDIENTES):
+        if (Path(base or OUTBOX_DIR) / estado / nombre).exists():
+            return estado
+    return None
+
+def _reclamar(base=None):
+    """
+    Mueve a procesando/ los pendientes cuyo reintento ya toca. El rename es atomico:
+    si dos carteros compiten, cada mensaje lo reclama solo uno.
+    """
+    pendientes, procesando = _directorio(PENDIENTES, base), _directorio(PROCESANDO, base)
+    ahora = time.time()
+    # Reclamos de procesos que murieron a mitad de envio
+    for archivo in procesando.glob("*.json"):
+        if ahora - archivo.stat().st_mtime > RECLAMO_CADUCADO:
+            os.replace(archivo, pendientes / archivo.name)
+
+    reclamados = []
+    for archivo in sorted(pendientes.glob("*.json")):
+        try:
+            with open(archivo) as f:
+                mensaje = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        if mensaje.get("proximo", 0) > ahora:
+            continue
+        destino = procesando / archivo.name
+        try:
+            os.rename(archivo, destino)
+        except FileNotFoundError:
+            continue   # lo reclamo otro cartero
+        os.utime(destino)
+        reclamados.append((destino, mensaje))
+    return reclamados
+
+def construir_digest(mensajes):
+    # Un correo con todas las alertas de un destinatario y grupo, en orden de llegada
+    if len(mensajes) == 1:
+        m = mensajes[0]
+        return m["asunto"], m["cuerpo"], m["html"]
+    grupo = mensajes[0]["grupo"]
+    asunto = f"[{grupo}] {len(mensajes)} alertas - {_hoy()}"
+    if any(m["html"] for m in mensajes):
+        secciones = [f"<h3 style=\"font-family:Arial;\">{html_lib.escape(m['asunto'])} ({m['creado']})</h3>\n"
+                     + (m["cuerpo"] if m["html"] else f"<pre>{html_lib.escape(m['cuerpo'])}</pre>")
+                     for m in mensajes]
+        return asunto, "<html><body>\n" + "\n<hr>\n".join(secciones) + "\n</body></html>", True
+    secciones = [f"=== {m['asunto']} ({m['creado']}) ===\n{m['cuerpo']}" for m in mensajes]
+    return asunto, "\n\n".join(secciones), False
+
+def _reprogramar(archivos, mensajes, error, base=None):
+    # Vuelven a pendientes con espera exponencial; tras MAX_INTENTOS pasan a fallidos/
+    for archivo, mensaje in zip(archivos, mensajes):
+        mensaje["intentos"] += 1
+        mensaje["error"] = str(error)
+        if mensaje["intentos"] >= MAX_INTENTOS:
+            _escribir_json(mensaje, _directorio(FALLIDOS, base) / archivo.name)
+        else:
+            espera = min(BACKOFF_BASE * 2 ** (mensaje["intentos"] - 1), BACKOFF_MAX)
+            mensaje["proximo"] = time.time() + espera
+            _escribir_json(mensaje, _directorio(PENDIENTES, base) / archivo.name)
+        archivo.unlink(missing_ok=True)
+
+def _devolver(archivos, base=None):
+    # Sin cuota: vuelven a pendientes tal cual (se enviaran cuando haya cuota)
+    for archivo in archivos:
+        os.replace(archivo, _directorio(PENDIENTES, base) / archivo.name)
+
+def procesar_bandeja(base=None, enviar=None):
+    """
+    Una pasada del cartero: reclama, agrupa en digests y envia con la cuota de la
+    bandeja. Devuelve un dict con digests enviados, mensajes incluidos, reintentos
+    y sin cuota.
+    """
+    enviar = enviar or (lambda asunto, cuerpo, destinatario, html: _salida(asunto, cuerpo, destinatario, html, base))
+    resumen = {"digests": 0, "mensajes": 0, "reintentos": 0, "sin_cuota": 0}
+    grupos = {}
+    for archivo, mensaje in _reclamar(base):
+        grupos.setdefault((mensaje["destinatario"], mensaje["grupo"]), []).append((archivo, mensaje))
+
+    for (destinatario, _), items in sorted(grupos.items()):
+        archivos = [a for a, _ in items]
+        mensajes = [m for _, m in items]
+        if not reservar_cuota(base=base):
+            _devolver(archivos, base)
+            resumen["sin_cuota"] += len(mensajes)
+            continue
+        asunto, cuerpo, es_html = construir_digest(mensajes)
+        try:
+            mensaje_id = enviar(asunto, cuerpo, destinatario, es_html)
+        except Exception as e:
+            liberar_cuota(base=base)
+            _reprogramar(archivos, mensajes, e, base)
+            resumen["reintentos"] += len(mensajes)
+            logging.error(f"Error al enviar digest a {destinatario}: {e}")
+            continue
+        enviados = _directorio(ENVIADOS, base)
+        for archivo, mensaje in zip(archivos, mensajes):
+            mensaje["enviado"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            mensaje["mensaje_id"] = mensaje_id
+            _escribir_json(mensaje, enviados / archivo.name)
+            archivo.unlink(missing_ok=True)
+        resumen["digests"] += 1
+        resumen["mensajes"] += len(mensajes)
+        logging.info(f"Digest enviado a {destinatario}: {len(mensajes)} alertas ({mensaje_id})")
+    return resumen
+
+# === CARTERO EN SEGUNDO PLANO ===
+class Cartero:
+    def __init__(self, intervalo=INTERVALO_CARTERO, base=None):
+        self.intervalo = intervalo
+        self.base = base
+        self._parar = threading.Event()
+        self.hilo = threading.Thread(target=self._bucle, name="cartero", daemon=True)
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            try:
+                procesar_bandeja(self.base)
+            except Exception as e:
+                logging.error(f"Cartero: {e}")
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self):
+        self.hilo.start()
+        return self
+
+    def detener(self, ultima_pasada=True):
+        # Con ultima_pasada, lo encolado hasta ahora sale antes de volver; devuelve su resumen
+        self._parar.set()
+        if self.hilo.is_alive():
+            self.hilo.join()
+        if ultima_pasada:
+            return procesar_bandeja(self.base)
+        return None
+
+_cartero = None
+
+def iniciar_cartero(intervalo=INTERVALO_CARTERO, base=None):
+    # Un cartero por proceso (uno nuevo si el anterior ya se detuvo)
+    global _cartero
+    if _cartero is None or not _cartero.hilo.is_alive():
+        _cartero = Cartero(intervalo, base).iniciar()
+    return _cartero
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Bandeja de salida de correos")
+    parser.add_argument("--cartero", action="store_true", help="envia la bandeja en bucle")
+    parser.add_argument("--vaciar", action="store_true", help="una pasada de envio")
+    parser.add_argument("--cuota", action="store_true", help="muestra la cuota restante del dia")
+    args = parser.parse_args()
 
     logging.basicConfig(
-        filename=log_path,
+        filename=os.path.join(LOCAL_LOG_PATH, "email_sender.log"),
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S"
     )
+    logging.info(f"Remitente configurado: {SENDER_EMAIL} - salida: {EMAIL_SINK}")
+
+    if args.cuota:
+        print(f"{cuota_restante()} de {MAX_EMAILS_PER_DAY} emails disponibles hoy")
+    if args.vaciar:
+        print(procesar_bandeja())
+    if args.cartero:
+        cartero = Cartero().iniciar()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            cartero.detener()
 
-    logging.info(f"Test de envío activado con símbolos: {SYMBOLS}")
-    logging.info(f"Remitente configurado: {SENDER_EMAIL}")
+if __name__ == "__main__":
+    main()
@@ -26,20 +26,41 @@ Configuracion validada:
 
 Requiere:
 ---------
-- Columnas: 'fecha', 'close', 'high', 'low', 'volume'
+- Columnas: 'fecha', 'open', 'close', 'high', 'low', 'volume'
 - Librerias: pandas, ta
+- Opcional: cache (my_modules.indicadores.CacheIndicadores) compartida con otras estrategias
 
 Salida:
 --------
 DataFrame con columnas: ['fecha', 'signal', 'estrategia', ...]
 """
 
+import logging
+import numpy as np
 import pandas as pd
-import ta
 from my_modules.logger_estrategia import configurar_logger
+from my_modules.indicadores import CacheIndicadores
 
 logger = configurar_logger("bollinger_breakout_v4")
 
+# Modo incremental de shu_cro.py: un cambio de VERSION fuerza la reconstruccion completa.
+# WARMUP cubre la ventana de Bollinger y acota el ATR de Wilder (14): el error por
+# arrancar en otra barra decae como (13/14)^n, y (13/14)^373 < 1e-12; 400 >= 373 + 14
+# de semilla (tests/test_bollinger_incremental.py lo comprueba contra el recalculo completo).
+VERSION = "4.0"
+WARMUP = 400
+
+# Requisitos para el registro (my_modules/registro_estrategias.py)
+COLUMNAS = ["open", "high", "low", "close", "volume"]
+MIN_HISTORIA = 20
+PARAMETROS = {"window": 20, "s": 2.5, "ajuste_volatilidad": False, "usar_filtro_cuerpo": True,
+              "usar_filtro_volumen": True, "atr_threshold": 0.008, "vol_multiplier": 1.05}
+
+# Grid por defecto de my_modules/barrido.py (el del notebook de tuning)
+GRID_BARRIDO = {"window": [20, 25], "s": [2.0, 2.5], "ajuste_volatilidad": [True, False],
+                "usar_filtro_cuerpo": [True, False], "usar_filtro_volumen": [True, False],
+                "atr_threshold": [0.008, 0.010], "vol_multiplier": [1.05, 1.10]}
+
 def generar_senales(df: pd.DataFrame,
                     window: int = 20,
                     s: float = 2.5,
@@ -48,7 +69,8 @@ def generar_senales(df: pd.DataFrame,
                     usar_filtro_volumen: bool = True,
                     atr_threshold: float = 0.008,
                     vol_multiplier: float = 1.05,
-                    debug: bool = False) -> pd.DataFrame:
+                    debug: bool = False,
+                    cache: CacheIndicadores = None) -> pd.DataFrame:
     try:
         df = df.copy()
         req = {"fecha", "close", "high", "low", "volume"}
@@ -60,27 +82,31 @@ def generar_senales(df: pd.DataFrame,
         if len(df) < window:
             return df_as_hold(df, "datos insuficientes")
 
-        # Indicadores
-        std = df["close"].rolling(window).std()
-        df["media"] = df["close"].rolling(window).mean()
+        # Indicadores (compartidos via cache si viene una alineada con df)
+        if cache is None or not cache.compatible(df):
+            cache = CacheIndicadores(df)
+        else:
+            cache = cache.vista(df)
+        std = cache.get("std", col="close", window=window)
+        df["media"] = cache.get("sma", col="close", window=window)
         df["bb_up"] = df["media"] + s * std
 
         if ajuste_volatilidad:
-            df["bb_up"] *= df["volume"] / df["volume"].rolling(window).mean()
+            df["bb_up"] *= df["volume"] / cache.get("sma", col="volume", window=window)
 
         df["breakout"] = df["close"] > df["bb_up"]
         if usar_filtro_cuerpo:
-            cuerpo = abs(df["close"] - df["open"])
-            sombra = abs(df["high"] - df["low"])
+            cuerpo = cache.get("cuerpo")
+            sombra = cache.get("sombra")
             df["f_cuerpo"] = cuerpo / sombra > 0.5
             df["breakout"] &= df["f_cuerpo"]
 
         if usar_filtro_volumen:
-            promedio_vol = df["volume"].rolling(window).mean()
+            promedio_vol = cache.get("sma", col="volume", window=window)
             df["f_vol"] = df["volume"] > promedio_vol * vol_multiplier
             df["breakout"] &= df["f_vol"]
 
-        df["atr"] = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14)
+        df["atr"] = cache.get("atr", window=14)
         df["atr_ratio"] = df["atr"] / df["close"]
         df["f_atr"] = df["atr_ratio"] > atr_threshold
         df["breakout"] &= df["f_atr"]
@@ -89,7 +115,9 @@ def generar_senales(df: pd.DataFrame,
         df.loc[df["breakout"], "signal"] = "buy"
         df["estrategia"] = "bollinger_breakout_v4"
 
-        logger.info(f"Breakout v4 | BUY={df['signal'].eq('buy').sum()}")
+        # Por simbolo: el conteo solo se hace si el nivel INFO esta activo
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Breakout v4 | BUY=%d", df["signal"].eq("buy").sum())
 
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
@@ -104,8 +132,74 @@ def generar_senales(df: pd.DataFrame,
         logger.error(f"Error inesperado: {str(e)}")
         return df_as_hold(df, "exception")
 
+def generar_senales_panel(panel,
+                          window: int = 20,
+                          s: float = 2.5,
+                          ajuste_volatilidad: bool = False,
+                          usar_filtro_cuerpo: bool = True,
+                          usar_filtro_volumen: bool = True,
+                          atr_threshold: float = 0.008,
+                          vol_multiplier: float = 1.05) -> pd.DataFrame:
+    # Misma logica que generar_senales para todo el universo a la vez (my_modules.panel)
+    from my_modules import panel as pn
+    from my_modules.senales import BUY, HOLD
+
+    close, volume = panel["close"], panel["volume"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = pn.rolling_std(close, window)
+        media = pn.rolling_mean(close, window)
+        bb_up = media + s * std
+
+        if ajuste_volatilidad:
+            bb_up = bb_up * (volume / pn.rolling_mean(volume, window))
+
+        breakout = close > bb_up
+        if usar_filtro_cuerpo:
+            breakout &= np.abs(close - panel["open"]) / np.abs(panel["high"] - panel["low"]) > 0.5
+
+        if usar_filtro_volumen:
+            breakout &= volume > pn.rolling_mean(volume, window) * vol_multiplier
+
+        atr = pn.atr_wilder(panel, window=14)
+        breakout &= atr / close > atr_threshold
+
+    # Simbolos con menos de `window` barras: todo HOLD, como en la version por simbolo
+    breakout &= (panel.longitud >= window)[np.newaxis, :]
+    codigos = np.where(breakout, BUY, HOLD).astype(np.int8)
+    logger.info(f"Breakout v4 panel | {len(panel.simbolos)} simbolos | BUY={int(breakout.sum())}")
+    return pn.a_largo(panel, codigos, "bollinger_breakout_v4")
+
+def generar_senales_barrido(df: pd.DataFrame, combinaciones: list) -> np.ndarray:
+    # Todas las combinaciones a la vez (barras x combinaciones, int8); mismas señales que
+    # generar_senales(df, **params) para cada columna
+    df = df.sort_values("fecha").reset_index(drop=True)
+    p = {k: np.array([{**PARAMETROS, **c}[k] for c in combinaciones]) for k in PARAMETROS}
+    close = df["close"].to_numpy(dtype="float64")[:, None]
+    volume = df["volume"].to_numpy(dtype="float64")[:, None]
+
+    # Indicadores compartidos: una vez por ventana distinta
+    cache = CacheIndicadores(df)
+    ventanas = sorted(set(p["window"].tolist()))
+    col = np.searchsorted(ventanas, p["window"])
+    media = np.column_stack([cache.get("sma", col="close", window=w).to_numpy() for w in ventanas])[:, col]
+    std = np.column_stack([cache.get("std", col="close", window=w).to_numpy() for w in ventanas])[:, col]
+    vol_media = np.column_stack([cache.get("sma", col="volume", window=w).to_numpy() for w in ventanas])[:, col]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bb_up = media + p["s"] * std
+        bb_up = np.where(p["ajuste_volatilidad"], bb_up * (volume / vol_media), bb_up)
+        breakout = close > bb_up
+        f_cuerpo = (cache.get("cuerpo") / cache.get("sombra") > 0.5).to_numpy()[:, None]
+        breakout &= f_cuerpo | ~p["usar_filtro_cuerpo"]
+        breakout &= (volume > vol_media * p["vol_multiplier"]) | ~p["usar_filtro_volumen"]
+        atr_ratio = (cache.get("atr", window=14).to_numpy() / df["close"].to_numpy())[:, None]
+        breakout &= atr_ratio > p["atr_threshold"]
+
+    breakout &= len(df) >= p["window"]
+    return np.where(breakout, 1, 0).astype(np.int8)
+
 def df_as_hold(df: pd.DataFrame, razon: str) -> pd.DataFrame:
-    logger.info(f"Retornando HOLD por: {razon}")
+    logger.info("Retornando HOLD por: %s", razon)
     df = df.copy()
     if "fecha" not in df.columns:
         return pd.DataFrame(columns=["fecha", "signal", "estrategia"])
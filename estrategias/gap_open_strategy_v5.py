@@ -16,18 +16,35 @@ Mejor combinación validada:
 Requiere:
 ---------
 - Columnas: ['fecha', 'open', 'high', 'low', 'close']
+- Opcional: cache (my_modules.indicadores.CacheIndicadores) compartida con otras estrategias
 
 Salida:
 --------
 DataFrame con ['fecha', 'signal', 'estrategia']
 """
 
+import logging
+import numpy as np
 import pandas as pd
 from my_modules.logger_estrategia import configurar_logger
+from my_modules.indicadores import CacheIndicadores
 
 logger = configurar_logger("gap_open_strategy_v5")
 
-def generar_senales(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
+# Modo incremental de shu_cro.py: solo necesita el cierre previo, pero exige 10 filas
+VERSION = "5.0"
+WARMUP = 10
+
+# Requisitos para el registro (my_modules/registro_estrategias.py)
+COLUMNAS = ["open", "high", "low", "close"]
+MIN_HISTORIA = 10
+PARAMETROS = {"umbral_gap": 0.04, "gap_min_abs_pct": 0.015, "usar_confirmacion_cuerpo": False}
+
+# Grid por defecto de my_modules/barrido.py
+GRID_BARRIDO = {"umbral_gap": [0.02, 0.03, 0.04, 0.05], "gap_min_abs_pct": [0.01, 0.015, 0.02]}
+
+def generar_senales(df: pd.DataFrame, debug: bool = False, cache: CacheIndicadores = None,
+                    **parametros) -> pd.DataFrame:
     try:
         df = df.copy()
         columnas_req = {"fecha", "open", "close", "high", "low"}
@@ -36,16 +53,20 @@ def generar_senales(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
             return df_as_hold(df, razon="faltan columnas")
 
         df = df.sort_values("fecha").reset_index(drop=True)
-        if len(df) < 10:
+        if len(df) < MIN_HISTORIA:
             return df_as_hold(df, razon="datos insuficientes")
 
-        # Configuración fija óptima
-        umbral_gap = 0.04
-        gap_min_abs_pct = 0.015
-        usar_confirmacion_cuerpo = False
+        # Configuración fija óptima (el barrido puede sustituirla con `parametros`)
+        config = {**PARAMETROS, **parametros}
+        umbral_gap = config["umbral_gap"]
+        gap_min_abs_pct = config["gap_min_abs_pct"]
+        usar_confirmacion_cuerpo = config["usar_confirmacion_cuerpo"]
 
         # Cálculo del gap
-        df["close_prev"] = df["close"].shift(1)
+        if cache is not None and cache.compatible(df):
+            df["close_prev"] = cache.vista(df).get("shift", col="close", n=1)
+        else:
+            df["close_prev"] = df["close"].shift(1)
         df["gap"] = (df["open"] - df["close_prev"]) / df["close_prev"]
         df["gap_abs"] = df["gap"].abs()
 
@@ -68,7 +89,9 @@ def generar_senales(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
         df.loc[df["cond_sell"], "signal"] = "sell"
         df["estrategia"] = "gap_open_strategy_v5"
 
-        logger.info(f"GapOpen v5 | BUY={df['signal'].eq('buy').sum()} | SELL={df['signal'].eq('sell').sum()}")
+        # Por simbolo: los conteos solo se hacen si el nivel INFO esta activo
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("GapOpen v5 | BUY=%d | SELL=%d", df["signal"].eq("buy").sum(), df["signal"].eq("sell").sum())
 
         columnas = ["fecha", "signal", "estrategia"]
         if debug:
@@ -84,8 +107,49 @@ def generar_senales(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
         logger.error(f"Error inesperado: {str(e)}")
         return df_as_hold(df, razon="exception")
 
+def generar_senales_panel(panel) -> pd.DataFrame:
+    # Misma logica que generar_senales para todo el universo a la vez (my_modules.panel)
+    from my_modules import panel as pn
+    from my_modules.senales import BUY, HOLD, SELL
+
+    umbral_gap = PARAMETROS["umbral_gap"]
+    gap_min_abs_pct = PARAMETROS["gap_min_abs_pct"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        close_prev = pn.shift(panel["close"], 1)
+        gap = (panel["open"] - close_prev) / close_prev
+        gap_suficiente = np.abs(gap) >= gap_min_abs_pct
+        cond_sell = (gap > umbral_gap) & gap_suficiente
+        cond_buy = (gap < -umbral_gap) & gap_suficiente
+
+    # SELL se asigna despues de BUY en la version por simbolo: tiene prioridad
+    codigos = np.where(cond_sell, SELL, np.where(cond_buy, BUY, HOLD)).astype(np.int8)
+    codigos[:, panel.longitud < MIN_HISTORIA] = HOLD
+    logger.info(f"GapOpen v5 panel | {len(panel.simbolos)} simbolos | "
+                f"BUY={int((codigos == BUY).sum())} | SELL={int((codigos == SELL).sum())}")
+    return pn.a_largo(panel, codigos, "gap_open_strategy_v5")
+
+def generar_senales_barrido(df: pd.DataFrame, combinaciones: list) -> np.ndarray:
+    # Todas las combinaciones a la vez (barras x combinaciones, int8); mismas señales que
+    # generar_senales(df, **params) para cada columna
+    df = df.sort_values("fecha").reset_index(drop=True)
+    umbral_gap = np.array([c.get("umbral_gap", PARAMETROS["umbral_gap"]) for c in combinaciones])
+    gap_min_abs_pct = np.array([c.get("gap_min_abs_pct", PARAMETROS["gap_min_abs_pct"]) for c in combinaciones])
+
+    close_prev = df["close"].shift(1).to_numpy(dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = ((df["open"].to_numpy(dtype="float64") - close_prev) / close_prev)[:, None]
+        gap_suficiente = np.abs(gap) >= gap_min_abs_pct
+        cond_sell = (gap > umbral_gap) & gap_suficiente
+        cond_buy = (gap < -umbral_gap) & gap_suficiente
+
+    codigos = np.where(cond_sell, -1, np.where(cond_buy, 1, 0)).astype(np.int8)
+    if len(df) < MIN_HISTORIA:
+        codigos[:] = 0
+    return codigos
+
 def df_as_hold(df: pd.DataFrame, razon: str) -> pd.DataFrame:
-    logger.info(f"Retornando HOLD por: {razon}")
+    logger.info("Retornando HOLD por: %s", razon)
     df = df.copy()
     if "fecha" not in df.columns:
         return pd.DataFrame(columns=["fecha", "signal", "estrategia"])
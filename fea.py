@@ -1,85 +1,65 @@
 import os
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from pathlib import Path
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules.logs_async import configurar, salida_archivo
+from my_modules.features import FEATURES, FEATURES_PATH, WARMUP, actualizar, backfill
+from my_modules.panel import panel_desde_reciente
+from my_modules.panel_reciente import PanelReciente
 
 # === CONFIG ===
-HIST_DIR = "/home/ubuntu/tr/data/historic_reciente"
+N_FILAS = WARMUP   # calentamiento de la feature mas larga del registro
 OUTPUT_PATH = "/home/ubuntu/tr/data/features/features_dia.parquet"
 LOG_PATH = f"/home/ubuntu/tr/logs/utils/fea_{datetime.now().date()}.log"
-N_FEATURES = 8
 
-# === FUNCIONES DE FEATURES ===
-def calcular_rsi(series, window=14):
-    delta = series.diff()
-    up = delta.clip(lower=0)
-    down = -delta.clip(upper=0)
-    ma_up = up.rolling(window).mean()
-    ma_down = down.rolling(window).mean()
-    rs = ma_up / ma_down
-    return 100 - (100 / (1 + rs))
+# === FUNCIONES ===
+eventos = configurar("fea", [salida_archivo(LOG_PATH, formato="texto", columnas=["ts", "mensaje"])])
 
 def log(msg):
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    linea = f"{ts} | {msg}"
-    print(linea)
-    with open(LOG_PATH, "a") as f:
-        f.write(linea + "\n")
+    eventos.info(msg)
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | {msg}")
 
 # === MAIN ===
 def main():
+    parser = argparse.ArgumentParser(description="Features diarias y almacen historico de features")
+    parser.add_argument("--backfill", action="store_true", help="reconstruye el historico de features")
+    parser.add_argument("--desde", default=None)
+    parser.add_argument("--hasta", default=None)
+    args = parser.parse_args()
+
     os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
 
-    archivos = sorted(Path(HIST_DIR).glob("*.parquet"))
-    filas = []
-
-    for archivo in archivos:
-        simbolo = archivo.stem.upper()
-        try:
-            df = pd.read_parquet(archivo)
-            df = df[df["fecha"].notna()]
-            df["fecha"] = pd.to_datetime(df["fecha"])
-            df = df.sort_values("fecha")
-
-            if len(df) < 60:
-                log(f"SKIP {simbolo}: menos de 60 filas")
-                continue
+    if args.backfill:
+        n = backfill(desde=args.desde, hasta=args.hasta)
+        log(f"Backfill de features: {n} filas escritas en {FEATURES_PATH}")
+        return
 
-            df["ma_5"] = df["close"].rolling(5).mean()
-            df["ma_20"] = df["close"].rolling(20).mean()
-            df["rsi_14"] = calcular_rsi(df["close"], 14)
-            df["pos_rango_60"] = (df["close"] - df["low"].rolling(60).min()) / (df["high"].rolling(60).max() - df["low"].rolling(60).min())
-            df["volatilidad_20"] = df["close"].rolling(20).std()
-            df["cambio_1d"] = df["close"].pct_change(1)
-            df["cambio_3d"] = df["close"].pct_change(3)
+    # Todas las ventanas salen del mismo archivo mapeado en memoria; el almacen
+    # solo recibe las barras nuevas (y relee historico si faltan varias)
+    panel = panel_desde_reciente(PanelReciente())
+    df_nuevas, matrices, panel = actualizar(panel)
+    log(f"Almacen de features: {len(df_nuevas)} filas nuevas en {df_nuevas['fecha'].nunique() if len(df_nuevas) else 0} fechas")
 
-            ultima = df.iloc[-1]
-
-            fila = {
-                "simbolo": simbolo,
-                "fecha": ultima["fecha"].date(),
-                "ma_5": ultima["ma_5"],
-                "ma_20": ultima["ma_20"],
-                "rsi_14": ultima["rsi_14"],
-                "pos_rango_60": ultima["pos_rango_60"],
-                "volatilidad_20": ultima["volatilidad_20"],
-                "cambio_1d": ultima["cambio_1d"],
-                "cambio_3d": ultima["cambio_3d"],
-                "volume": ultima["volume"]
-            }
-
-            filas.append(fila)
-            log(f"OK {simbolo}")
-
-        except Exception as e:
-            log(f"ERROR {simbolo}: {e}")
+    filas = []
+    for j, archivo in enumerate(panel.simbolos):
+        simbolo = archivo.upper()
+        if panel.longitud[j] < N_FILAS:
+            log(f"SKIP {simbolo}: menos de {N_FILAS} filas")
+            continue
+        fila = {"simbolo": simbolo, "fecha": panel.fechas[-1, j].astype(object)}
+        fila.update({nombre: matrices[nombre][-1, j] for nombre in FEATURES})
+        filas.append(fila)
+        log(f"OK {simbolo}")
 
     if filas:
         df_final = pd.DataFrame(filas)
         df_final.to_parquet(OUTPUT_PATH, index=False)
-        log(f"Archivo generado con {len(df_final)} simbolos y {N_FEATURES} features.")
+        log(f"Archivo generado con {len(df_final)} simbolos y {len(FEATURES)} features.")
     else:
         log("No se generaron datos.")
 
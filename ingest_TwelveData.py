@@ -1,11 +1,17 @@
-# Esta funcion se ejecuta todos los dias desde AWS Lambda, se invoca desde Amazon EventBridge con un schedule para cada grupo de simbolos
+# Esta funcion se ejecuta todos los dias desde AWS Lambda, se invoca desde Amazon EventBridge; por defecto rota por grupos (MODO_PROGRAMACION=programador deja que programador_ingesta.py elija los simbolos de cada tick)
 
 import os
 import json
+import time
+import uuid
 import boto3
 import requests
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from io import StringIO
+from requests.adapters import HTTPAdapter
+from programador_ingesta import MARGEN_TIEMPO, planificar_tick, registrar_resultado, ultima_sesion_cerrada
 
 API_KEY = os.getenv("TWELVE_API_KEY")
 EMAIL_TRADING = os.getenv("EMAIL_TRADING")
@@ -15,6 +21,28 @@ LOG_FOLDER = "logs/ingestion"
 CONFIG_GROUPS_KEY = "config/symbol_groups.json"
 CURRENT_GROUP_KEY = "config/grupo_actual.json"
 
+# === CONFIG FETCH ===
+API_URL = os.getenv("TWELVE_API_URL", "https://api.twelvedata.com")
+API_CREDITOS_MIN = int(os.getenv("TWELVE_CREDITOS_MIN", "8"))   # creditos por minuto del plan
+FETCH_LOTE = int(os.getenv("TWELVE_LOTE", "8"))                 # simbolos por llamada time_series
+FETCH_WORKERS = int(os.getenv("TWELVE_WORKERS", "4"))
+FETCH_TIMEOUT = float(os.getenv("TWELVE_TIMEOUT", "15"))
+
+# === CONFIG PLANIFICADOR ===
+STATE_KEY = "config/estado_simbolos.json"   # ultima fecha guardada por simbolo
+BACKFILL_PAGINA = 5000                      # maximo outputsize de time_series
+HISTORIA_INICIAL = int(os.getenv("TWELVE_HISTORIA_INICIAL", "5000"))
+
+# === CONFIG PROGRAMADOR ===
+MODO_PROGRAMACION = os.getenv("MODO_PROGRAMACION", "grupos")   # "grupos" (rotacion) o "programador"
+CREDITOS_TICK = int(os.getenv("TWELVE_CREDITOS_TICK", "100"))
+CALENDARIO_KEY = "config/calendario_mercado.json"   # {"feriados": ["2025-07-04", ...]}
+
+# === CONFIG SALIDA ===
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv")   # "csv" o "parquet" (requiere layer con pyarrow)
+HISTORIC_PREFIX = "data/historic"                   # deltas: <prefix>/<SIMBOLO>/<desde>_<hasta>.<ext>
+CAMBIOS_PREFIX = "data/cambios"                     # feed de cambios que consume upd.py
+
 s3 = boto3.client("s3", region_name=REGION)
 ses = boto3.client("ses", region_name=REGION)
 
@@ -26,44 +54,309 @@ def guardar_json_s3(data, key):
     body = json.dumps(data, indent=2)
     s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=body.encode("utf-8"))
 
-def fetch_data(symbol):
+# === FETCH ===
+class TokenBucket:
+    """Limitador token-bucket: `capacidad` creditos que se reponen a `por_minuto` por minuto."""
+
+    def __init__(self, por_minuto, capacidad=None, reloj=time.monotonic, dormir=time.sleep):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = capacidad if capacidad is not None else por_minuto
+        self.tokens = float(self.capacidad)
+        self.reloj = reloj
+        self.dormir = dormir
+        self.ultimo = reloj()
+        self.lock = threading.Lock()
+
+    def _reponer(self):
+        ahora = self.reloj()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    def adquirir(self, n=1):
+        # Devuelve los segundos que se espero por el limitador
+        if n > self.capacidad:
+            raise ValueError(f"Se piden {n} creditos y la capacidad es {self.capacidad}")
+        inicio = self.reloj()
+        while True:
+            with self.lock:
+                self._reponer()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return self.reloj() - inicio
+                falta = (n - self.tokens) / self.tasa
+            self.dormir(falta)
+
+def crear_sesion(workers=FETCH_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_session = None
+
+def obtener_sesion():
+    global _session
+    if _session is None:
+        _session = crear_sesion()
+    return _session
+
+def _parsear_respuesta(symbols, data):
+    # Una llamada con un solo simbolo devuelve el objeto plano; con varios, un dict por simbolo
+    if len(symbols) == 1:
+        data = {symbols[0]: data}
+    resultados = {}
+    for symbol in symbols:
+        item = data.get(symbol) if isinstance(data, dict) else None
+        if not item or "values" not in item:
+            resultados[symbol] = ValueError(f"Respuesta invalida para {symbol}: {item if item else data}")
+        else:
+            resultados[symbol] = item["values"]
+    return resultados
+
+def fetch_lote(symbols, session=None, limitador=None, params_extra=None, base_url=None):
     params = {
-        "symbol": symbol,
+        "symbol": ",".join(symbols),
         "interval": "1day",
         "outputsize": 5,
         "apikey": API_KEY
     }
-    response = requests.get("https://api.twelvedata.com/time_series", params=params)
-    data = response.json()
-    if "values" not in data:
-        raise ValueError(f"Respuesta invalida para {symbol}: {data}")
-    return data["values"]
+    params.update(params_extra or {})
+    espera = limitador.adquirir(len(symbols)) if limitador else 0.0
+    session = session or obtener_sesion()
+    inicio = time.perf_counter()
+    try:
+        response = session.get(f"{base_url or API_URL}/time_series", params=params, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        resultados = _parsear_respuesta(symbols, response.json())
+    except Exception as e:
+        resultados = {symbol: e for symbol in symbols}
+    latencia = time.perf_counter() - inicio
+    return {
+        symbol: {"values": r if not isinstance(r, Exception) else None,
+                 "error": r if isinstance(r, Exception) else None,
+                 "latencia": latencia,
+                 "espera": espera}
+        for symbol, r in resultados.items()
+    }
+
+def _agrupar_lotes(symbols, lote, planes):
+    # Solo se pueden juntar en una llamada los simbolos que piden el mismo rango
+    por_params = {}
+    for symbol in symbols:
+        params = (planes or {}).get(symbol) or {}
+        por_params.setdefault(tuple(sorted(params.items())), []).append(symbol)
+    lotes = []
+    for params, grupo in por_params.items():
+        for i in range(0, len(grupo), lote):
+            lotes.append((grupo[i:i + lote], dict(params)))
+    return lotes
+
+def fetch_grupo(symbols, lote=FETCH_LOTE, workers=FETCH_WORKERS, creditos_min=API_CREDITOS_MIN,
+                session=None, limitador=None, params_extra=None, base_url=None, planes=None):
+    """
+    Descarga `symbols` en llamadas de hasta `lote` simbolos, concurrentes y bajo un
+    limitador de creditos por minuto. `planes` permite parametros distintos por simbolo
+    (ver planificar_fetch). Devuelve (resultados por simbolo, metricas).
+    """
+    session = session or obtener_sesion()
+    limitador = limitador or TokenBucket(creditos_min)
+    lote = max(1, min(lote, limitador.capacidad))
+    lotes = _agrupar_lotes(symbols, lote, planes)
+
+    inicio = time.perf_counter()
+    resultados = {}
+    espera_total = 0.0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futuros = [
+            pool.submit(fetch_lote, l, session, limitador, {**(params_extra or {}), **p}, base_url)
+            for l, p in lotes
+        ]
+        for (l, _), futuro in zip(lotes, futuros):
+            r = futuro.result()
+            espera_total += r[l[0]]["espera"]
+            resultados.update(r)
+
+    metricas = {
+        "simbolos": len(symbols),
+        "llamadas": len(lotes),
+        "duracion": time.perf_counter() - inicio,
+        "espera_limitador": espera_total,
+        "latencia_media": (sum(r["latencia"] for r in resultados.values()) / len(resultados)) if resultados else 0.0
+    }
+    return resultados, metricas
+
+def fetch_paginado(symbol, start_date, end_date=None, pagina=BACKFILL_PAGINA,
+                   session=None, limitador=None, base_url=None):
+    """
+    Recorre hacia atras el rango [start_date, end_date] en paginas de `pagina` barras.
+    Devuelve (values de mas reciente a mas antiguo, llamadas realizadas).
+    """
+    values = []
+    vistos = set()
+    llamadas = 0
+    while True:
+        params = {"start_date": start_date, "outputsize": pagina}
+        if end_date:
+            params["end_date"] = end_date
+        r = fetch_lote([symbol], session, limitador, params, base_url)[symbol]
+        llamadas += 1
+        if r["error"] is not None:
+            if values and _sin_datos(r["error"]):
+                break
+            raise r["error"]
+        nuevos = [v for v in r["values"] if v["datetime"] not in vistos]
+        if not nuevos:
+            break
+        values.extend(nuevos)
+        vistos.update(v["datetime"] for v in nuevos)
+        mas_antigua = nuevos[-1]["datetime"][:10]
+        if len(r["values"]) < pagina or mas_antigua <= start_date:
+            break
+        end_date = mas_antigua
+    return values, llamadas
+
+def fetch_data(symbol):
+    r = fetch_lote([symbol])[symbol]
+    if r["error"] is not None:
+        raise r["error"]
+    return r["values"]
+
+# === PLANIFICADOR ===
+def cargar_estado_simbolos():
+    try:
+        return cargar_json_s3(STATE_KEY)
+    except s3.exceptions.NoSuchKey:
+        return {}
+
+def cargar_feriados():
+    try:
+        return set(cargar_json_s3(CALENDARIO_KEY).get("feriados", []))
+    except s3.exceptions.NoSuchKey:
+        return set()
+
+def dias_habiles(desde, hasta):
+    # Dias lunes-viernes en [desde, hasta]; cota superior de las barras diarias que faltan
+    if desde > hasta:
+        return 0
+    total = (hasta - desde).days + 1
+    semanas, resto = divmod(total, 7)
+    habiles = semanas * 5
+    for i in range(resto):
+        if (desde + timedelta(days=semanas * 7 + i)).weekday() < 5:
+            habiles += 1
+    return habiles
+
+def planificar_fetch(ultima_fecha, ahora, feriados=()):
+    """
+    Devuelve los parametros time_series que piden exactamente el rango que falta
+    hasta la ultima sesion cerrada, o None si el simbolo ya esta al dia. Sin fecha
+    previa se pide HISTORIA_INICIAL.
+    """
+    if not ultima_fecha:
+        return {"outputsize": HISTORIA_INICIAL}
+    desde = datetime.strptime(ultima_fecha[:10], "%Y-%m-%d").date() + timedelta(days=1)
+    faltan = dias_habiles(desde, ultima_sesion_cerrada(ahora, feriados))
+    if faltan == 0:
+        return None
+    return {"start_date": desde.isoformat(), "outputsize": min(faltan + 1, BACKFILL_PAGINA)}
+
+def _sin_datos(error):
+    return "No data is available" in str(error)
+
+def _truncado(values, params):
+    # Pagina llena que no alcanza start_date: quedan barras mas antiguas por pedir
+    if "start_date" not in params or len(values) < params["outputsize"]:
+        return False
+    return values[-1]["datetime"][:10] > params["start_date"]
+
+def clave_delta(symbol, values, ext):
+    # Un objeto por rango descargado: una ejecucion nunca pisa el delta de otra que
+    # upd.py aun no haya fusionado
+    fechas = [v["datetime"][:10] for v in values]
+    return f"{HISTORIC_PREFIX}/{symbol}/{min(fechas)}_{max(fechas)}.{ext}"
 
 def guardar_en_s3(symbol, values):
+    if OUTPUT_FORMAT == "parquet":
+        return guardar_parquet_s3(symbol, values)
     csv_buffer = StringIO()
     headers = ["datetime", "open", "high", "low", "close", "volume"]
     csv_buffer.write(",".join(headers) + "\n")
     for entry in values:
         row = [entry.get(col, "") for col in headers]
         csv_buffer.write(",".join(row) + "\n")
-    s3_key = f"data/historic/{symbol}.csv"
-    s3.put_object(Bucket=BUCKET_NAME, Key=s3_key, Body=csv_buffer.getvalue())
-    return s3_key
-
-def escribir_log_s3(lineas):
-    hoy = datetime.utcnow().strftime("%Y-%m-%d")
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    log_key = f"{LOG_FOLDER}/{hoy}.csv"
-    try:
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=log_key)
-        contenido = obj["Body"].read().decode("utf-8")
-    except s3.exceptions.NoSuchKey:
-        contenido = "timestamp,proceso,estatus,mensaje\n"
+    s3_key = clave_delta(symbol, values, "csv")
+    resp = s3.put_object(Bucket=BUCKET_NAME, Key=s3_key, Body=csv_buffer.getvalue())
+    return entrada_cambio(symbol, s3_key, values, resp)
+
+def esquema_barras():
+    import pyarrow as pa
+    return pa.schema([
+        ("fecha", pa.date32()),
+        ("open", pa.float64()),
+        ("high", pa.float64()),
+        ("low", pa.float64()),
+        ("close", pa.float64()),
+        ("volume", pa.float64()),   # FX, cripto y algunos ETF tienen volumen fraccionario
+    ], metadata={"origen": "ingest_TwelveData", "intervalo": "1day"})
+
+def guardar_parquet_s3(symbol, values):
+    # Tipos fijados aqui: upd.py lee el objeto sin parsear texto ni fechas
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    values = sorted(values, key=lambda v: v["datetime"])
+    def _float(col):
+        return [float(v[col]) if v.get(col) not in (None, "") else None for v in values]
+    tabla = pa.table({
+        "fecha": [datetime.strptime(v["datetime"][:10], "%Y-%m-%d").date() for v in values],
+        "open": _float("open"),
+        "high": _float("high"),
+        "low": _float("low"),
+        "close": _float("close"),
+        "volume": _float("volume"),
+    }, schema=esquema_barras())
+    buffer = pa.BufferOutputStream()
+    pq.write_table(tabla, buffer, compression="zstd")
+    s3_key = clave_delta(symbol, values, "parquet")
+    resp = s3.put_object(Bucket=BUCKET_NAME, Key=s3_key, Body=buffer.getvalue().to_pybytes())
+    return entrada_cambio(symbol, s3_key, values, resp)
+
+# === FEED DE CAMBIOS ===
+def entrada_cambio(symbol, s3_key, values, resp):
+    return {
+        "simbolo": symbol,
+        "key": s3_key,
+        "fecha_max": max(v["datetime"] for v in values)[:10],
+        "version": resp.get("VersionId"),   # None si el bucket no tiene versionado
+        "etag": resp.get("ETag", "").strip('"'),
+    }
+
+def publicar_cambios(entradas, id_ejecucion=None):
+    # Un manifest por invocacion; el nombre empieza por la hora UTC para que upd.py
+    # pueda consumirlos en orden con StartAfter=<ultimo consumido>
+    if not entradas:
+        return None
+    ahora = datetime.utcnow()
+    key = f"{CAMBIOS_PREFIX}/{ahora.strftime('%Y%m%d%H%M%S%f')}_{id_ejecucion or uuid.uuid4().hex}.json"
+    guardar_json_s3({"generado": ahora.isoformat() + "Z", "entradas": entradas}, key)
+    return key
+
+def escribir_log_s3(lineas, id_ejecucion=None):
+    # Un segmento por invocacion (solo escritura): logs/ingestion/<fecha>/<hora>_<id>.csv
+    # La compactacion diaria a parquet la hace my_modules/logs_ingesta.py
+    ahora = datetime.utcnow()
+    hoy = ahora.strftime("%Y-%m-%d")
+    timestamp = ahora.strftime("%Y-%m-%d %H:%M:%S")
+    id_ejecucion = id_ejecucion or uuid.uuid4().hex
+    log_key = f"{LOG_FOLDER}/{hoy}/{ahora.strftime('%H%M%S%f')}_{id_ejecucion}.csv"
+    contenido = "timestamp,proceso,estatus,mensaje\n"
     for linea in lineas:
         log_entry = f"{timestamp},ingest_TwelveData,{linea[0]},{linea[1]}"
         contenido += log_entry + "\n"
         print(log_entry)
     s3.put_object(Bucket=BUCKET_NAME, Key=log_key, Body=contenido.encode("utf-8"))
+    return log_key
 
 def enviar_email(asunto, cuerpo):
     if not EMAIL_TRADING:
@@ -85,42 +378,138 @@ def avanzar_grupo(grupo_actual, lista_grupos):
 def lambda_handler(event, context):
     errores = []
     logs = []
+    cambios = []
 
     try:
         symbol_groups = cargar_json_s3(CONFIG_GROUPS_KEY)
         estado_grupo = cargar_json_s3(CURRENT_GROUP_KEY)
         grupo_actual = estado_grupo.get("grupo_actual")
-        symbols = symbol_groups.get(grupo_actual)
+        modo = (event or {}).get("modo", "incremental")
+        estado_simbolos = cargar_estado_simbolos()
+        ahora = datetime.utcnow()
+        limitador = TokenBucket(API_CREDITOS_MIN)
+        feriados = cargar_feriados()
+        cerrada = ultima_sesion_cerrada(ahora, feriados).isoformat()
 
-        if not symbols:
-            raise ValueError(f"Grupo '{grupo_actual}' no encontrado en symbol_groups.json")
+        if MODO_PROGRAMACION == "programador" and modo != "backfill":
+            # Se elige por antiguedad, errores y calendario dentro del presupuesto del tick
+            universo = sorted(set(sum(symbol_groups.values(), [])))
+            restante = context.get_remaining_time_in_millis() / 1000 if context else 840
+            symbols, decisiones = planificar_tick(
+                universo, estado_simbolos, ahora, CREDITOS_TICK, restante - MARGEN_TIEMPO,
+                FETCH_LOTE, FETCH_WORKERS, API_CREDITOS_MIN, feriados)
+            grupo_actual = "programador"
+            for symbol, decision, motivo in decisiones:
+                if decision != "OMITIDO" or motivo != "al dia":
+                    logs.append(("PLAN", f"{symbol} {decision} - {motivo}"))
+            logs.append(("INFO", f"Programador: {len(symbols)} de {len(universo)} simbolos seleccionados"))
+        else:
+            symbols = symbol_groups.get(grupo_actual)
+            if not symbols:
+                raise ValueError(f"Grupo '{grupo_actual}' no encontrado en symbol_groups.json")
 
         logs.append(("INFO", f"Inicio de ingesta para {grupo_actual} ({len(symbols)} simbolos)"))
 
-        for symbol in symbols:
+        if modo == "backfill":
+            # Pagina hacia atras desde `desde` hasta la fecha guardada mas antigua (o hoy)
+            desde = event.get("desde", "2000-01-01")
+            inicio_fetch = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                futuros = {
+                    symbol: pool.submit(fetch_paginado, symbol, desde,
+                                        estado_simbolos.get(symbol, {}).get("primera_fecha"),
+                                        BACKFILL_PAGINA, None, limitador)
+                    for symbol in symbols
+                }
+            resultados = {}
+            llamadas = 0
+            for symbol, futuro in futuros.items():
+                try:
+                    values, n = futuro.result()
+                    llamadas += n
+                    resultados[symbol] = {"values": values, "error": None, "latencia": 0.0, "espera": 0.0}
+                except Exception as e:
+                    resultados[symbol] = {"values": None, "error": e, "latencia": 0.0, "espera": 0.0}
+            metricas = {"simbolos": len(symbols), "llamadas": llamadas,
+                        "duracion": time.perf_counter() - inicio_fetch,
+                        "espera_limitador": 0.0, "latencia_media": 0.0}
+        else:
+            planes = {}
+            for symbol in symbols:
+                plan = planificar_fetch(estado_simbolos.get(symbol, {}).get("ultima_fecha"), ahora, feriados)
+                if plan is None:
+                    logs.append(("SKIP", f"{symbol} al dia - ultima fecha {estado_simbolos[symbol]['ultima_fecha']}"))
+                else:
+                    planes[symbol] = plan
+            resultados, metricas = fetch_grupo(list(planes), limitador=limitador, planes=planes)
+
+            # Completar por paginas los rangos que no cupieron en una sola respuesta
+            for symbol, r in resultados.items():
+                if r["error"] is None and _truncado(r["values"], planes[symbol]):
+                    try:
+                        resto, _ = fetch_paginado(symbol, planes[symbol]["start_date"],
+                                                  r["values"][-1]["datetime"][:10], limitador=limitador)
+                        vistos = {v["datetime"] for v in r["values"]}
+                        r["values"] += [v for v in resto if v["datetime"] not in vistos]
+                    except Exception as e:
+                        r["error"] = e
+
+        for symbol in resultados:
+            r = resultados[symbol]
             try:
-                values = fetch_data(symbol)
+                estado = estado_simbolos.setdefault(symbol, {})
+                if r["error"] is not None:
+                    if _sin_datos(r["error"]):
+                        registrar_resultado(estado, True, ahora, latencia=r["latencia"],
+                                            sin_datos=modo != "backfill", feriados=feriados)
+                        logs.append(("SKIP", f"{symbol} sin barras nuevas"))
+                        continue
+                    raise r["error"]
+                # La barra de una sesion aun abierta es parcial: upd.py no la reescribiria
+                values = [v for v in r["values"] if v["datetime"][:10] <= cerrada]
+                if not values:
+                    registrar_resultado(estado, True, ahora, latencia=r["latencia"])
+                    logs.append(("SKIP", f"{symbol} solo barra de la sesion abierta"))
+                    continue
                 fecha_max = values[0]["datetime"]
-                guardar_en_s3(symbol, values)
-                logs.append(("OK", f"{symbol} guardado - ultima fecha {fecha_max}"))
+                cambios.append(guardar_en_s3(symbol, values))
+                registrar_resultado(estado, True, ahora, fecha_max, r["latencia"])
+                estado["primera_fecha"] = min(estado.get("primera_fecha") or "9999", values[-1]["datetime"][:10])
+                logs.append(("OK", f"{symbol} guardado - {len(values)} barras - ultima fecha {fecha_max} - latencia {r['latencia']:.2f}s - espera {r['espera']:.2f}s"))
             except Exception as e:
+                registrar_resultado(estado_simbolos.setdefault(symbol, {}), False, ahora)
                 msg = f"{symbol} error: {str(e)}"
                 logs.append(("ERROR", msg))
                 errores.append(msg)
 
-        # Avanza de grupo incluso si hubo errores
-        nuevo_grupo = avanzar_grupo(grupo_actual, list(symbol_groups.keys()))
-        estado_grupo["grupo_actual"] = nuevo_grupo
-        estado_grupo["ultimo_update"] = datetime.utcnow().isoformat() + "Z"
-        guardar_json_s3(estado_grupo, CURRENT_GROUP_KEY)
-        logs.append(("INFO", f".json config actualizado a: {nuevo_grupo}"))
+        guardar_json_s3(estado_simbolos, STATE_KEY)
+        logs.append(("INFO", f"Fetch: {metricas['simbolos']} simbolos en {metricas['llamadas']} llamadas - "
+                             f"{metricas['duracion']:.2f}s total - latencia media {metricas['latencia_media']:.2f}s - "
+                             f"espera limitador {metricas['espera_limitador']:.2f}s"))
+
+        # Avanza de grupo incluso si hubo errores (solo en modo rotacion)
+        if grupo_actual in symbol_groups:
+            nuevo_grupo = avanzar_grupo(grupo_actual, list(symbol_groups.keys()))
+            estado_grupo["grupo_actual"] = nuevo_grupo
+            estado_grupo["ultimo_update"] = datetime.utcnow().isoformat() + "Z"
+            guardar_json_s3(estado_grupo, CURRENT_GROUP_KEY)
+            logs.append(("INFO", f".json config actualizado a: {nuevo_grupo}"))
 
     except Exception as e:
         errores.append(f"Fallo global: {str(e)}")
         logs.append(("ERROR", str(e)))
         print(f"[ERROR] {str(e)}")
 
-    escribir_log_s3(logs)
+    # Se publica aunque haya habido un fallo global: lo ya guardado debe llegar a upd.py
+    try:
+        cambios_key = publicar_cambios(cambios, getattr(context, "aws_request_id", None))
+        if cambios_key:
+            logs.append(("INFO", f"Feed de cambios: {len(cambios)} simbolos en {cambios_key}"))
+    except Exception as e:
+        errores.append(f"No se pudo publicar el feed de cambios: {str(e)}")
+        logs.append(("ERROR", f"Feed de cambios: {str(e)}"))
+
+    escribir_log_s3(logs, getattr(context, "aws_request_id", None))
 
     if errores:
         asunto = f"[TRADING] Error en ingesta {grupo_actual}"
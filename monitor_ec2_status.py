@@ -5,8 +5,11 @@ import boto3
 import logging
 from datetime import datetime
 import time
-import watchtower
 import requests
+import sys
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules.logs_async import configurar, salida_archivo, salida_cloudwatch
 
 # === CONFIGURACION ===
 THRESHOLDS = {
@@ -21,22 +24,12 @@ LOG_GROUP = "EC2MonitorLogs"
 LOG_STREAM = "vm01-prod"
 
 # === LOGGING ===
-logger = logging.getLogger("EC2-status")
-logger.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s,%(name)s,%(levelname)s,%(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-
-file_handler = logging.FileHandler(LOG_FILE)
-file_handler.setFormatter(formatter)
-
-cw_handler = watchtower.CloudWatchLogHandler(
-    log_group=LOG_GROUP,
-    stream_name=LOG_STREAM
-)
-cw_handler.setFormatter(formatter)
-
-logger.handlers.clear()
-logger.addHandler(file_handler)
-logger.addHandler(cw_handler)
+# Archivo y CloudWatch se escriben por lotes desde un hilo; al salir se vacia la cola
+COLUMNAS_LOG = ["ts", "logger", "nivel", "mensaje"]
+logger = configurar("EC2-status", [
+    salida_archivo(LOG_FILE, columnas=COLUMNAS_LOG),
+    salida_cloudwatch(LOG_GROUP, LOG_STREAM, columnas=COLUMNAS_LOG),
+])
 
 # === METRICAS ===
 def obtener_uptime():
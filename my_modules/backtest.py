@@ -0,0 +1,294 @@
+# /home/ubuntu/tr/my_modules/backtest.py
+"""
+Backtest vectorizado de las señales del motor (formato de generar_senales:
+'fecha', 'signal', 'estrategia') sobre el historico particionado.
+
+Por cada señal BUY/SELL:
+- retornos a N barras (ret_fwd_<N>) con el signo de la operacion
+- operacion con entrada al cierre y salida por TP, SL o a las `dias` barras
+  (cierre de la barra de salida, como en los notebooks), menos la comision
+
+Todo sale de operaciones sobre arrays por simbolo; las estadisticas por
+estrategia y por estrategia/simbolo (winrate, media, profit factor, sharpe,
+max drawdown, hit rate a N barras) se calculan con groupby.
+
+Las operaciones de cada simbolo se guardan en cache con una clave que combina
+los datos (filas y ultima fecha del manifest; tamaño y fecha de modificacion del
+parquet si el simbolo aun no esta migrado), la VERSION de cada estrategia
+(o el hash de las señales si vienen del dataset) y la configuracion.
+
+Uso:
+    python -m my_modules.backtest --workers 8
+    python -m my_modules.backtest --fuente dataset --horizontes 1 5 20 --tp 0.05 --sl 0.03 --dias 5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules import historico
+from my_modules.historico import cargar_manifest, listar_simbolos, load_history
+from my_modules.registro_estrategias import RegistroEstrategias
+
+# === CONFIGURACION ===
+BACKTEST_PATH = Path("/home/ubuntu/tr/reports/backtest")
+CACHE_PATH = BACKTEST_PATH / "cache"
+HORIZONTES = [1, 5, 10, 20]
+TP_PCT = 0.05
+SL_PCT = 0.03
+DIAS_MAX = 5          # barras
+COMISION = 0.0        # fraccion por operacion
+
+# === RESULTADO POR BARRA ===
+def resultados_operacion(df, tp=TP_PCT, sl=SL_PCT, dias=DIAS_MAX):
+    """
+    Retorno de una entrada al cierre de cada barra, en largo y en corto. La salida
+    es el cierre de la primera barra que toca el TP o el SL (TP primero si ambos) o
+    el de la ultima barra de la ventana. tp/sl None = sin ese limite. Sin barras
+    posteriores -> NaN.
+    """
+    close = df["close"].to_numpy(dtype="float64")
+    high = df["high"].to_numpy(dtype="float64")
+    low = df["low"].to_numpy(dtype="float64")
+    n = len(close)
+    idx = np.arange(n)[:, None] + np.arange(1, dias + 1)[None, :]
+    valido = idx < n
+    idx = np.minimum(idx, n - 1)
+    entrada = close[:, None]
+    ultima = np.minimum(np.arange(n) + dias, n - 1)
+    tp = np.inf if tp is None else tp
+    sl = np.inf if sl is None else sl
+
+    def _salida(toca_tp, toca_sl):
+        toca_tp &= valido
+        toca_sl &= valido
+        k_tp = np.where(toca_tp.any(axis=1), toca_tp.argmax(axis=1), dias)
+        k_sl = np.where(toca_sl.any(axis=1), toca_sl.argmax(axis=1), dias)
+        k = np.minimum(k_tp, k_sl)
+        fila = np.where(k < dias, idx[np.arange(n), np.minimum(k, dias - 1)], ultima)
+        return close[fila]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        salida_buy = _salida(high[idx] >= entrada * (1 + tp), low[idx] <= entrada * (1 - sl))
+        salida_sell = _salida(low[idx] <= entrada * (1 - tp), high[idx] >= entrada * (1 + sl))
+        ret_buy = salida_buy / close - 1
+        ret_sell = -(salida_sell / close - 1)
+    sin_futuro = np.arange(n) == n - 1
+    ret_buy[sin_futuro] = np.nan
+    ret_sell[sin_futuro] = np.nan
+    return ret_buy, ret_sell
+
+def retornos_futuros(close, horizonte):
+    salida = np.full(len(close), np.nan)
+    if horizonte < len(close):
+        salida[:-horizonte] = close[horizonte:] / close[:-horizonte] - 1
+    return salida
+
+# === OPERACIONES ===
+def operaciones(df_precio, df_senales, horizontes=HORIZONTES, tp=TP_PCT, sl=SL_PCT, dias=DIAS_MAX,
+                comision=COMISION):
+    # Una fila por señal BUY/SELL con fecha en el historico
+    df_precio = df_precio.sort_values("fecha").reset_index(drop=True)
+    senales = df_senales[df_senales["signal"].astype(str).str.lower().isin(["buy", "sell"])]
+    fechas = pd.to_datetime(df_precio["fecha"]).to_numpy(dtype="datetime64[D]")
+    fechas_senal = pd.to_datetime(senales["fecha"]).to_numpy(dtype="datetime64[D]")
+    pos = np.searchsorted(fechas, fechas_senal)
+    en_historico = (pos < len(fechas)) & (fechas[np.minimum(pos, len(fechas) - 1)] == fechas_senal)
+    senales, pos = senales[en_historico], pos[en_historico]
+
+    signo = np.where(senales["signal"].astype(str).str.lower().to_numpy() == "buy", 1.0, -1.0)
+    ret_buy, ret_sell = resultados_operacion(df_precio, tp, sl, dias)
+    close = df_precio["close"].to_numpy(dtype="float64")
+    trades = pd.DataFrame({
+        "fecha": fechas[pos].astype(object),
+        "estrategia": senales["estrategia"].astype(str).to_numpy(),
+        "signal": np.where(signo > 0, "buy", "sell"),
+        "entrada": close[pos],
+        "ret": np.where(signo > 0, ret_buy[pos], ret_sell[pos]) - comision,
+    })
+    for h in horizontes:
+        trades[f"ret_fwd_{h}"] = signo * retornos_futuros(close, h)[pos]
+    return trades
+
+# === ESTADISTICAS ===
+def _max_drawdown(trades, por):
+    # Equity como suma acumulada de retornos en orden de fecha dentro de cada grupo
+    ordenadas = trades.sort_values(por + ["fecha"], kind="stable")
+    equity = ordenadas.groupby(por, sort=False)["ret"].cumsum()
+    caida = equity - equity.groupby([ordenadas[c] for c in por], sort=False).cummax()
+    return caida.groupby([ordenadas[c] for c in por]).min().rename("max_drawdown")
+
+def estadisticas(trades, por=("estrategia",), horizontes=HORIZONTES):
+    por = list(por)
+    validas = trades[trades["ret"].notna()].copy()
+    if validas.empty:
+        return pd.DataFrame(columns=por + ["n_trades"])
+    validas["gana"] = validas["ret"] > 0
+    validas["ganancia"] = validas["ret"].clip(lower=0)
+    validas["perdida"] = -validas["ret"].clip(upper=0)
+    g = validas.groupby(por)
+    tabla = g.agg(
+        n_trades=("ret", "size"),
+        n_buy=("signal", lambda s: int((s == "buy").sum())),
+        winrate=("gana", "mean"),
+        avg_ret=("ret", "mean"),
+        med_ret=("ret", "median"),
+        std_ret=("ret", "std"),
+        suma_ganancias=("ganancia", "sum"),
+        suma_perdidas=("perdida", "sum"),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tabla["sharpe"] = tabla["avg_ret"] / tabla["std_ret"]
+        tabla["profit_factor"] = tabla["suma_ganancias"] / tabla["suma_perdidas"]
+    tabla["score"] = tabla["avg_ret"] * tabla["winrate"]
+    tabla = tabla.join(_max_drawdown(validas, por))
+    for h in horizontes:
+        col = f"ret_fwd_{h}"
+        if col in validas.columns:
+            tabla[f"avg_fwd_{h}"] = g[col].mean()
+            tabla[f"hit_fwd_{h}"] = (validas[col] > 0).groupby([validas[c] for c in por]).mean()
+    tabla = tabla.drop(columns=["suma_ganancias", "suma_perdidas"])
+    return tabla.sort_values("score", ascending=False).reset_index()
+
+# === CACHE ===
+def clave_datos(simbolo):
+    manifest = cargar_manifest(simbolo)
+    if manifest is not None:
+        return f"{manifest['filas']}_{manifest['max_fecha']}"
+    # Sin migrar: cualquier reescritura del parquet cambia su tamaño o su mtime
+    legacy = historico.LEGACY_PATH / f"{simbolo}.parquet"
+    if legacy.exists():
+        info = legacy.stat()
+        return f"legacy_{info.st_size}_{info.st_mtime_ns}"
+    return "sin_datos"
+
+def clave_cache(simbolo, versiones, config):
+    texto = json.dumps([clave_datos(simbolo), versiones, config], sort_keys=True, default=str)
+    return hashlib.md5(texto.encode()).hexdigest()[:12]
+
+# === POR SIMBOLO ===
+_config = None
+
+def _inicializar(config):
+    global _config
+    _config = config
+
+def _senales_estrategias(simbolo, df, registro, nombres):
+    frames = []
+    for nombre in nombres:
+        df_out = registro.funcion(nombre)(df.copy())
+        if df_out is not None and not df_out.empty:
+            frames.append(df_out[["fecha", "signal", "estrategia"]])
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["fecha", "signal", "estrategia"])
+
+def backtest_simbolo(simbolo, config=None):
+    config = config or _config
+    parametros = {k: config[k] for k in ["horizontes", "tp", "sl", "dias", "comision"]}
+    if config["fuente"] == "dataset":
+        from my_modules.senales import leer_senales
+        senales = leer_senales(simbolos=[simbolo], estrategias=config["estrategias"])
+        versiones = hashlib.md5(pd.util.hash_pandas_object(senales.astype(str), index=False)
+                                .to_numpy().tobytes()).hexdigest()
+    else:
+        registro = RegistroEstrategias()
+        nombres = config["estrategias"] or registro.nombres()
+        versiones = {n: registro.entradas[n]["version"] for n in nombres}
+        senales = None
+
+    ruta = Path(config["cache"]) / f"{simbolo}_{clave_cache(simbolo, versiones, parametros)}.parquet"
+    if ruta.exists():
+        return pd.read_parquet(ruta), "cache"
+
+    df = load_history(simbolo, columns=["open", "high", "low", "close", "volume"])
+    if df.empty:
+        return None, "sin datos"
+    if senales is None:
+        senales = _senales_estrategias(simbolo, df, registro, nombres)
+    trades = operaciones(df, senales, **parametros)
+    trades.insert(1, "simbolo", simbolo)
+
+    # Las claves anteriores del simbolo quedan obsoletas
+    for vieja in Path(config["cache"]).glob(f"{simbolo}_*.parquet"):
+        vieja.unlink(missing_ok=True)
+    tmp = ruta.with_suffix(f".tmp{os.getpid()}")
+    trades.to_parquet(tmp, index=False)
+    os.replace(tmp, ruta)
+    return trades, "ok"
+
+def _backtest(simbolo):
+    try:
+        return simbolo, *backtest_simbolo(simbolo)
+    except Exception as e:
+        return simbolo, None, f"error: {e}"
+
+def ejecutar_backtest(simbolos=None, estrategias=None, fuente="estrategias", workers=1, horizontes=HORIZONTES,
+                      tp=TP_PCT, sl=SL_PCT, dias=DIAS_MAX, comision=COMISION, cache=CACHE_PATH):
+    Path(cache).mkdir(parents=True, exist_ok=True)
+    config = {"fuente": fuente, "estrategias": estrategias, "horizontes": list(horizontes), "tp": tp, "sl": sl,
+              "dias": dias, "comision": comision, "cache": str(cache)}
+    simbolos = simbolos or listar_simbolos()
+    frames, conteo = [], {}
+
+    def _registrar(simbolo, trades, estado):
+        conteo[estado.split(":")[0]] = conteo.get(estado.split(":")[0], 0) + 1
+        if trades is not None and not trades.empty:
+            frames.append(trades)
+        elif estado.startswith("error"):
+            print(f"[ERROR] {simbolo} {estado}")
+
+    if workers > 1:
+        with Pool(workers, initializer=_inicializar, initargs=(config,)) as pool:
+            for resultado in pool.imap_unordered(_backtest, simbolos, chunksize=max(1, len(simbolos) // (workers * 8))):
+                _registrar(*resultado)
+    else:
+        _inicializar(config)
+        for simbolo in simbolos:
+            _registrar(*_backtest(simbolo))
+
+    trades = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if estrategias and not trades.empty:
+        trades = trades[trades["estrategia"].isin(estrategias)]
+    return trades, conteo
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Backtest vectorizado de señales")
+    parser.add_argument("--fuente", choices=["estrategias", "dataset"], default="estrategias",
+                        help="estrategias: las ejecuta sobre el historico; dataset: lee las señales guardadas")
+    parser.add_argument("--estrategias", nargs="*", default=None)
+    parser.add_argument("--simbolos", nargs="*", default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--horizontes", nargs="*", type=int, default=HORIZONTES)
+    parser.add_argument("--tp", type=float, default=TP_PCT)
+    parser.add_argument("--sl", type=float, default=SL_PCT)
+    parser.add_argument("--dias", type=int, default=DIAS_MAX, help="barras maximas por operacion")
+    parser.add_argument("--comision", type=float, default=COMISION)
+    args = parser.parse_args()
+
+    inicio = datetime.now()
+    trades, conteo = ejecutar_backtest(args.simbolos, args.estrategias, args.fuente, args.workers, args.horizontes,
+                                       args.tp, args.sl, args.dias, args.comision)
+    dur = round((datetime.now() - inicio).total_seconds(), 2)
+    print(f"{len(trades)} operaciones en {dur}s - " + " - ".join(f"{k}: {v}" for k, v in sorted(conteo.items())))
+    if trades.empty:
+        return
+
+    hoy = datetime.now().date()
+    por_estrategia = estadisticas(trades, ["estrategia"], args.horizontes)
+    por_simbolo = estadisticas(trades, ["estrategia", "simbolo"], args.horizontes)
+    trades.to_parquet(BACKTEST_PATH / f"operaciones_{hoy}.parquet", index=False)
+    por_estrategia.to_csv(BACKTEST_PATH / f"estrategias_{hoy}.csv", index=False)
+    por_simbolo.to_csv(BACKTEST_PATH / f"estrategia_simbolo_{hoy}.csv", index=False)
+    print(por_estrategia.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# /home/ubuntu/tr/my_modules/barrido.py
+"""
+Barrido de parametros (grid search) de estrategias, vectorizado por simbolo.
+
+La estrategia expone generar_senales_barrido(df, combinaciones), que calcula los
+indicadores compartidos una vez y devuelve una matriz int8 (barras x combinaciones)
+con HOLD/BUY/SELL. El resultado de cada operacion (entrada al cierre de la señal,
+salida por TP, SL o a las `dias` barras, my_modules/backtest.py) no
+depende de la combinacion: se calcula una vez por barra y las estadisticas de
+todas las combinaciones salen de productos matriciales.
+
+Los simbolos se reparten entre procesos. Cada simbolo terminado se guarda como
+checkpoint (reports/barrido/<estrategia>_<clave>/<SIMBOLO>/<datos>.npz), de modo
+que un barrido interrumpido continua donde se quedo. <datos> identifica el
+historico usado (filas y ultima fecha, como en backtest.py): si llegan barras
+nuevas el checkpoint no se reutiliza. Al final se escribe ranking.csv.
+
+Uso:
+    python -m my_modules.barrido bollinger_breakout_v4 --workers 8
+    python -m my_modules.barrido gap_open_strategy_v5 --grid '{"umbral_gap": [0.03, 0.04]}'
+    python -m my_modules.barrido bollinger_breakout_v4 --verificar AAPL
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from datetime import datetime
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules.backtest import DIAS_MAX, SL_PCT, TP_PCT, clave_datos, resultados_operacion
+from my_modules.historico import listar_simbolos, load_history
+from my_modules.registro_estrategias import RegistroEstrategias
+
+# === CONFIGURACION ===
+BARRIDO_PATH = Path("/home/ubuntu/tr/reports/barrido")
+TOP = 20
+
+# === COMBINACIONES ===
+def expandir_grid(grid):
+    claves = list(grid)
+    return [dict(zip(claves, valores)) for valores in itertools.product(*(grid[c] for c in claves))]
+
+def clave_barrido(estrategia, version, combinaciones, tp, sl, dias):
+    texto = json.dumps([estrategia, version, combinaciones, tp, sl, dias], sort_keys=True, default=str)
+    return hashlib.md5(texto.encode()).hexdigest()[:10]
+
+# === ESTADISTICAS POR COMBINACION ===
+def acumular(codigos, ret_buy, ret_sell):
+    # Sumas por combinacion: n, ganadoras, suma y suma de cuadrados de retornos
+    validos_buy = ~np.isnan(ret_buy)
+    validos_sell = ~np.isnan(ret_sell)
+    compra = ((codigos == 1) & validos_buy[:, None]).astype("float64")
+    venta = ((codigos == -1) & validos_sell[:, None]).astype("float64")
+    rb, rs = np.nan_to_num(ret_buy), np.nan_to_num(ret_sell)
+    return {
+        "n": compra.sum(axis=0) + venta.sum(axis=0),
+        "ganadoras": compra.T @ (rb > 0) + venta.T @ (rs > 0),
+        "suma": compra.T @ rb + venta.T @ rs,
+        "suma2": compra.T @ (rb * rb) + venta.T @ (rs * rs),
+    }
+
+# === WORKER ===
+_config = None
+
+def _inicializar(config):
+    global _config
+    _config = config
+
+def barrer_simbolo(simbolo, config=None):
+    config = config or _config
+    checkpoint = Path(config["directorio"]) / simbolo / f"{clave_datos(simbolo)}.npz"
+    if checkpoint.exists():
+        with np.load(checkpoint) as datos:
+            return simbolo, {k: datos[k] for k in datos.files}, "checkpoint"
+    registro = RegistroEstrategias()
+    modulo = registro.modulo(config["estrategia"])
+    df = load_history(simbolo, columns=registro.entradas[config["estrategia"]]["columnas"])
+    if df.empty:
+        return simbolo, None, "sin datos"
+    codigos = modulo.generar_senales_barrido(df, config["combinaciones"])
+    ret_buy, ret_sell = resultados_operacion(df, config["tp"], config["sl"], config["dias"])
+    acumulado = acumular(codigos, ret_buy, ret_sell)
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    tmp = checkpoint.with_suffix(f".tmp{os.getpid()}.npz")
+    np.savez(tmp, **acumulado)
+    os.replace(tmp, checkpoint)
+    # Checkpoints de datos anteriores del simbolo: ya no se van a usar
+    for viejo in checkpoint.parent.glob("*.npz"):
+        if viejo != checkpoint and ".tmp" not in viejo.name:
+            viejo.unlink(missing_ok=True)
+    return simbolo, acumulado, "ok"
+
+def _barrer(simbolo):
+    try:
+        return barrer_simbolo(simbolo)
+    except Exception as e:
+        return simbolo, None, f"error: {e}"
+
+# === RANKING ===
+def ranking(combinaciones, total):
+    tabla = pd.DataFrame(combinaciones)
+    n = total["n"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = total["suma"] / n
+        varianza = (total["suma2"] - n * media ** 2) / (n - 1)
+        tabla["n_trades"] = n.astype(int)
+        tabla["winrate"] = total["ganadoras"] / n
+        tabla["avg_ret"] = media
+        tabla["std_ret"] = np.sqrt(np.maximum(varianza, 0))
+        tabla["sharpe"] = media / tabla["std_ret"]
+    tabla["score"] = (tabla["avg_ret"] * tabla["winrate"]).where(tabla["n_trades"] > 0, -999)
+    return tabla.sort_values(["score", "n_trades"], ascending=False).reset_index(drop=True)
+
+def ejecutar_barrido(estrategia, grid=None, simbolos=None, workers=1, tp=TP_PCT, sl=SL_PCT, dias=DIAS_MAX,
+                     base=BARRIDO_PATH):
+    registro = RegistroEstrategias()
+    modulo = registro.modulo(estrategia)
+    if not hasattr(modulo, "generar_senales_barrido"):
+        raise ValueError(f"{estrategia} no define generar_senales_barrido")
+    combinaciones = expandir_grid(grid or modulo.GRID_BARRIDO)
+    clave = clave_barrido(estrategia, registro.entradas[estrategia]["version"], combinaciones, tp, sl, dias)
+    directorio = Path(base) / f"{estrategia}_{clave}"
+    directorio.mkdir(parents=True, exist_ok=True)
+    with open(directorio / "config.json", "w") as f:
+        json.dump({"estrategia": estrategia, "combinaciones": combinaciones, "tp": tp, "sl": sl, "dias": dias},
+                  f, indent=1, default=str)
+
+    config = {"estrategia": estrategia, "combinaciones": combinaciones, "tp": tp, "sl": sl, "dias": dias,
+              "directorio": str(directorio)}
+    simbolos = simbolos or listar_simbolos()
+    total = {k: np.zeros(len(combinaciones)) for k in ["n", "ganadoras", "suma", "suma2"]}
+    conteo = {}
+    inicio = datetime.now()
+
+    if workers > 1:
+        with Pool(workers, initializer=_inicializar, initargs=(config,)) as pool:
+            resultados = pool.imap_unordered(_barrer, simbolos, chunksize=max(1, len(simbolos) // (workers * 8)))
+            for simbolo, acumulado, estado in resultados:
+                conteo[estado.split(":")[0]] = conteo.get(estado.split(":")[0], 0) + 1
+                if acumulado is not None:
+                    for k in total:
+                        total[k] += acumulado[k]
+                elif estado.startswith("error"):
+                    print(f"[ERROR] {simbolo} {estado}")
+    else:
+        _inicializar(config)
+        for simbolo in simbolos:
+            simbolo, acumulado, estado = _barrer(simbolo)
+            conteo[estado.split(":")[0]] = conteo.get(estado.split(":")[0], 0) + 1
+            if acumulado is not None:
+                for k in total:
+                    total[k] += acumulado[k]
+            elif estado.startswith("error"):
+                print(f"[ERROR] {simbolo} {estado}")
+
+    tabla = ranking(combinaciones, total)
+    tabla.to_csv(directorio / "ranking.csv", index=False)
+    dur = round((datetime.now() - inicio).total_seconds(), 2)
+    print(f"{len(combinaciones)} combinaciones x {len(simbolos)} simbolos en {dur}s - "
+          + " - ".join(f"{k}: {v}" for k, v in sorted(conteo.items())))
+    return tabla, directorio
+
+# === VERIFICACION ===
+def verificar(estrategia, simbolo, grid=None):
+    # Compara cada columna de la version barrido con generar_senales(df, **params)
+    registro = RegistroEstrategias()
+    modulo = registro.modulo(estrategia)
+    combinaciones = expandir_grid(grid or modulo.GRID_BARRIDO)
+    df = load_history(simbolo, columns=registro.entradas[estrategia]["columnas"])
+    codigos = modulo.generar_senales_barrido(df, combinaciones)
+    nombres = np.array(["sell", "hold", "buy"], dtype=object)
+    distintas = 0
+    for j, params in enumerate(combinaciones):
+        esperado = modulo.generar_senales(df.copy(), **params)["signal"].to_numpy()
+        if not np.array_equal(nombres[codigos[:, j].astype(np.int64) + 1], esperado):
+            distintas += 1
+            print(f"[DIFF] {params}")
+    print(f"{len(combinaciones) - distintas} de {len(combinaciones)} combinaciones identicas en {simbolo}")
+    return distintas == 0
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de parametros de estrategias")
+    parser.add_argument("estrategia")
+    parser.add_argument("--grid", default=None, help="JSON {parametro: [valores]} (por defecto GRID_BARRIDO)")
+    parser.add_argument("--simbolos", nargs="*", default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tp", type=float, default=TP_PCT)
+    parser.add_argument("--sl", type=float, default=SL_PCT)
+    parser.add_argument("--dias", type=int, default=DIAS_MAX, help="barras maximas por operacion")
+    parser.add_argument("--top", type=int, default=TOP)
+    parser.add_argument("--verificar", default=None, metavar="SIMBOLO",
+                        help="compara la version barrido con generar_senales en un simbolo")
+    args = parser.parse_args()
+    grid = json.loads(args.grid) if args.grid else None
+
+    if args.verificar:
+        raise SystemExit(0 if verificar(args.estrategia, args.verificar, grid) else 1)
+
+    tabla, directorio = ejecutar_barrido(args.estrategia, grid, args.simbolos, args.workers,
+                                         args.tp, args.sl, args.dias)
+    print(tabla.head(args.top).to_string(index=False))
+    print(f"Ranking completo en {directorio / 'ranking.csv'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# /home/ubuntu/tr/my_modules/features.py
+"""
+Almacen de features con historico completo, particionado por fecha:
+
+    data/features/historico/fecha=AAAA-MM-DD/*.parquet   (simbolo, features)
+
+- actualizar(): añade las barras posteriores a la ultima fecha guardada de cada
+  simbolo (_ultimas.json) calculando solo esas barras mas su calentamiento
+  (WARMUP). Con una sola barra pendiente usa el panel reciente mapeado en
+  memoria, sin leer historicos. Un simbolo que llega tarde a una fecha se añade
+  a esa particion en la siguiente ejecucion.
+- backfill(): construye años de historia para todo el universo de una vez, con
+  las features del registro (my_modules/registro_features.py) calculadas sobre el
+  panel barras x simbolos (my_modules.panel).
+- leer_features() lee un rango de fechas (solo abre esas particiones) y foto()
+  devuelve la ultima fila conocida de cada simbolo a una fecha (point-in-time,
+  sin mirar datos posteriores).
+
+Uso:
+    python -m my_modules.features backfill [--desde 2015-01-01] [--hasta ...]
+    python -m my_modules.features actualizar
+    python -m my_modules.features leer --desde 2025-01-01 --hasta 2025-03-31
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules import panel as pn
+from my_modules import registro_features as rf
+from my_modules.historico import listar_simbolos
+
+# === CONFIGURACION ===
+FEATURES_PATH = Path("/home/ubuntu/tr/data/features/historico")
+FEATURES = rf.features_registradas()
+WARMUP = rf.calentamiento(FEATURES)   # barras que necesita la feature mas larga (pos_rango_60)
+LOTE_SIMBOLOS = 500   # simbolos por panel en el backfill (acota la memoria)
+ULTIMAS_NOMBRE = "_ultimas.json"   # simbolo -> ultima fecha guardada ("_": el dataset lo ignora)
+PARTICION = ds.partitioning(pa.schema([("fecha", pa.date32())]), flavor="hive")
+
+# === CALCULO SOBRE EL PANEL ===
+def calcular_features(panel, nombres=None):
+    # Features del registro (todas o solo `nombres`) para todos los simbolos: nombre -> (barras, simbolos)
+    return rf.calcular(panel, nombres or FEATURES)
+
+def a_largo(panel, matrices, desde=None, hasta=None, completas=True):
+    """
+    Filas (simbolo, fecha, features) de las barras reales del panel entre desde y
+    hasta. Con completas=True se descartan las barras sin calentamiento suficiente.
+    """
+    mascara = panel.valido.copy()
+    if completas:
+        # Barra i de un simbolo con al menos WARMUP barras propias hasta ella
+        fila = np.arange(panel.forma[0])[:, None]
+        mascara &= fila - panel.inicio[None, :] >= WARMUP - 1
+    if desde is not None:
+        mascara &= panel.fechas >= np.datetime64(pd.Timestamp(desde).date(), "D")
+    if hasta is not None:
+        mascara &= panel.fechas <= np.datetime64(pd.Timestamp(hasta).date(), "D")
+    filas, columnas = np.nonzero(mascara)
+    df = pd.DataFrame({
+        "simbolo": np.array(panel.simbolos, dtype=object)[columnas],
+        "fecha": panel.fechas[filas, columnas].astype(object),
+    })
+    for nombre, matriz in matrices.items():
+        df[nombre] = matriz[filas, columnas]
+    return df.sort_values(["fecha", "simbolo"], kind="stable").reset_index(drop=True)
+
+# === ESCRITURA ===
+def _tabla(df):
+    datos = {"fecha": pa.array(pd.to_datetime(df["fecha"]).values.astype("datetime64[D]"), type=pa.date32()),
+             "simbolo": pa.array(df["simbolo"].astype(str).to_numpy(dtype=object)).dictionary_encode()}
+    for c in df.columns:
+        if c not in datos:
+            datos[c] = pa.array(df[c].to_numpy(dtype="float64"), type=pa.float64())
+    return pa.table(datos)
+
+def escribir_features(df, base=FEATURES_PATH, reemplazar=True):
+    # reemplazar=True sustituye las particiones de las fechas de df; False añade archivos
+    if df.empty:
+        return 0
+    Path(base).mkdir(parents=True, exist_ok=True)
+    ds.write_dataset(
+        _tabla(df), str(base), format="parquet", partitioning=PARTICION,
+        existing_data_behavior="delete_matching" if reemplazar else "overwrite_or_ignore",
+        basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        max_partitions=100_000,
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+    return len(df)
+
+def fusionar_features(df, base=FEATURES_PATH):
+    # Reescribe las particiones de las fechas de df con sus filas previas mas las de df
+    n = len(df)
+    if n == 0:
+        return 0
+    fechas = sorted(set(df["fecha"]))
+    previas = leer_features(fechas[0], fechas[-1], base=base)
+    previas = previas[previas["fecha"].isin(fechas)]
+    if not previas.empty:
+        df = pd.concat([previas, df], ignore_index=True).drop_duplicates(["simbolo", "fecha"], keep="last")
+    escribir_features(df, base, reemplazar=True)
+    return n
+
+def borrar_fechas(desde=None, hasta=None, base=FEATURES_PATH):
+    for fecha in fechas_disponibles(base):
+        if (desde is None or fecha >= str(desde)) and (hasta is None or fecha <= str(hasta)):
+            shutil.rmtree(Path(base) / f"fecha={fecha}")
+
+# === ULTIMA FECHA POR SIMBOLO ===
+def ultimas_fechas(base=FEATURES_PATH):
+    # simbolo -> ultima fecha guardada (AAAA-MM-DD); sin archivo se deduce del almacen
+    path = Path(base) / ULTIMAS_NOMBRE
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return _deducir_ultimas(base)
+
+def _deducir_ultimas(base=FEATURES_PATH):
+    if not fechas_disponibles(base):
+        return {}
+    df = leer_features(columnas=[], base=base)
+    return {s: str(f) for s, f in df.groupby("simbolo")["fecha"].max().items()}
+
+def guardar_ultimas(ultimas, base=FEATURES_PATH):
+    path = Path(base) / ULTIMAS_NOMBRE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(ultimas, f, sort_keys=True)
+    os.replace(tmp, path)
+
+# === LECTURA ===
+def fechas_disponibles(base=FEATURES_PATH):
+    return sorted(p.name.split("=", 1)[1] for p in Path(base).glob("fecha=*") if p.is_dir())
+
+def _escalar(fecha):
+    return pa.scalar(pd.Timestamp(fecha).date(), pa.date32())
+
+def leer_features(desde=None, hasta=None, simbolos=None, columnas=None, base=FEATURES_PATH):
+    if not Path(base).exists():
+        return pd.DataFrame(columns=["simbolo", "fecha"] + (columnas or FEATURES))
+    dataset = ds.dataset(str(base), format="parquet", partitioning=PARTICION)
+    filtro = ds.scalar(True)
+    if desde is not None:
+        filtro &= ds.field("fecha") >= _escalar(desde)
+    if hasta is not None:
+        filtro &= ds.field("fecha") <= _escalar(hasta)
+    if simbolos is not None:
+        filtro &= ds.field("simbolo").isin(list(simbolos))
+    nombres = ["simbolo", "fecha"] + [c for c in (FEATURES if columnas is None else columnas) if c in dataset.schema.names]
+    df = dataset.to_table(columns=nombres, filter=filtro).to_pandas(date_as_object=True)
+    df["simbolo"] = df["simbolo"].astype(str)
+    return df.sort_values(["fecha", "simbolo"], kind="stable").reset_index(drop=True)
+
+def foto(fecha, simbolos=None, columnas=None, dias_max=10, base=FEATURES_PATH):
+    # Ultima fila de cada simbolo con fecha <= `fecha` (mirando hasta dias_max dias atras)
+    fecha = pd.Timestamp(fecha).date()
+    desde = fecha - pd.Timedelta(days=dias_max)
+    df = leer_features(desde, fecha, simbolos, columnas, base)
+    return df.groupby("simbolo", sort=True).tail(1).reset_index(drop=True)
+
+# === BACKFILL ===
+def backfill(simbolos=None, desde=None, hasta=None, lote=LOTE_SIMBOLOS, base=FEATURES_PATH):
+    """
+    Reconstruye el rango [desde, hasta] para todo el universo: un panel por lote de
+    simbolos, features vectorizadas y escritura por fecha. Devuelve filas escritas.
+    """
+    simbolos = simbolos or listar_simbolos()
+    borrar_fechas(desde, hasta, base)
+    total = 0
+    for i in range(0, len(simbolos), lote):
+        panel = pn.cargar_panel(simbolos[i:i + lote], columnas=rf.columnas(FEATURES))
+        df = a_largo(panel, calcular_features(panel), desde, hasta)
+        # Cada lote aporta filas a las mismas fechas: se añaden archivos, no se reemplazan
+        total += escribir_features(df, base, reemplazar=False)
+    guardar_ultimas(_deducir_ultimas(base), base)
+    return total
+
+# === INCREMENTAL ===
+def _limites(simbolos, ultimas):
+    # Ultima fecha guardada de cada simbolo como datetime64[D] (NaT si no tiene filas)
+    return np.array([np.datetime64(ultimas.get(s, "NaT"), "D") for s in simbolos])
+
+def pendientes(panel, ultimas):
+    # Barras posteriores a la ultima fecha guardada de cada simbolo (maximo entre simbolos).
+    # Los simbolos sin filas en el almacen no cuentan: actualizar() los carga completos
+    if not ultimas:
+        return None
+    nuevas = panel.valido & (panel.fechas > _limites(panel.simbolos, ultimas)[None, :])
+    return int(nuevas.sum(axis=0).max()) if nuevas.size else 0
+
+def actualizar(panel_diario=None, simbolos=None, base=FEATURES_PATH):
+    """
+    Añade al almacen las barras posteriores a la ultima fecha guardada de cada
+    simbolo. `panel_diario` (p. ej. el panel reciente de fea.py) se usa si cubre el
+    calentamiento de todas las barras pendientes; si no, se carga del historico
+    solo lo necesario. Los simbolos sin filas en el almacen se cargan con toda su
+    historia. Devuelve (filas nuevas, matrices del panel usado, panel usado).
+    """
+    ultimas = ultimas_fechas(base)
+    panel = panel_diario
+    n = pendientes(panel, ultimas) if panel is not None else None
+    completo = False
+    if panel is None or n is None or WARMUP - 1 + n > panel.forma[0]:
+        simbolos = simbolos or (panel.simbolos if panel is not None else listar_simbolos())
+        filas = None if n is None else WARMUP - 1 + max(n, 1)
+        panel = pn.cargar_panel(simbolos, columnas=rf.columnas(FEATURES), ultimas=filas)
+        completo = filas is None
+    matrices = calcular_features(panel)
+    df = a_largo(panel, matrices)
+    limite = pd.to_datetime(df["simbolo"].map(ultimas))
+    nuevas = pd.to_datetime(df["fecha"]) > limite
+    df_nuevas = [df[nuevas | limite.isna()] if completo else df[nuevas]]
+
+    # Con un panel de solo las ultimas barras, los simbolos nuevos no tienen toda su historia
+    nuevos = [s for s in panel.simbolos if s not in ultimas]
+    if nuevos and not completo:
+        panel_nuevos = pn.cargar_panel(nuevos, columnas=rf.columnas(FEATURES))
+        df_nuevas.append(a_largo(panel_nuevos, calcular_features(panel_nuevos)))
+    df = pd.concat(df_nuevas, ignore_index=True).sort_values(["fecha", "simbolo"], kind="stable")
+
+    fusionar_features(df, base)
+    if not df.empty:
+        ultimas.update({s: str(f) for s, f in df.groupby("simbolo")["fecha"].max().items()})
+        guardar_ultimas(ultimas, base)
+    return df.reset_index(drop=True), matrices, panel
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Almacen de features por fecha")
+    parser.add_argument("accion", choices=["backfill", "actualizar", "leer"])
+    parser.add_argument("--desde", default=None)
+    parser.add_argument("--hasta", default=None)
+    parser.add_argument("--fecha", default=None, help="leer: foto point-in-time a esta fecha")
+    parser.add_argument("--simbolos", nargs="*", default=None)
+    args = parser.parse_args()
+
+    if args.accion == "backfill":
+        print(f"{backfill(args.simbolos, args.desde, args.hasta)} filas escritas")
+    elif args.accion == "actualizar":
+        df, _, _ = actualizar(simbolos=args.simbolos)
+        print(f"{len(df)} filas nuevas ({df['fecha'].nunique() if len(df) else 0} fechas)")
+    else:
+        df = foto(args.fecha, args.simbolos) if args.fecha else leer_features(args.desde, args.hasta, args.simbolos)
+        print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
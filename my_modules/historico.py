@@ -0,0 +1,274 @@
+# /home/ubuntu/tr/my_modules/historico.py
+"""
+Almacen de historicos particionado por simbolo/año, solo de escritura incremental.
+
+Estructura:
+    data/historic_part/<SIMBOLO>/_manifest.json
+    data/historic_part/<SIMBOLO>/<AAAA>/part-<ts>.parquet
+
+upd.py añade las barras nuevas como particiones pequeñas (append_bars) y
+compactar() fusiona periodicamente las partes de cada año en un solo archivo.
+Las partes sustituidas no se borran en el acto: quedan en "obsoletas" del
+manifest y las borra una compactacion posterior pasado GRACIA_BORRADO, para que
+un lector que cargo el manifest anterior pueda terminar su lectura.
+Los consumidores leen con load_history(simbolo, start, end), que solo abre
+las particiones que solapan el rango pedido.
+
+Si un simbolo aun no tiene manifest se lee (y se migra al escribir) el
+parquet completo antiguo de data/historic/<SIMBOLO>.parquet.
+
+Uso:
+    python -m my_modules.historico compactar [--simbolo AAPL]
+    python -m my_modules.historico migrar [--simbolo AAPL]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# === CONFIGURACION ===
+STORE_PATH = Path("/home/ubuntu/tr/data/historic_part")
+LEGACY_PATH = Path("/home/ubuntu/tr/data/historic")
+MANIFEST = "_manifest.json"
+GRACIA_BORRADO = 3600   # segundos que sigue en disco una parte sustituida por compactar()
+
+# === UTILIDADES ===
+def _a_fecha(valor):
+    if valor is None or isinstance(valor, date) and not isinstance(valor, datetime):
+        return valor
+    return pd.Timestamp(valor).date()
+
+def _dir_simbolo(simbolo, base=None):
+    return Path(base or STORE_PATH) / simbolo
+
+def cargar_manifest(simbolo, base=None):
+    ruta = _dir_simbolo(simbolo, base) / MANIFEST
+    if not ruta.exists():
+        return None
+    with open(ruta, "r") as f:
+        return json.load(f)
+
+def _guardar_manifest(simbolo, manifest, base=None):
+    # Escritura atomica: un lector nunca ve un manifest a medias
+    ruta = _dir_simbolo(simbolo, base) / MANIFEST
+    tmp = ruta.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, ruta)
+
+def _manifest_vacio(simbolo):
+    return {"simbolo": simbolo, "filas": 0, "min_fecha": None, "max_fecha": None, "particiones": {}}
+
+def _recalcular(manifest):
+    partes = [p for lista in manifest["particiones"].values() for p in lista]
+    manifest["filas"] = sum(p["filas"] for p in partes)
+    manifest["min_fecha"] = min((p["min"] for p in partes), default=None)
+    manifest["max_fecha"] = max((p["max"] for p in partes), default=None)
+    return manifest
+
+def _normalizar(df):
+    df = df[df["fecha"].notna()].copy()
+    df["fecha"] = pd.to_datetime(df["fecha"]).dt.date
+    return df
+
+def listar_simbolos(base=None):
+    base = Path(base or STORE_PATH)
+    simbolos = {p.parent.name for p in base.glob(f"*/{MANIFEST}")}
+    # Simbolos aun no migrados
+    simbolos |= {p.stem for p in LEGACY_PATH.glob("*.parquet")}
+    return sorted(simbolos)
+
+def filas(simbolo, base=None):
+    manifest = cargar_manifest(simbolo, base)
+    return manifest["filas"] if manifest else None
+
+def columnas(simbolo, base=None):
+    # Columnas de la parte mas reciente: solo se lee el footer del parquet
+    manifest = cargar_manifest(simbolo, base)
+    if manifest is None:
+        ruta = LEGACY_PATH / f"{simbolo}.parquet"
+        if not ruta.exists():
+            return None
+    else:
+        partes = [p for lista in manifest["particiones"].values() for p in lista]
+        if not partes:
+            return None
+        ruta = _dir_simbolo(simbolo, base) / max(partes, key=lambda p: p["max"])["archivo"]
+    return pq.read_schema(ruta).names
+
+# === ESCRITURA ===
+def _escribir_parte(simbolo, anio, df, base=None):
+    dir_anio = _dir_simbolo(simbolo, base) / str(anio)
+    dir_anio.mkdir(parents=True, exist_ok=True)
+    nombre = f"part-{time.strftime('%Y%m%d%H%M%S')}-{time.perf_counter_ns() % 10**9:09d}.parquet"
+    df = df.sort_values("fecha").reset_index(drop=True)
+    df.to_parquet(dir_anio / nombre, index=False)
+    return {
+        "archivo": f"{anio}/{nombre}",
+        "min": df["fecha"].iloc[0].isoformat(),
+        "max": df["fecha"].iloc[-1].isoformat(),
+        "filas": len(df),
+    }
+
+def migrar_legacy(simbolo, base=None):
+    legacy = LEGACY_PATH / f"{simbolo}.parquet"
+    if cargar_manifest(simbolo, base) is not None or not legacy.exists():
+        return False
+    df = _normalizar(pd.read_parquet(legacy)).drop_duplicates("fecha")
+    manifest = _manifest_vacio(simbolo)
+    _dir_simbolo(simbolo, base).mkdir(parents=True, exist_ok=True)
+    for anio, grupo in df.groupby(pd.to_datetime(df["fecha"]).dt.year):
+        manifest["particiones"][str(anio)] = [_escribir_parte(simbolo, anio, grupo, base)]
+    _guardar_manifest(simbolo, _recalcular(manifest), base)
+    return True
+
+def fechas_existentes(simbolo, start=None, end=None, base=None):
+    df = load_history(simbolo, start, end, columns=["fecha"], base=base)
+    return set(df["fecha"]) if not df.empty else set()
+
+def append_bars(simbolo, df, base=None):
+    """
+    Añade las barras de `df` cuya fecha no este ya almacenada. Escribe una parte
+    nueva por año afectado y actualiza el manifest. Devuelve las rutas escritas.
+    """
+    migrar_legacy(simbolo, base)
+    df = _normalizar(df).drop_duplicates("fecha")
+    if df.empty:
+        return []
+    existentes = fechas_existentes(simbolo, df["fecha"].min(), df["fecha"].max(), base)
+    df = df[~df["fecha"].isin(existentes)]
+    if df.empty:
+        return []
+
+    manifest = cargar_manifest(simbolo, base) or _manifest_vacio(simbolo)
+    _dir_simbolo(simbolo, base).mkdir(parents=True, exist_ok=True)
+    rutas = []
+    for anio, grupo in df.groupby(pd.to_datetime(df["fecha"]).dt.year):
+        parte = _escribir_parte(simbolo, anio, grupo, base)
+        manifest["particiones"].setdefault(str(anio), []).append(parte)
+        rutas.append(_dir_simbolo(simbolo, base) / parte["archivo"])
+    _guardar_manifest(simbolo, _recalcular(manifest), base)
+    return rutas
+
+def _barrer_obsoletas(simbolo, manifest, base=None, ahora=None):
+    # Borra las partes sustituidas hace mas de GRACIA_BORRADO; devuelve cuantas borro
+    ahora = time.time() if ahora is None else ahora
+    quedan, borradas = [], 0
+    for o in manifest.get("obsoletas", []):
+        if ahora - o["desde"] >= GRACIA_BORRADO:
+            (_dir_simbolo(simbolo, base) / o["archivo"]).unlink(missing_ok=True)
+            borradas += 1
+        else:
+            quedan.append(o)
+    manifest["obsoletas"] = quedan
+    return borradas
+
+def compactar(simbolo, base=None):
+    # Fusiona en un unico archivo las partes de cada año que tenga mas de una
+    manifest = cargar_manifest(simbolo, base)
+    if manifest is None:
+        return 0
+    dir_simbolo = _dir_simbolo(simbolo, base)
+    compactados = 0
+    if _barrer_obsoletas(simbolo, manifest, base):
+        _guardar_manifest(simbolo, manifest, base)
+    for anio, partes in list(manifest["particiones"].items()):
+        if len(partes) < 2:
+            continue
+        df = pd.concat([pd.read_parquet(dir_simbolo / p["archivo"]) for p in partes], ignore_index=True)
+        df = _normalizar(df).sort_values("fecha").drop_duplicates("fecha", keep="last")
+        manifest["particiones"][anio] = [_escribir_parte(simbolo, anio, df, base)]
+        manifest.setdefault("obsoletas", []).extend({"archivo": p["archivo"], "desde": time.time()} for p in partes)
+        _guardar_manifest(simbolo, _recalcular(manifest), base)
+        compactados += 1
+    return compactados
+
+# === LECTURA ===
+def _leer_partes(simbolo, manifest, start, end, columns, ultimas, base=None):
+    dir_simbolo = _dir_simbolo(simbolo, base)
+    partes = sorted(
+        (p for lista in manifest["particiones"].values() for p in lista),
+        key=lambda p: p["max"], reverse=True
+    )
+    if start is not None:
+        partes = [p for p in partes if p["max"] >= start.isoformat()]
+    if end is not None:
+        partes = [p for p in partes if p["min"] <= end.isoformat()]
+
+    frames = []
+    leidas = 0
+    min_leida = None
+    for p in partes:
+        # Partes ordenadas por fecha maxima descendente: si la siguiente es anterior a
+        # todo lo leido y ya hay `ultimas` filas dentro del rango, el resto no aporta
+        if ultimas is not None and leidas >= ultimas and p["max"] < min_leida:
+            break
+        df = _normalizar(pd.read_parquet(dir_simbolo / p["archivo"], columns=columns))
+        if start is not None:
+            df = df[df["fecha"] >= start]
+        if end is not None:
+            df = df[df["fecha"] <= end]
+        frames.append(df)
+        leidas += len(df)
+        min_leida = p["min"] if min_leida is None else min(min_leida, p["min"])
+    return frames
+
+def load_history(simbolo, start=None, end=None, columns=None, ultimas=None, base=None):
+    """
+    Historico de `simbolo` entre start y end (inclusive), ordenado por fecha.
+    Solo se leen las particiones que solapan el rango. Con `ultimas=n` se devuelven
+    las n barras mas recientes del rango leyendo años hacia atras hasta completarlas.
+    """
+    start, end = _a_fecha(start), _a_fecha(end)
+    if columns is not None and "fecha" not in columns:
+        columns = ["fecha"] + list(columns)
+
+    manifest = cargar_manifest(simbolo, base)
+    if manifest is None:
+        legacy = LEGACY_PATH / f"{simbolo}.parquet"
+        if not legacy.exists():
+            return pd.DataFrame(columns=columns or [])
+        df = _normalizar(pd.read_parquet(legacy, columns=columns))
+    else:
+        try:
+            frames = _leer_partes(simbolo, manifest, start, end, columns, ultimas, base)
+        except FileNotFoundError:
+            # Manifest sustituido durante la lectura y sus partes ya barridas: se relee
+            frames = _leer_partes(simbolo, cargar_manifest(simbolo, base), start, end, columns, ultimas, base)
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        df = pd.concat(frames, ignore_index=True)
+
+    if start is not None:
+        df = df[df["fecha"] >= start]
+    if end is not None:
+        df = df[df["fecha"] <= end]
+    df = df.sort_values("fecha").drop_duplicates("fecha", keep="last").reset_index(drop=True)
+    if ultimas is not None:
+        df = df.tail(ultimas).reset_index(drop=True)
+    return df
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Almacen de historicos particionado")
+    parser.add_argument("accion", choices=["compactar", "migrar"])
+    parser.add_argument("--simbolo", default=None)
+    args = parser.parse_args()
+
+    simbolos = [args.simbolo] if args.simbolo else listar_simbolos()
+    for simbolo in simbolos:
+        if args.accion == "compactar":
+            n = compactar(simbolo)
+            if n:
+                print(f"{simbolo}: {n} años compactados")
+        elif migrar_legacy(simbolo):
+            print(f"{simbolo}: migrado")
+
+if __name__ == "__main__":
+    main()
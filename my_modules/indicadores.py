@@ -0,0 +1,136 @@
+# /home/ubuntu/tr/my_modules/indicadores.py
+"""
+Cache de indicadores por simbolo compartida entre estrategias.
+
+shu_cro.py crea una CacheIndicadores por simbolo y se la pasa a las estrategias
+que aceptan el argumento `cache`. Cada indicador se memoiza por (nombre, params),
+con contadores de hits/misses y un limite de memoria con expulsion LRU.
+
+En modo incremental las estrategias reciben una cola del frame de la cache
+(ultimas warmup + nuevas filas). compatible() tambien acepta esas colas y vista()
+devuelve los indicadores ya calculados sobre todo el frame recortados a la cola,
+con el indice 0..m-1 de la cola.
+
+Uso dentro de una estrategia:
+    if cache is not None and cache.compatible(df):
+        cache = cache.vista(df)
+        std = cache.get("std", col="close", window=20)
+"""
+
+from collections import OrderedDict
+
+# === CONFIGURACION ===
+MAX_BYTES = 64 * 1024 * 1024
+
+# === REGISTRO DE INDICADORES ===
+INDICADORES = {}
+
+def indicador(nombre):
+    def registrar(funcion):
+        INDICADORES[nombre] = funcion
+        return funcion
+    return registrar
+
+@indicador("sma")
+def _sma(df, col, window):
+    return df[col].rolling(window).mean()
+
+@indicador("std")
+def _std(df, col, window):
+    return df[col].rolling(window).std()
+
+@indicador("shift")
+def _shift(df, col, n=1):
+    return df[col].shift(n)
+
+@indicador("min")
+def _min(df, col, window):
+    return df[col].rolling(window).min()
+
+@indicador("max")
+def _max(df, col, window):
+    return df[col].rolling(window).max()
+
+@indicador("atr")
+def _atr(df, window=14):
+    import ta
+    return ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=window)
+
+@indicador("cuerpo")
+def _cuerpo(df):
+    return abs(df["close"] - df["open"])
+
+@indicador("sombra")
+def _sombra(df):
+    return abs(df["high"] - df["low"])
+
+# === CACHE ===
+class CacheIndicadores:
+    def __init__(self, df, max_bytes=MAX_BYTES):
+        # Mismo orden que usan las estrategias: por fecha y con indice 0..n-1
+        self.df = df.sort_values("fecha").reset_index(drop=True)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expulsiones = 0
+        self._valores = OrderedDict()
+
+    def _desplazamiento(self, df):
+        # Posicion de df dentro del frame cacheado: mismas filas o una cola suya
+        inicio = len(self.df) - len(df)
+        if inicio < 0:
+            return None
+        if df.empty:
+            return inicio
+        fechas = df["fecha"]
+        if fechas.iloc[0] == self.df["fecha"].iloc[inicio] and fechas.iloc[-1] == self.df["fecha"].iloc[-1]:
+            return inicio
+        return None
+
+    def compatible(self, df):
+        return self._desplazamiento(df) is not None
+
+    def vista(self, df):
+        inicio = self._desplazamiento(df)
+        if inicio is None:
+            raise ValueError("frame no alineado con la cache")
+        return self if inicio == 0 else _VistaCola(self, inicio)
+
+    def get(self, nombre, **params):
+        clave = (nombre, tuple(sorted(params.items())))
+        if clave in self._valores:
+            self.hits += 1
+            self._valores.move_to_end(clave)
+            return self._valores[clave]
+
+        self.misses += 1
+        valor = INDICADORES[nombre](self.df, **params)
+        tam = int(valor.memory_usage(index=False, deep=False))
+        if tam <= self.max_bytes:
+            self._valores[clave] = valor
+            self.bytes += tam
+            while self.bytes > self.max_bytes:
+                _, expulsado = self._valores.popitem(last=False)
+                self.bytes -= int(expulsado.memory_usage(index=False, deep=False))
+                self.expulsiones += 1
+        return valor
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "expulsiones": self.expulsiones,
+                "entradas": len(self._valores), "bytes": self.bytes}
+
+class _VistaCola:
+    # Cola de una CacheIndicadores: comparte memoizacion y contadores con ella
+    def __init__(self, cache, inicio):
+        self.cache = cache
+        self.inicio = inicio
+
+    def compatible(self, df):
+        return self.cache.compatible(df)
+
+    def vista(self, df):
+        return self.cache.vista(df)
+
+    def get(self, nombre, **params):
+        return self.cache.get(nombre, **params).iloc[self.inicio:].reset_index(drop=True)
@@ -0,0 +1,416 @@
+# /home/ubuntu/tr/my_modules/indicadores_online.py
+"""
+Indicadores online: cada kernel guarda su estado y se actualiza en O(1) por barra,
+con el mismo resultado que la version por lotes de pandas / ta.
+
+    MediaMovil(w)        rolling(w).mean() y rolling(w).std() (Welford con salida)
+    MinMaxMovil(w)       rolling(w).min() / .max() con colas monotonas
+    PosicionRango(w)     pos_rango_60 de fea.py
+    ATRWilder(w)         ta.volatility.average_true_range
+    RSIMedia(w)          rsi_14 de registro_features (medias simples)
+    RSIWilder(w)         ta.momentum.rsi (suavizado de Wilder)
+
+Igual que rolling(w) con min_periods=w, una ventana con algun NaN devuelve NaN.
+
+Estado por simbolo:
+    k = MediaMovil(20)
+    for x in closes: k.actualizar(x)
+    guardar_estados({"AAPL": {"ma_20": k}}, ruta)
+    k = cargar_estados(ruta)["AAPL"]["ma_20"]
+
+Comprobacion contra pandas:
+    python -m my_modules.indicadores_online
+"""
+
+import json
+import math
+import os
+from collections import deque
+from pathlib import Path
+
+# === CONFIGURACION ===
+RECALCULO = 1000      # cada cuantas salidas se recalcula la media desde la ventana (deriva numerica)
+TOLERANCIA = 1e-8
+
+def _es_nan(x):
+    return x is None or x != x
+
+# === MEDIA Y VARIANZA ===
+class MediaMovil:
+    def __init__(self, window):
+        self.window = window
+        self.valores = deque()
+        self.n = 0            # valores no nulos en la ventana
+        self.nulos = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.salidas = 0
+
+    def _quitar(self, y):
+        if _es_nan(y):
+            self.nulos -= 1
+            return
+        self.n -= 1
+        if self.n == 0:
+            self.media, self.m2 = 0.0, 0.0
+            return
+        delta = y - self.media
+        self.media -= delta / self.n
+        self.m2 -= delta * (y - self.media)
+        self.salidas += 1
+        if self.salidas % RECALCULO == 0:
+            self._recalcular()
+
+    def _recalcular(self):
+        validos = [v for v in self.valores if not _es_nan(v)]
+        self.media = math.fsum(validos) / len(validos) if validos else 0.0
+        self.m2 = math.fsum((v - self.media) ** 2 for v in validos)
+
+    def actualizar(self, x):
+        if len(self.valores) == self.window:
+            self._quitar(self.valores.popleft())
+        self.valores.append(x)
+        if _es_nan(x):
+            self.nulos += 1
+        else:
+            self.n += 1
+            delta = x - self.media
+            self.media += delta / self.n
+            self.m2 += delta * (x - self.media)
+        return self.valor()
+
+    @property
+    def listo(self):
+        return len(self.valores) == self.window and self.nulos == 0
+
+    def valor(self):
+        return self.media if self.listo else math.nan
+
+    def varianza(self):
+        # ddof=1 como pandas
+        if not self.listo or self.window < 2:
+            return math.nan
+        return max(self.m2, 0.0) / (self.window - 1)
+
+    def std(self):
+        return math.sqrt(self.varianza())
+
+    def estado(self):
+        return {"window": self.window, "valores": list(self.valores), "salidas": self.salidas}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        k = cls(estado["window"])
+        k.valores = deque(estado["valores"])
+        k.nulos = sum(1 for v in k.valores if _es_nan(v))
+        k.n = len(k.valores) - k.nulos
+        k.salidas = estado.get("salidas", 0)
+        k._recalcular()
+        return k
+
+# === MINIMO Y MAXIMO ===
+class MinMaxMovil:
+    def __init__(self, window):
+        self.window = window
+        self.i = 0                    # barras vistas
+        self.mins = deque()           # (indice, valor) crecientes
+        self.maxs = deque()           # (indice, valor) decrecientes
+        self.ultimo_nulo = -1
+
+    def actualizar(self, x):
+        i = self.i
+        self.i += 1
+        if _es_nan(x):
+            self.ultimo_nulo = i
+        else:
+            while self.mins and self.mins[-1][1] >= x:
+                self.mins.pop()
+            self.mins.append((i, x))
+            while self.maxs and self.maxs[-1][1] <= x:
+                self.maxs.pop()
+            self.maxs.append((i, x))
+        limite = i - self.window
+        while self.mins and self.mins[0][0] <= limite:
+            self.mins.popleft()
+        while self.maxs and self.maxs[0][0] <= limite:
+            self.maxs.popleft()
+        return self.minimo(), self.maximo()
+
+    @property
+    def listo(self):
+        return self.i >= self.window and self.ultimo_nulo <= self.i - 1 - self.window
+
+    def minimo(self):
+        return self.mins[0][1] if self.listo else math.nan
+
+    def maximo(self):
+        return self.maxs[0][1] if self.listo else math.nan
+
+    def estado(self):
+        return {"window": self.window, "i": self.i, "mins": [list(p) for p in self.mins],
+                "maxs": [list(p) for p in self.maxs], "ultimo_nulo": self.ultimo_nulo}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        k = cls(estado["window"])
+        k.i = estado["i"]
+        k.mins = deque(tuple(p) for p in estado["mins"])
+        k.maxs = deque(tuple(p) for p in estado["maxs"])
+        k.ultimo_nulo = estado["ultimo_nulo"]
+        return k
+
+class PosicionRango:
+    # (close - min(low, w)) / (max(high, w) - min(low, w)), como pos_rango_60 en fea.py
+    def __init__(self, window=60):
+        self.window = window
+        self.low = MinMaxMovil(window)
+        self.high = MinMaxMovil(window)
+
+    def actualizar(self, high, low, close):
+        minimo = self.low.actualizar(low)[0]
+        maximo = self.high.actualizar(high)[1]
+        rango = maximo - minimo
+        if _es_nan(rango) or _es_nan(close):
+            return math.nan
+        if rango == 0:
+            return math.nan if close == minimo else math.copysign(math.inf, close - minimo)
+        return (close - minimo) / rango
+
+    def estado(self):
+        return {"window": self.window, "low": self.low.estado(), "high": self.high.estado()}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        k = cls(estado["window"])
+        k.low = MinMaxMovil.desde_estado(estado["low"])
+        k.high = MinMaxMovil.desde_estado(estado["high"])
+        return k
+
+# === ATR ===
+class ATRWilder:
+    """
+    Igual que ta.volatility.average_true_range: ceros hasta la barra window-1,
+    semilla con la media del true range de las primeras `window` barras y despues
+    atr = (atr_prev * (window - 1) + tr) / window.
+    """
+    def __init__(self, window=14):
+        self.window = window
+        self.i = 0
+        self.close_prev = None
+        self.suma_tr = 0.0
+        self.n_tr = 0
+        self.atr = 0.0
+
+    def actualizar(self, high, low, close):
+        if self.close_prev is None or _es_nan(self.close_prev):
+            tr = high - low
+        else:
+            candidatos = [v for v in (high - low, abs(high - self.close_prev), abs(low - self.close_prev))
+                          if not _es_nan(v)]
+            tr = max(candidatos) if candidatos else math.nan
+        self.close_prev = close
+
+        if self.i < self.window:
+            # Semilla: media de los tr no nulos (Series.mean)
+            if not _es_nan(tr):
+                self.suma_tr += tr
+                self.n_tr += 1
+            if self.i == self.window - 1:
+                self.atr = self.suma_tr / self.n_tr if self.n_tr else math.nan
+        else:
+            self.atr = (self.atr * (self.window - 1) + tr) / float(self.window)
+        self.i += 1
+        return self.valor()
+
+    def valor(self):
+        return self.atr if self.i >= self.window else 0.0
+
+    def estado(self):
+        return {"window": self.window, "i": self.i, "close_prev": self.close_prev,
+                "suma_tr": self.suma_tr, "n_tr": self.n_tr, "atr": self.atr}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        k = cls(estado["window"])
+        for campo in ["i", "close_prev", "suma_tr", "n_tr", "atr"]:
+            setattr(k, campo, estado[campo])
+        return k
+
+# === RSI ===
+def _rsi(up, down):
+    if _es_nan(up) or _es_nan(down):
+        return math.nan
+    if down == 0:
+        return math.nan if up == 0 else 100.0
+    return 100 - (100 / (1 + up / down))
+
+class RSIMedia:
+    # rsi_14 de my_modules/registro_features.py: medias simples de subidas y bajadas (la primera diferencia es NaN)
+    def __init__(self, window=14):
+        self.window = window
+        self.close_prev = math.nan
+        self.up = MediaMovil(window)
+        self.down = MediaMovil(window)
+
+    def actualizar(self, close):
+        delta = close - self.close_prev if not _es_nan(self.close_prev) else math.nan
+        self.close_prev = close
+        if _es_nan(delta):
+            self.up.actualizar(math.nan)
+            self.down.actualizar(math.nan)
+        else:
+            self.up.actualizar(max(delta, 0.0))
+            self.down.actualizar(-min(delta, 0.0))
+        return self.valor()
+
+    def valor(self):
+        return _rsi(self.up.valor(), self.down.valor())
+
+    def estado(self):
+        return {"window": self.window, "close_prev": self.close_prev,
+                "up": self.up.estado(), "down": self.down.estado()}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        k = cls(estado["window"])
+        k.close_prev = estado["close_prev"]
+        k.up = MediaMovil.desde_estado(estado["up"])
+        k.down = MediaMovil.desde_estado(estado["down"])
+        return k
+
+class RSIWilder:
+    """
+    Igual que ta.momentum.rsi: ewm(alpha=1/window, adjust=False, min_periods=window)
+    de subidas y bajadas; la primera diferencia cuenta como 0 y con bajada media 0
+    el RSI es 100.
+    """
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.close_prev = None
+        self.n = 0
+        self.up = 0.0
+        self.down = 0.0
+
+    def actualizar(self, close):
+        delta = 0.0 if self.close_prev is None else close - self.close_prev
+        self.close_prev = close
+        up, down = (delta, 0.0) if delta > 0 else (0.0, -delta if delta < 0 else 0.0)
+        if self.n == 0:
+            self.up, self.down = up, down
+        else:
+            self.up = (1 - self.alpha) * self.up + self.alpha * up
+            self.down = (1 - self.alpha) * self.down + self.alpha * down
+        self.n += 1
+        return self.valor()
+
+    def valor(self):
+        if self.n < self.window:
+            return math.nan
+        if self.down == 0:
+            return 100.0
+        return 100 - (100 / (1 + self.up / self.down))
+
+    def estado(self):
+        return {"window": self.window, "close_prev": self.close_prev, "n": self.n,
+                "up": self.up, "down": self.down}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        k = cls(estado["window"])
+        for campo in ["close_prev", "n", "up", "down"]:
+            setattr(k, campo, estado[campo])
+        return k
+
+# === ESTADO POR SIMBOLO ===
+KERNELS = {c.__name__: c for c in [MediaMovil, MinMaxMovil, PosicionRango, ATRWilder, RSIMedia, RSIWilder]}
+
+def a_estado(kernel):
+    return {"tipo": type(kernel).__name__, **kernel.estado()}
+
+def desde_estado(estado):
+    return KERNELS[estado["tipo"]].desde_estado(estado)
+
+def guardar_estados(kernels, ruta):
+    # kernels: {simbolo: {nombre: kernel}}
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    datos = {s: {n: a_estado(k) for n, k in ks.items()} for s, ks in kernels.items()}
+    tmp = ruta.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(datos, f)
+    os.replace(tmp, ruta)
+
+def cargar_estados(ruta):
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return {}
+    with open(ruta, "r") as f:
+        datos = json.load(f)
+    return {s: {n: desde_estado(e) for n, e in ks.items()} for s, ks in datos.items()}
+
+# === COMPROBACION ===
+def _comparar(nombre, online, lote, tolerancia=TOLERANCIA):
+    import numpy as np
+    online = np.asarray(online, dtype="float64")
+    lote = np.asarray(lote, dtype="float64")
+    mismos_nan = np.array_equal(np.isnan(online), np.isnan(lote))
+    validos = ~np.isnan(online) & ~np.isnan(lote) & np.isfinite(lote)
+    escala = np.maximum(np.abs(lote[validos]), 1.0)
+    error = float(np.max(np.abs(online[validos] - lote[validos]) / escala)) if validos.any() else 0.0
+    ok = mismos_nan and error <= tolerancia
+    print(f"{'OK ' if ok else 'ERR'} {nombre:<16} error_rel={error:.2e} nan_iguales={mismos_nan}")
+    return ok
+
+def autocomprobacion(n=3000, semilla=7):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(semilla)
+    close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, n))))
+    close.iloc[[500, 501, 1700]] = np.nan
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+
+    # Mitad del historico, guardar/restaurar estado y seguir: debe dar lo mismo
+    def correr(crear, paso):
+        k = crear()
+        salida = []
+        for i in range(n):
+            if i == n // 2:
+                k = desde_estado(json.loads(json.dumps(a_estado(k))))
+            salida.append(paso(k, i))
+        return salida
+
+    ok = True
+    ma = correr(lambda: MediaMovil(20), lambda k, i: (k.actualizar(close[i]), k.std()))
+    ok &= _comparar("media_20", [m for m, _ in ma], close.rolling(20).mean())
+    ok &= _comparar("std_20", [s for _, s in ma], close.rolling(20).std())
+
+    mm = correr(lambda: MinMaxMovil(60), lambda k, i: k.actualizar(low[i]))
+    ok &= _comparar("min_60", [m for m, _ in mm], low.rolling(60).min())
+    ok &= _comparar("max_60", [m for _, m in mm], low.rolling(60).max())
+
+    pos = correr(lambda: PosicionRango(60), lambda k, i: k.actualizar(high[i], low[i], close[i]))
+    lote = (close - low.rolling(60).min()) / (high.rolling(60).max() - low.rolling(60).min())
+    ok &= _comparar("pos_rango_60", pos, lote)
+
+    sin_nan = close.ffill()
+    rsi = correr(lambda: RSIMedia(14), lambda k, i: k.actualizar(sin_nan[i]))
+    delta = sin_nan.diff()
+    lote = 100 - 100 / (1 + delta.clip(lower=0).rolling(14).mean() / (-delta.clip(upper=0)).rolling(14).mean())
+    ok &= _comparar("rsi_media_14", rsi, lote)
+
+    h, l = high.ffill(), low.ffill()
+    atr = correr(lambda: ATRWilder(14), lambda k, i: k.actualizar(h[i], l[i], sin_nan[i]))
+    rsi_w = correr(lambda: RSIWilder(14), lambda k, i: k.actualizar(sin_nan[i]))
+    try:
+        import ta
+        ok &= _comparar("atr_14", atr, ta.volatility.average_true_range(h, l, sin_nan, window=14))
+        ok &= _comparar("rsi_wilder_14", rsi_w, ta.momentum.rsi(sin_nan, window=14))
+    except ImportError:
+        print("--  atr_14 / rsi_wilder_14: ta no instalado, sin comparar")
+    return ok
+
+if __name__ == "__main__":
+    raise SystemExit(0 if autocomprobacion() else 1)
@@ -0,0 +1,401 @@
+# /home/ubuntu/tr/my_modules/logs_async.py
+"""
+Logging asincrono para estrategias y jobs.
+
+logger.info() solo convierte el registro en un dict y lo deja en una cola en
+memoria (sin I/O, sin bloquear; si la cola se llena el registro se descarta y se
+cuenta). Un hilo despachador agrupa los registros en lotes (LOTE registros o
+INTERVALO segundos) y cada salida escribe el lote de una vez:
+
+    SalidaArchivo     CSV (columnas fijas), JSON por linea o texto; un write por lote
+    SalidaCloudWatch  put_log_events por lotes (sustituye a watchtower)
+    SalidaMemoria     guarda los registros en una lista (pruebas)
+
+salida_cloudwatch() devuelve SalidaCloudWatch, un archivo JSON local o nada segun
+TR_LOGS_CLOUDWATCH (aws | local | off), asi las pruebas no tocan AWS.
+
+Los campos extra van en extra={"campos": {...}} y se vuelcan como columnas (CSV)
+o claves (JSON). configurar() admite limite de registros por segundo y muestreo
+por logger; WARNING y superiores pasan siempre y el siguiente registro que pasa
+lleva el numero de suprimidos. Una llamada filtrada por nivel solo cuesta la
+comprobacion isEnabledFor (usar argumentos %s, no f-strings, en el camino caliente).
+
+Tras un fork (Pool de shu_cro.py, upd.py) el hijo crea su propio despachador y
+reabre las salidas; al salir (atexit o fin de un worker de multiprocessing) se
+vacia la cola.
+
+Uso:
+    logger = configurar("upd", [salida_archivo(LOG_FILE, columnas=["ts", "simbolo", "status", "mensaje"])])
+    logger.info("descargado", extra={"campos": {"simbolo": "AAPL", "status": "OK"}})
+    logger.debug("detalle %s", x)    # filtrado: sin formateo ni cola
+"""
+
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from multiprocessing import util
+from pathlib import Path
+
+# === CONFIGURACION ===
+LOTE = 500                 # registros maximos por escritura
+INTERVALO = 1.0            # segundos maximos que un registro espera en memoria
+CAPACIDAD = 100_000        # registros en cola; con la cola llena se descarta
+FORMATO_TS = "%Y-%m-%d %H:%M:%S"
+COLUMNAS = ["ts", "nivel", "mensaje"]
+CLOUDWATCH_SINK = os.getenv("TR_LOGS_CLOUDWATCH", "aws")
+CLOUDWATCH_LOCAL_DIR = Path("/home/ubuntu/tr/logs/cloudwatch")
+CW_MAX_EVENTOS = 10_000    # limites de put_log_events
+CW_MAX_BYTES = 1_000_000
+
+# === REGISTROS ===
+_formateador = logging.Formatter()
+
+def a_dict(record, campos_fijos=None):
+    datos = {
+        "_t": record.created,
+        "ts": datetime.fromtimestamp(record.created).strftime(FORMATO_TS),
+        "logger": record.name,
+        "nivel": record.levelname,
+        "mensaje": record.getMessage(),
+    }
+    if record.exc_info:
+        datos["mensaje"] += " | " + _formateador.formatException(record.exc_info).replace("\n", " | ")
+    if campos_fijos:
+        datos.update(campos_fijos)
+    campos = getattr(record, "campos", None)
+    if campos:
+        datos.update(campos)
+    suprimidos = getattr(record, "suprimidos", 0)
+    if suprimidos:
+        datos["suprimidos"] = suprimidos
+    return datos
+
+# === SALIDAS ===
+class _Salida:
+    def __init__(self, formato="csv", columnas=None, separador=" | "):
+        if formato not in ("csv", "json", "texto"):
+            raise ValueError(f"formato desconocido: {formato}")
+        self.formato = formato
+        self.columnas = list(columnas or COLUMNAS)
+        self.separador = separador
+
+    def lineas(self, registros):
+        if self.formato == "json":
+            return [json.dumps({k: v for k, v in r.items() if not k.startswith("_")}, ensure_ascii=False, default=str)
+                    for r in registros]
+        if self.formato == "texto":
+            return [self.separador.join(str(r.get(c, "")) for c in self.columnas) for r in registros]
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer, lineterminator="\n")
+        escritor.writerows([r.get(c, "") for c in self.columnas] for r in registros)
+        return buffer.getvalue().splitlines()
+
+    def reabrir(self):
+        pass
+
+    def cerrar(self):
+        pass
+
+class SalidaArchivo(_Salida):
+    def __init__(self, path, formato="csv", columnas=None, separador=" | "):
+        super().__init__(formato, columnas, separador)
+        self.path = Path(path)
+        self._fd = None
+
+    def escribir(self, registros):
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # O_APPEND sin buffer de Python: un solo write por lote, sin mezclas entre procesos
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, ("\n".join(self.lineas(registros)) + "\n").encode("utf-8"))
+
+    def reabrir(self):
+        # El hijo no cierra el descriptor heredado (lo sigue usando el padre)
+        self._fd = None
+
+    def cerrar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class SalidaMemoria(_Salida):
+    def __init__(self, formato="csv", columnas=None):
+        super().__init__(formato, columnas)
+        self.registros = []
+
+    def escribir(self, registros):
+        self.registros.extend(registros)
+
+class SalidaCloudWatch(_Salida):
+    def __init__(self, grupo, stream=None, formato="csv", columnas=None, cliente=None):
+        super().__init__(formato, columnas)
+        self.grupo = grupo
+        self.stream = stream or f"{socket.gethostname()}-{datetime.utcnow():%Y-%m-%d}"
+        self._cliente = cliente
+        self._creado = False
+
+    def _cliente_logs(self):
+        if self._cliente is None:
+            import boto3
+            self._cliente = boto3.client("logs")
+        return self._cliente
+
+    def _crear(self, cliente):
+        for crear, params in [(cliente.create_log_group, {"logGroupName": self.grupo}),
+                              (cliente.create_log_stream, {"logGroupName": self.grupo, "logStreamName": self.stream})]:
+            try:
+                crear(**params)
+            except cliente.exceptions.ResourceAlreadyExistsException:
+                pass
+        self._creado = True
+
+    def escribir(self, registros):
+        cliente = self._cliente_logs()
+        if not self._creado:
+            self._crear(cliente)
+        eventos = sorted(({"timestamp": int(r["_t"] * 1000), "message": linea}
+                          for r, linea in zip(registros, self.lineas(registros))), key=lambda e: e["timestamp"])
+        lote, tamaño = [], 0
+        for evento in eventos:
+            peso = len(evento["message"].encode("utf-8")) + 26
+            if lote and (len(lote) >= CW_MAX_EVENTOS or tamaño + peso > CW_MAX_BYTES):
+                cliente.put_log_events(logGroupName=self.grupo, logStreamName=self.stream, logEvents=lote)
+                lote, tamaño = [], 0
+            lote.append(evento)
+            tamaño += peso
+        if lote:
+            cliente.put_log_events(logGroupName=self.grupo, logStreamName=self.stream, logEvents=lote)
+
+    def reabrir(self):
+        # Los clientes de boto3 no se comparten entre procesos
+        self._cliente = None
+
+def salida_archivo(path, formato="csv", columnas=None, separador=" | "):
+    return SalidaArchivo(path, formato, columnas, separador)
+
+def salida_cloudwatch(grupo, stream=None, formato="csv", columnas=None):
+    if CLOUDWATCH_SINK == "off":
+        return None
+    if CLOUDWATCH_SINK == "local":
+        return SalidaArchivo(CLOUDWATCH_LOCAL_DIR / f"{grupo}.jsonl", formato="json")
+    return SalidaCloudWatch(grupo, stream, formato, columnas)
+
+# === DESPACHADOR ===
+_FIN = object()
+
+class Despachador:
+    def __init__(self, lote=LOTE, intervalo=INTERVALO, capacidad=CAPACIDAD):
+        self.lote = lote
+        self.intervalo = intervalo
+        self.capacidad = capacidad
+        # SimpleQueue.put es reentrante: se puede llamar desde un handler de señal
+        self.cola = queue.SimpleQueue()
+        self.descartados = 0
+        self.salidas = {}
+        self.hilo = threading.Thread(target=self._bucle, name="logs_async", daemon=True)
+        self.hilo.start()
+
+    def poner(self, salidas, registro):
+        if self.cola.qsize() >= self.capacidad:
+            self.descartados += 1
+        else:
+            self.cola.put((salidas, registro))
+
+    def vaciar(self, timeout=10):
+        # Espera a que se escriba todo lo encolado hasta ahora
+        if not self.hilo.is_alive():
+            return
+        hecho = threading.Event()
+        self.cola.put(hecho)
+        hecho.wait(timeout)
+
+    def detener(self, timeout=10):
+        if self.hilo.is_alive():
+            self.cola.put(_FIN)
+            self.hilo.join(timeout)
+        for salida in self.salidas.values():
+            salida.cerrar()
+
+    def _bucle(self):
+        fin = False
+        while not fin:
+            pendientes, avisos = [], []
+            item = self.cola.get()
+            limite = time.monotonic() + self.intervalo
+            while True:
+                if item is _FIN:
+                    fin = True
+                    break
+                if isinstance(item, threading.Event):
+                    avisos.append(item)
+                    break
+                pendientes.append(item)
+                resto = limite - time.monotonic()
+                if len(pendientes) >= self.lote or resto <= 0:
+                    break
+                try:
+                    item = self.cola.get(timeout=resto)
+                except queue.Empty:
+                    break
+            self._escribir(pendientes)
+            for aviso in avisos:
+                aviso.set()
+
+    def _escribir(self, pendientes):
+        # Un escribir() por salida y lote
+        por_salida = {}
+        for salidas, registro in pendientes:
+            for salida in salidas:
+                por_salida.setdefault(id(salida), (salida, []))[1].append(registro)
+        if self.descartados:
+            print(f"[logs_async] {self.descartados} registros descartados (cola llena)", file=sys.stderr)
+            self.descartados = 0
+        for salida, registros in por_salida.values():
+            self.salidas[id(salida)] = salida
+            try:
+                salida.escribir(registros)
+            except Exception as e:
+                # El logging nunca debe tumbar el job
+                print(f"[logs_async] error escribiendo {type(salida).__name__}: {e}", file=sys.stderr)
+
+_despachador = None
+_lock = threading.Lock()
+_deteniendo = False
+_senal_pendiente = None
+
+def despachador():
+    global _despachador
+    if _despachador is None:
+        with _lock:
+            if _despachador is None:
+                _despachador = Despachador()
+                # Los workers de multiprocessing salen sin atexit pero si ejecutan sus Finalize
+                util.Finalize(None, detener, exitpriority=10)
+    return _despachador
+
+def vaciar():
+    if _despachador is not None:
+        _despachador.vaciar()
+
+def detener():
+    global _despachador, _deteniendo, _senal_pendiente
+    previo, _despachador = _despachador, None
+    if previo is None:
+        return
+    _deteniendo = True
+    try:
+        previo.detener()
+    finally:
+        _deteniendo = False
+        if _senal_pendiente:
+            senal, _senal_pendiente = _senal_pendiente, None
+            os.kill(os.getpid(), senal)
+
+def _tras_fork():
+    # En el hijo el hilo del padre no existe: cola y despachador nuevos, salidas reabiertas
+    global _despachador, _lock
+    _despachador, _lock = None, threading.Lock()
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        for handler in getattr(logger, "handlers", []):
+            if isinstance(handler, ManejadorCola):
+                for salida in handler.salidas:
+                    salida.reabrir()
+    # Pool.terminate() (al salir de "with Pool") manda SIGTERM a los workers: se vacia
+    # la cola antes de morir, solo si nadie ha instalado otro handler
+    try:
+        if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _terminar)
+    except ValueError:
+        pass
+
+def _terminar(signum, frame):
+    global _senal_pendiente
+    signal.signal(signum, signal.SIG_DFL)
+    if _deteniendo:
+        # La señal interrumpe un detener() en curso: se relanza cuando termine de vaciar
+        _senal_pendiente = signum
+        return
+    detener()
+    os.kill(os.getpid(), signum)
+
+atexit.register(detener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+# === HANDLER Y FILTRO ===
+class ManejadorCola(logging.Handler):
+    def __init__(self, salidas, campos_fijos=None):
+        super().__init__()
+        self.salidas = tuple(s for s in salidas if s is not None)
+        self.campos_fijos = campos_fijos
+
+    def emit(self, record):
+        try:
+            despachador().poner(self.salidas, a_dict(record, self.campos_fijos))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        vaciar()
+
+class FiltroFrecuencia(logging.Filter):
+    """
+    Limite por logger: como mucho `max_por_segundo` registros por segundo (cubo de
+    fichas con rafaga de un segundo) y una fraccion `muestreo` de los que quedan.
+    Los de nivel >= nivel_libre pasan siempre.
+    """
+
+    def __init__(self, max_por_segundo=None, muestreo=1.0, nivel_libre=logging.WARNING):
+        super().__init__()
+        self.max_por_segundo = max_por_segundo
+        self.muestreo = muestreo
+        self.nivel_libre = nivel_libre
+        self.fichas = float(max_por_segundo or 0)
+        self.ultimo = time.monotonic()
+        self.suprimidos = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            if record.levelno < self.nivel_libre:
+                if self.muestreo < 1 and random.random() >= self.muestreo:
+                    self.suprimidos += 1
+                    return False
+                if self.max_por_segundo:
+                    ahora = time.monotonic()
+                    self.fichas = min(self.max_por_segundo, self.fichas + (ahora - self.ultimo) * self.max_por_segundo)
+                    self.ultimo = ahora
+                    if self.fichas < 1:
+                        self.suprimidos += 1
+                        return False
+                    self.fichas -= 1
+            if self.suprimidos:
+                record.suprimidos, self.suprimidos = self.suprimidos, 0
+            return True
+
+# === CONFIGURACION DE LOGGERS ===
+def configurar(nombre, salidas, nivel=logging.INFO, max_por_segundo=None, muestreo=1.0, campos_fijos=None):
+    """
+    Logger `nombre` con un ManejadorCola hacia `salidas` (las None se ignoran).
+    Si ya estaba configurado se devuelve tal cual.
+    """
+    logger = logging.getLogger(nombre)
+    logger.setLevel(nivel)
+    if any(isinstance(h, ManejadorCola) for h in logger.handlers):
+        return logger
+    if max_por_segundo or muestreo < 1:
+        logger.addFilter(FiltroFrecuencia(max_por_segundo, muestreo))
+    logger.addHandler(ManejadorCola(salidas, campos_fijos))
+    logger.propagate = False
+    return logger
@@ -0,0 +1,111 @@
+# /home/ubuntu/tr/my_modules/logs_ingesta.py
+"""
+Lectura y compactacion de los logs de ingesta que escribe la Lambda ingest_TwelveData.
+
+Cada invocacion deja un segmento CSV en logs/ingestion/<fecha>/<hora>_<id>.csv.
+compactar_dia() fusiona los segmentos de un dia en logs/ingestion/<fecha>.parquet
+y borra los segmentos ya incluidos.
+
+Uso:
+    python -m my_modules.logs_ingesta compactar --fecha 2025-06-10
+    python -m my_modules.logs_ingesta leer --fecha 2025-06-10
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import boto3
+import pandas as pd
+
+# === CONFIGURACION ===
+BUCKET_NAME = "bucket-name"
+LOG_FOLDER = "logs/ingestion"
+COLUMNAS = ["timestamp", "proceso", "estatus", "mensaje"]
+WORKERS = 8
+
+s3 = boto3.client("s3")
+
+# === SEGMENTOS ===
+def listar_segmentos(fecha, bucket=BUCKET_NAME):
+    claves = []
+    paginador = s3.get_paginator("list_objects_v2")
+    for pagina in paginador.paginate(Bucket=bucket, Prefix=f"{LOG_FOLDER}/{fecha}/"):
+        claves.extend(obj["Key"] for obj in pagina.get("Contents", []) if obj["Key"].endswith(".csv"))
+    # El nombre empieza por la hora UTC: el orden lexicografico es el cronologico
+    return sorted(claves)
+
+def _parsear_segmento(contenido):
+    # El mensaje puede llevar comas: solo se separan los tres primeros campos
+    filas = []
+    for linea in contenido.decode("utf-8").splitlines()[1:]:
+        if linea:
+            campos = linea.split(",", 3)
+            filas.append(campos + [""] * (4 - len(campos)))
+    return filas
+
+def _descargar(clave, bucket):
+    return s3.get_object(Bucket=bucket, Key=clave)["Body"].read()
+
+def leer_segmentos(claves, bucket=BUCKET_NAME, workers=WORKERS):
+    if not claves:
+        return pd.DataFrame(columns=COLUMNAS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        contenidos = list(pool.map(lambda c: _descargar(c, bucket), claves))
+    filas = []
+    for contenido in contenidos:
+        filas.extend(_parsear_segmento(contenido))
+    df = pd.DataFrame(filas, columns=COLUMNAS)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    for col in ["proceso", "estatus"]:
+        df[col] = df[col].astype("category")
+    return df
+
+def _leer_compactado(fecha, bucket=BUCKET_NAME):
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=f"{LOG_FOLDER}/{fecha}.parquet")
+    except s3.exceptions.NoSuchKey:
+        return pd.DataFrame(columns=COLUMNAS)
+    return pd.read_parquet(BytesIO(obj["Body"].read()))
+
+def _unir(partes):
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS)
+    return pd.concat(partes, ignore_index=True).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+def leer_dia(fecha, bucket=BUCKET_NAME):
+    # Parquet compactado (si existe) + segmentos pendientes de compactar
+    return _unir([_leer_compactado(fecha, bucket), leer_segmentos(listar_segmentos(fecha, bucket), bucket)])
+
+# === COMPACTACION ===
+def compactar_dia(fecha, bucket=BUCKET_NAME):
+    claves = listar_segmentos(fecha, bucket)
+    if not claves:
+        return 0
+    # Se leen exactamente los segmentos listados: los que lleguen despues no entran en
+    # el parquet ni se borran, quedan para la siguiente pasada
+    df = _unir([_leer_compactado(fecha, bucket), leer_segmentos(claves, bucket)])
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False, compression="zstd")
+    s3.put_object(Bucket=bucket, Key=f"{LOG_FOLDER}/{fecha}.parquet", Body=buffer.getvalue())
+    for i in range(0, len(claves), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": c} for c in claves[i:i + 1000]]})
+    return len(claves)
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Logs de ingesta segmentados")
+    parser.add_argument("accion", choices=["compactar", "leer"])
+    parser.add_argument("--fecha", default=(datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d"))
+    args = parser.parse_args()
+
+    if args.accion == "compactar":
+        n = compactar_dia(args.fecha)
+        print(f"{args.fecha}: {n} segmentos compactados")
+    else:
+        print(leer_dia(args.fecha).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# /home/ubuntu/tr/my_modules/panel.py
+"""
+Motor de panel: todo el universo en matrices 2-D (barras x simbolos) para que una
+estrategia calcule bandas, gaps y filtros de todos los simbolos en una sola pasada.
+
+Alineacion: cada columna es el historico de un simbolo alineado a la derecha (la
+ultima fila es su ultima barra) y rellenado con NaN por arriba, asi las ventanas
+cuentan barras del simbolo, igual que la version por simbolo. Una fila solo es
+una fecha cuando todos los simbolos comparten calendario y ultima barra: un
+simbolo sin refrescar o con huecos propios queda desplazado. La fecha de cada
+celda esta en `panel.fechas`; para comparar simbolos en una misma fecha (corte
+transversal) hay que pasar la matriz por alinear_fechas(), que la recoloca en
+fechas x simbolos sobre la union de fechas con NaN donde un simbolo no tiene barra.
+
+Las estrategias de referencia (generar_senales_panel en bollinger_breakout_v4 y
+gap_open_strategy_v5) devuelven una matriz int8 de señales que a_largo()
+convierte al formato de generar_senales.
+"""
+
+import numpy as np
+import pandas as pd
+
+from my_modules.historico import load_history
+from my_modules.senales import NOMBRES as NOMBRES_SENAL
+
+# === CONFIGURACION ===
+COLUMNAS = ["open", "high", "low", "close", "volume"]
+
+# === PANEL ===
+class Panel:
+    def __init__(self, simbolos, fechas, datos):
+        self.simbolos = list(simbolos)
+        self.fechas = fechas                      # datetime64[D], NaT en el relleno
+        self.datos = datos                        # col -> float64 (barras, simbolos)
+        self.valido = ~np.isnat(fechas)
+        self.inicio = np.argmax(self.valido, axis=0)   # primera fila real de cada simbolo
+        self.longitud = self.valido.sum(axis=0)
+        self.inicio[self.longitud == 0] = len(fechas)
+
+    @property
+    def forma(self):
+        return self.fechas.shape
+
+    def __getitem__(self, col):
+        return self.datos[col]
+
+    def frame(self, simbolo):
+        # DataFrame de un simbolo con el mismo formato que load_history
+        j = self.simbolos.index(simbolo)
+        filas = slice(self.inicio[j], None)
+        df = pd.DataFrame({c: self.datos[c][filas, j] for c in self.datos})
+        df.insert(0, "fecha", self.fechas[filas, j].astype(object))
+        return df
+
+def cargar_panel(simbolos, columnas=COLUMNAS, ultimas=None):
+    frames = {}
+    for simbolo in simbolos:
+        df = load_history(simbolo, columns=columnas, ultimas=ultimas)
+        if not df.empty:
+            frames[simbolo] = df
+    simbolos = list(frames)
+    n_barras = max((len(df) for df in frames.values()), default=0)
+
+    fechas = np.full((n_barras, len(simbolos)), np.datetime64("NaT"), dtype="datetime64[D]")
+    datos = {c: np.full((n_barras, len(simbolos)), np.nan) for c in columnas}
+    for j, simbolo in enumerate(simbolos):
+        df = frames[simbolo]
+        desde = n_barras - len(df)
+        fechas[desde:, j] = pd.to_datetime(df["fecha"]).values.astype("datetime64[D]")
+        for c in columnas:
+            datos[c][desde:, j] = df[c].to_numpy(dtype="float64")
+    return Panel(simbolos, fechas, datos)
+
+def panel_desde_reciente(reciente, columnas=COLUMNAS, simbolos=None):
+    # Panel a partir del panel reciente mapeado en memoria (my_modules.panel_reciente), sin leer historicos
+    simbolos = [s for s in (simbolos or reciente.simbolos()) if s in reciente]
+    n_barras = max((reciente.indice[s][1] for s in simbolos), default=0)
+    fechas = np.full((n_barras, len(simbolos)), np.datetime64("NaT"), dtype="datetime64[D]")
+    datos = {c: np.full((n_barras, len(simbolos)), np.nan) for c in columnas}
+    for j, simbolo in enumerate(simbolos):
+        arrays = reciente.arrays(simbolo, ["fecha"] + list(columnas))
+        desde = n_barras - len(arrays["fecha"])
+        fechas[desde:, j] = arrays["fecha"].astype("datetime64[D]")
+        for c in columnas:
+            datos[c][desde:, j] = arrays[c]
+    return Panel(simbolos, fechas, datos)
+
+# === OPERADORES VECTORIZADOS ===
+# rolling de pandas sobre el DataFrame 2-D aplica el mismo kernel por columna que
+# sobre una Serie, asi que los resultados coinciden bit a bit con la version por simbolo
+def rolling_mean(x, window):
+    return pd.DataFrame(x).rolling(window).mean().to_numpy()
+
+def rolling_std(x, window):
+    return pd.DataFrame(x).rolling(window).std().to_numpy()
+
+def rolling_min(x, window):
+    return pd.DataFrame(x).rolling(window).min().to_numpy()
+
+def rolling_max(x, window):
+    return pd.DataFrame(x).rolling(window).max().to_numpy()
+
+def shift(x, n=1):
+    salida = np.full_like(x, np.nan)
+    if n >= 0:
+        salida[n:] = x[:len(x) - n]
+    else:
+        salida[:n] = x[-n:]
+    return salida
+
+def atr_wilder(panel, window=14):
+    """
+    ATR de Wilder como ta.volatility.average_true_range (salvo redondeo): semilla con
+    la media del true range de las primeras `window` barras de cada simbolo, ceros
+    antes y la recurrencia de Wilder despues, que es un ewm(alpha=1/window, adjust=False)
+    arrancado en la semilla.
+    """
+    high, low, close = panel["high"], panel["low"], panel["close"]
+    prev = shift(close, 1)
+    with np.errstate(invalid="ignore"):
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev)), np.abs(low - prev))
+
+    filas = np.arange(tr.shape[0])[:, np.newaxis]
+    semilla = panel.inicio + window - 1
+    # Semilla: media de los true range no nulos de las primeras `window` barras
+    tramo = (filas >= panel.inicio) & (filas <= semilla)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(tramo, np.nan_to_num(tr), 0.0).sum(axis=0) / (tramo & ~np.isnan(tr)).sum(axis=0)
+    entrada = np.where(filas > semilla, tr, np.nan)
+    con_semilla = np.nonzero(semilla < len(filas))[0]
+    entrada[semilla[con_semilla], con_semilla] = media[con_semilla]
+    atr = pd.DataFrame(np.asfortranarray(entrada)).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+
+    # Un true range nulo tras la semilla deja el resto en NaN, como la recurrencia de ta
+    roto = np.logical_or.accumulate(np.isnan(entrada) & (filas >= semilla), axis=0)
+    atr = np.where(roto, np.nan, atr)
+    return np.where(panel.valido & (filas < semilla), 0.0, atr)
+
+def alinear_fechas(panel, matriz):
+    """
+    Recoloca una matriz del panel (barras x simbolos, alineada a la derecha) en
+    fechas x simbolos sobre la union de fechas. Devuelve (fechas, matriz) con NaN
+    donde un simbolo no tiene barra en esa fecha.
+    """
+    fechas = np.unique(panel.fechas[panel.valido])
+    filas = np.searchsorted(fechas, panel.fechas[panel.valido])
+    _, columnas = np.nonzero(panel.valido)
+    salida = np.full((len(fechas), len(panel.simbolos)), np.nan)
+    salida[filas, columnas] = matriz[panel.valido]
+    return fechas, salida
+
+# === SALIDA ===
+def a_largo(panel, codigos, estrategia):
+    # Matriz de codigos -> DataFrame ['fecha', 'signal', 'estrategia', 'simbolo'],
+    # simbolo a simbolo y en orden de fecha, como la salida de generar_senales
+    valido = panel.valido.T
+    fechas = panel.fechas.T[valido].astype(object)
+    senales = NOMBRES_SENAL[codigos.T[valido].astype(np.int64) + 1]
+    simbolos = np.repeat(np.array(panel.simbolos, dtype=object), panel.longitud)
+    return pd.DataFrame({"fecha": fechas, "signal": senales, "estrategia": estrategia, "simbolo": simbolos})
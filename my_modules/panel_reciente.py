@@ -0,0 +1,126 @@
+# /home/ubuntu/tr/my_modules/panel_reciente.py
+"""
+Panel reciente: las ultimas N barras de todos los simbolos en un unico archivo
+Arrow IPC (sin compresion), con cada columna en un buffer contiguo y un indice
+simbolo -> (offset, longitud) en los metadatos del esquema.
+
+upd.py lo reconstruye o lo parchea (solo relee del historico los simbolos que
+cambiaron) y los consumidores lo abren con un memory map. Solo arrays() es sin
+copia: devuelve vistas numpy sobre paginas compartidas entre procesos, y es lo que
+usan los caminos calientes (my_modules.panel.panel_desde_reciente para fea.py,
+my_modules.ultimas_barras). ventana() pasa por to_pandas: copia las columnas y el
+volumen llega como float64 (asi se guarda en el panel), no como en load_history.
+
+Uso:
+    panel = PanelReciente()
+    arrays = panel.arrays("AAPL", ["close", "volume"])   # vistas numpy sin copia
+    df = panel.ventana("AAPL")                           # DataFrame (copia, volume float64)
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from my_modules.historico import load_history
+
+# === CONFIGURACION ===
+PANEL_PATH = Path("/home/ubuntu/tr/data/panel_reciente.arrow")
+NUM_BARRAS = 60
+COLUMNAS = ["open", "high", "low", "close", "volume"]
+ESQUEMA = pa.schema([("fecha", pa.date32())] + [(c, pa.float64()) for c in COLUMNAS])
+
+# === CONSTRUCCION ===
+def _tabla_simbolo(simbolo, n):
+    df = load_history(simbolo, columns=COLUMNAS, ultimas=n)
+    # NaN se conserva como NaN (no null) para que las vistas numpy sean sin copia
+    datos = {"fecha": pa.array(pd.to_datetime(df["fecha"]).values.astype("datetime64[D]"), type=pa.date32())}
+    for c in COLUMNAS:
+        valores = df[c].to_numpy(dtype="float64") if c in df.columns else np.full(len(df), np.nan)
+        datos[c] = pa.array(valores, type=pa.float64())
+    return pa.table(datos, schema=ESQUEMA)
+
+def actualizar_panel(simbolos, cambiados=None, n=NUM_BARRAS, path=PANEL_PATH):
+    """
+    Escribe el panel para `simbolos`. Con `cambiados` (iterable) y un panel previo
+    compatible, los simbolos no cambiados se copian del panel anterior sin releer
+    el historico. Sin `cambiados` se reconstruye todo.
+    """
+    path = Path(path)
+    previo = None
+    if cambiados is not None and path.exists():
+        previo = PanelReciente(path)
+        if previo.num_barras != n:
+            previo = None
+    cambiados = set(cambiados or [])
+
+    tablas, indice = [], {"simbolos": [], "offsets": [], "longitudes": []}
+    offset = 0
+    for simbolo in simbolos:
+        if previo is not None and simbolo not in cambiados and simbolo in previo.indice:
+            o, l = previo.indice[simbolo]
+            tabla = previo.tabla.slice(o, l)
+        else:
+            tabla = _tabla_simbolo(simbolo, n)
+        if tabla.num_rows == 0:
+            continue
+        tablas.append(tabla)
+        indice["simbolos"].append(simbolo)
+        indice["offsets"].append(offset)
+        indice["longitudes"].append(tabla.num_rows)
+        offset += tabla.num_rows
+
+    tabla = pa.concat_tables(tablas) if tablas else ESQUEMA.empty_table()
+    # Un solo record batch: cada columna queda en un buffer contiguo
+    tabla = tabla.combine_chunks().replace_schema_metadata({
+        "indice": json.dumps(indice), "num_barras": str(n)
+    })
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, tabla.schema) as writer:
+            writer.write_table(tabla, max_chunksize=max(tabla.num_rows, 1))
+    # Los lectores con el archivo anterior mapeado siguen viendo su version
+    os.replace(tmp, path)
+    return len(indice["simbolos"])
+
+# === LECTURA ===
+class PanelReciente:
+    def __init__(self, path=PANEL_PATH):
+        self.path = Path(path)
+        self._mmap = pa.memory_map(str(self.path), "r")
+        self.tabla = pa.ipc.open_file(self._mmap).read_all()
+        meta = self.tabla.schema.metadata
+        indice = json.loads(meta[b"indice"])
+        self.num_barras = int(meta[b"num_barras"])
+        self.indice = {
+            s: (o, l) for s, o, l in zip(indice["simbolos"], indice["offsets"], indice["longitudes"])
+        }
+
+    def simbolos(self):
+        return list(self.indice)
+
+    def __contains__(self, simbolo):
+        return simbolo in self.indice
+
+    def arrays(self, simbolo, columnas=None):
+        # Vistas numpy sobre el mmap; 'fecha' se devuelve como dias desde epoch (int32)
+        o, l = self.indice[simbolo]
+        salida = {}
+        for c in columnas or ["fecha"] + COLUMNAS:
+            chunk = self.tabla.column(c).chunk(0)
+            if c == "fecha":
+                chunk = chunk.view(pa.int32())
+            salida[c] = chunk.slice(o, l).to_numpy(zero_copy_only=True)
+        return salida
+
+    def ventana(self, simbolo, columnas=None):
+        # Copia a pandas para uso puntual; en bucles sobre el universo, arrays()
+        o, l = self.indice[simbolo]
+        columnas = ["fecha"] + [c for c in (columnas or COLUMNAS) if c != "fecha"]
+        df = self.tabla.slice(o, l).select(columnas).to_pandas(date_as_object=True)
+        return df
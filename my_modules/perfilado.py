@@ -0,0 +1,182 @@
+# /home/ubuntu/tr/my_modules/perfilado.py
+"""
+Perfilado del motor de señales por estrategia, simbolo y fase.
+
+Fases de shu_cro.py: lectura (parquet), calculo (una por estrategia), concat y
+escritura. Cada fase acumula llamadas, tiempo total y maximo y, con memoria=True,
+el pico de memoria asignada (tracemalloc). Desactivado, fase() devuelve siempre
+el mismo contexto nulo: el coste es una llamada por fase.
+
+Con simbolo/estrategia de captura se guarda ademas un cProfile (.prof) y el top
+de asignaciones de tracemalloc (.txt) de esa combinacion.
+
+Los workers exportan sus tiempos (exportar) y el proceso principal los fusiona.
+
+Uso:
+    perfil = Perfilador(activo=True)
+    with perfil.fase("AAPL", "bollinger_breakout_v4", "calculo"):
+        ...
+    perfil.guardar()   # reports/perfilado/perfil_<fecha>.json y .txt
+"""
+
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+# === CONFIGURACION ===
+PERFIL_PATH = Path("/home/ubuntu/tr/reports/perfilado")
+TOP_SIMBOLOS = 20
+_NULO = nullcontext()
+
+# === PERFILADOR ===
+class Perfilador:
+    def __init__(self, activo=False, memoria=False, simbolo_captura=None, estrategia_captura=None,
+                 directorio=PERFIL_PATH):
+        self.activo = activo or memoria
+        self.memoria = memoria
+        self.simbolo_captura = simbolo_captura
+        self.estrategia_captura = estrategia_captura
+        self.directorio = Path(directorio)
+        self.fases = {}        # (estrategia, fase) -> [llamadas, total_s, max_s, bytes_pico]
+        self.simbolos = {}     # simbolo -> total_s
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def config(self):
+        # Para crear perfiladores equivalentes en los workers
+        return {"activo": self.activo, "memoria": self.memoria, "simbolo_captura": self.simbolo_captura,
+                "estrategia_captura": self.estrategia_captura, "directorio": str(self.directorio)}
+
+    def fase(self, simbolo, estrategia, fase):
+        if not self.activo:
+            return _NULO
+        return self._medir(simbolo, estrategia, fase)
+
+    @contextmanager
+    def _medir(self, simbolo, estrategia, fase):
+        if self.memoria:
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dur = time.perf_counter() - t0
+            pico = tracemalloc.get_traced_memory()[1] - antes if self.memoria else 0
+            acum = self.fases.setdefault((estrategia, fase), [0, 0.0, 0.0, 0])
+            acum[0] += 1
+            acum[1] += dur
+            acum[2] = max(acum[2], dur)
+            acum[3] = max(acum[3], pico)
+            self.simbolos[simbolo] = self.simbolos.get(simbolo, 0.0) + dur
+
+    def captura(self, simbolo, estrategia):
+        # cProfile + tracemalloc solo para la combinacion elegida
+        if self.simbolo_captura is None or simbolo != self.simbolo_captura:
+            return _NULO
+        if self.estrategia_captura is not None and estrategia != self.estrategia_captura:
+            return _NULO
+        return self._capturar(simbolo, estrategia)
+
+    @contextmanager
+    def _capturar(self, simbolo, estrategia):
+        propio = not tracemalloc.is_tracing()
+        if propio:
+            tracemalloc.start(10)
+        inicial = tracemalloc.take_snapshot()
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            final = tracemalloc.take_snapshot()
+            if propio:
+                tracemalloc.stop()
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            base = self.directorio / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{simbolo}_{estrategia}"
+            perfil.dump_stats(f"{base}.prof")
+            texto = StringIO()
+            pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(30)
+            texto.write("\n=== Asignaciones (top 15) ===\n")
+            for stat in final.compare_to(inicial, "lineno")[:15]:
+                texto.write(f"{stat}\n")
+            Path(f"{base}.txt").write_text(texto.getvalue())
+
+    # === AGREGACION ===
+    def exportar(self):
+        return {"fases": [[e, f] + v for (e, f), v in self.fases.items()], "simbolos": self.simbolos}
+
+    def fusionar(self, datos):
+        if not datos:
+            return
+        for estrategia, fase, llamadas, total, maximo, pico in datos["fases"]:
+            acum = self.fases.setdefault((estrategia, fase), [0, 0.0, 0.0, 0])
+            acum[0] += llamadas
+            acum[1] += total
+            acum[2] = max(acum[2], maximo)
+            acum[3] = max(acum[3], pico)
+        for simbolo, total in datos["simbolos"].items():
+            self.simbolos[simbolo] = self.simbolos.get(simbolo, 0.0) + total
+
+    def informe(self, top=TOP_SIMBOLOS):
+        total = sum(v[1] for v in self.fases.values()) or 1.0
+        fases = sorted(self.fases.items(), key=lambda kv: kv[1][1], reverse=True)
+        por_estrategia = {}
+        for (estrategia, _), v in self.fases.items():
+            por_estrategia[estrategia] = por_estrategia.get(estrategia, 0.0) + v[1]
+        return {
+            "generado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "total_s": round(total, 3),
+            "fases": [
+                {"estrategia": e, "fase": f, "llamadas": v[0], "total_s": round(v[1], 3),
+                 "media_ms": round(1000 * v[1] / v[0], 3), "max_ms": round(1000 * v[2], 3),
+                 "pct": round(100 * v[1] / total, 1), "pico_kb": round(v[3] / 1024, 1)}
+                for (e, f), v in fases
+            ],
+            "estrategias": [
+                {"estrategia": e, "total_s": round(t, 3), "pct": round(100 * t / total, 1)}
+                for e, t in sorted(por_estrategia.items(), key=lambda kv: kv[1], reverse=True)
+            ],
+            "simbolos": [
+                {"simbolo": s, "total_s": round(t, 3)}
+                for s, t in sorted(self.simbolos.items(), key=lambda kv: kv[1], reverse=True)[:top]
+            ],
+        }
+
+    def guardar(self, nombre=None):
+        informe = self.informe()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        base = self.directorio / (nombre or f"perfil_{datetime.now().date()}")
+        with open(f"{base}.json", "w") as f:
+            json.dump(informe, f, indent=1)
+        texto = tabla_texto(informe)
+        Path(f"{base}.txt").write_text(texto)
+        return texto
+
+def _tabla(filas, columnas):
+    anchos = {c: max([len(c)] + [len(str(f[c])) for f in filas]) for c in columnas}
+    lineas = ["  ".join(c.ljust(anchos[c]) for c in columnas).rstrip()]
+    lineas += ["  ".join(str(f[c]).ljust(anchos[c]) for c in columnas).rstrip() for f in filas]
+    return "\n".join(lineas)
+
+def tabla_texto(informe):
+    partes = [
+        f"Perfil del motor de señales - {informe['generado']} - total {informe['total_s']}s",
+        "",
+        "=== Por estrategia y fase ===",
+        _tabla(informe["fases"], ["estrategia", "fase", "llamadas", "total_s", "media_ms", "max_ms", "pct", "pico_kb"]),
+        "",
+        "=== Por estrategia ===",
+        _tabla(informe["estrategias"], ["estrategia", "total_s", "pct"]),
+        "",
+        f"=== Simbolos mas lentos (top {len(informe['simbolos'])}) ===",
+        _tabla(informe["simbolos"], ["simbolo", "total_s"]),
+    ]
+    return "\n".join(partes) + "\n"
@@ -0,0 +1,141 @@
+# /home/ubuntu/tr/my_modules/registro_estrategias.py
+"""
+Registro de estrategias con requisitos declarados.
+
+Cada archivo de my_modules/estrategias declara a nivel de modulo (como literales):
+    VERSION      = "4.0"                      # cambio -> reconstruccion incremental
+    WARMUP       = 250                        # barras previas que necesita cada señal
+    COLUMNAS     = ["open", "high", "low", "close", "volume"]
+    MIN_HISTORIA = 20                         # con menos filas solo devuelve HOLD
+    PARAMETROS   = {"window": 20, "s": 2.5}   # valores por defecto (informativo)
+
+Las declaraciones se leen con ast sin importar el modulo: el arranque no carga
+`ta` ni crea loggers. El modulo se importa la primera vez que se ejecuta la
+estrategia. Con COLUMNAS y MIN_HISTORIA el motor lee solo las columnas necesarias
+y descarta, antes de cargar datos, las estrategias que no pueden correr sobre un
+simbolo.
+
+Uso:
+    python -m my_modules.registro_estrategias
+"""
+
+import ast
+import hashlib
+from importlib import import_module
+from pathlib import Path
+
+# === CONFIGURACION ===
+ESTRATEGIAS_DIR = "my_modules.estrategias"
+ESTRATEGIAS_PATH = Path("/home/ubuntu/tr/my_modules/estrategias")
+DECLARACIONES = ["VERSION", "WARMUP", "COLUMNAS", "MIN_HISTORIA", "PARAMETROS"]
+COLUMNAS_DEFECTO = ["open", "high", "low", "close", "volume"]
+
+# === LECTURA SIN IMPORTAR ===
+def leer_declaraciones(ruta):
+    fuente = Path(ruta).read_bytes()
+    arbol = ast.parse(fuente, filename=str(ruta))
+    valores = {}
+    funciones = {}
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Assign):
+            for destino in nodo.targets:
+                if isinstance(destino, ast.Name) and destino.id in DECLARACIONES:
+                    valores[destino.id] = ast.literal_eval(nodo.value)
+        elif isinstance(nodo, ast.FunctionDef):
+            funciones[nodo.name] = [a.arg for a in nodo.args.args + nodo.args.kwonlyargs]
+
+    if "generar_senales" not in funciones:
+        raise ValueError(f"{Path(ruta).name} no define generar_senales")
+    # Sin VERSION declarada se usa el hash del fuente: cualquier cambio fuerza reconstruccion
+    version = valores.get("VERSION") or hashlib.md5(fuente).hexdigest()[:12]
+    return {
+        "nombre": Path(ruta).stem,
+        "archivo": str(ruta),
+        "version": str(version),
+        "warmup": valores.get("WARMUP"),
+        "columnas": list(valores.get("COLUMNAS") or COLUMNAS_DEFECTO),
+        "min_historia": valores.get("MIN_HISTORIA") or 0,
+        "parametros": dict(valores.get("PARAMETROS") or {}),
+        "cache": "cache" in funciones["generar_senales"],
+        "panel": "generar_senales_panel" in funciones,
+    }
+
+# === REGISTRO ===
+class RegistroEstrategias:
+    def __init__(self, directorio=ESTRATEGIAS_PATH, paquete=ESTRATEGIAS_DIR):
+        self.paquete = paquete
+        self.entradas = {}
+        self.errores = {}
+        self._modulos = {}
+        for ruta in sorted(Path(directorio).glob("*.py")):
+            try:
+                self.entradas[ruta.stem] = leer_declaraciones(ruta)
+            except Exception as e:
+                self.errores[ruta.stem] = str(e)
+
+    def nombres(self):
+        return list(self.entradas)
+
+    def modulo(self, nombre):
+        # Import perezoso: solo la primera vez que se usa la estrategia
+        if nombre not in self._modulos:
+            self._modulos[nombre] = import_module(f"{self.paquete}.{nombre}")
+        return self._modulos[nombre]
+
+    def funcion(self, nombre):
+        return lambda *args, **kwargs: self.modulo(nombre).generar_senales(*args, **kwargs)
+
+    def funcion_panel(self, nombre):
+        if not self.entradas[nombre]["panel"]:
+            return None
+        return lambda *args, **kwargs: self.modulo(nombre).generar_senales_panel(*args, **kwargs)
+
+    def importadas(self):
+        return list(self._modulos)
+
+    def columnas(self, nombres=None):
+        # Union de las columnas necesarias, en el orden del historico
+        necesarias = {c for n in (nombres or self.entradas) for c in self.entradas[n]["columnas"]}
+        return [c for c in COLUMNAS_DEFECTO if c in necesarias] + sorted(necesarias - set(COLUMNAS_DEFECTO))
+
+    def ejecutables(self, nombres, filas=None, disponibles=None):
+        """
+        Separa las estrategias que pueden correr sobre un simbolo con `filas` barras
+        y las columnas `disponibles` (None = desconocido, no se descarta).
+        Devuelve (ejecutables, {nombre: motivo}).
+        """
+        ok, descartadas = [], {}
+        for nombre in nombres:
+            e = self.entradas[nombre]
+            faltan = sorted(set(e["columnas"]) - set(disponibles)) if disponibles is not None else []
+            if faltan:
+                descartadas[nombre] = f"faltan columnas {' '.join(faltan)}"
+            elif filas is not None and filas < e["min_historia"]:
+                descartadas[nombre] = f"{filas} filas < {e['min_historia']}"
+            else:
+                ok.append(nombre)
+        return ok, descartadas
+
+    def tabla(self):
+        filas = []
+        for nombre, e in self.entradas.items():
+            filas.append({
+                "estrategia": nombre, "version": e["version"], "warmup": e["warmup"],
+                "min_historia": e["min_historia"], "columnas": " ".join(e["columnas"]),
+                "cache": e["cache"], "panel": e["panel"],
+                "parametros": " ".join(f"{k}={v}" for k, v in e["parametros"].items()),
+            })
+        return filas
+
+def imprimir_registro(registro):
+    filas = registro.tabla()
+    columnas = ["estrategia", "version", "warmup", "min_historia", "columnas", "cache", "panel", "parametros"]
+    anchos = {c: max([len(c)] + [len(str(f[c])) for f in filas]) for c in columnas}
+    print("  ".join(c.ljust(anchos[c]) for c in columnas).rstrip())
+    for f in filas:
+        print("  ".join(str(f[c]).ljust(anchos[c]) for c in columnas).rstrip())
+    for nombre, error in registro.errores.items():
+        print(f"[ERROR] {nombre}: {error}")
+
+if __name__ == "__main__":
+    imprimir_registro(RegistroEstrategias())
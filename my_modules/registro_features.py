@@ -0,0 +1,190 @@
+# /home/ubuntu/tr/my_modules/registro_features.py
+"""
+Registro declarativo de features.
+
+Cada feature declara sus entradas, su ventana y su formula. Las entradas son
+columnas base (open, high, low, close, volume) o intermedios compartidos
+(medias, desviaciones, minimos y maximos moviles, diferencias, retornos) que se
+registran una sola vez por nombre: "low_min_60" lo usan todas las features que
+lo piden y se calcula una vez.
+
+Evaluador recorre el grafo de dependencias de las features pedidas (solo esas) y
+calcula cada nodo una vez sobre matrices barras x simbolos, para todo el universo
+a la vez. Sirve igual para la fila diaria (panel reciente) que para el backfill
+(my_modules/features.py) o para un DataFrame de un simbolo (calcular_df).
+
+Añadir una feature:
+    feature("ma_50", [media("close", 50)], _identidad)
+
+Uso:
+    python -m my_modules.registro_features
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules import panel as pn
+
+# === CONFIGURACION ===
+COLUMNAS_BASE = ("open", "high", "low", "close", "volume")
+NODOS = {}      # nombre -> {"entradas", "ventana", "formula", "publica"}
+
+# === DECLARACION ===
+def nodo(nombre, entradas, formula, ventana=1, publica=False):
+    """
+    Registra un nodo del grafo. `ventana` son las barras que consume (la barra
+    actual incluida) sobre sus entradas: 20 para una media de 20, n + 1 para un
+    desfase de n. Un intermedio con el mismo nombre se registra una sola vez.
+    """
+    if nombre in NODOS:
+        if publica and not NODOS[nombre]["publica"]:
+            raise ValueError(f"{nombre} ya esta registrado como intermedio")
+        return nombre
+    for e in entradas:
+        if e not in COLUMNAS_BASE and e not in NODOS:
+            raise ValueError(f"{nombre}: entrada desconocida {e}")
+    NODOS[nombre] = {"entradas": tuple(entradas), "ventana": ventana, "formula": formula, "publica": publica}
+    return nombre
+
+def feature(nombre, entradas, formula, ventana=1):
+    if nombre in NODOS:
+        raise ValueError(f"feature duplicada: {nombre}")
+    return nodo(nombre, entradas, formula, ventana, publica=True)
+
+def _identidad(x):
+    return x
+
+# Intermedios compartidos: devuelven el nombre del nodo para usarlo como entrada
+def media(col, ventana):
+    return nodo(f"{col}_media_{ventana}", [col], lambda x: pn.rolling_mean(x, ventana), ventana)
+
+def desviacion(col, ventana):
+    return nodo(f"{col}_std_{ventana}", [col], lambda x: pn.rolling_std(x, ventana), ventana)
+
+def minimo(col, ventana):
+    return nodo(f"{col}_min_{ventana}", [col], lambda x: pn.rolling_min(x, ventana), ventana)
+
+def maximo(col, ventana):
+    return nodo(f"{col}_max_{ventana}", [col], lambda x: pn.rolling_max(x, ventana), ventana)
+
+def desfase(col, n=1):
+    return nodo(f"{col}_lag_{n}", [col], lambda x: pn.shift(x, n), n + 1)
+
+def diferencia(col, n=1):
+    return nodo(f"{col}_diff_{n}", [col, desfase(col, n)], lambda x, previo: x - previo)
+
+def retorno(col, n=1):
+    # Igual que Series.pct_change(n)
+    return nodo(f"{col}_ret_{n}", [col, desfase(col, n)], lambda x, previo: x / previo - 1)
+
+def subidas(col):
+    return nodo(f"{col}_subida", [col], lambda x: np.clip(x, 0, None))
+
+def bajadas(col):
+    return nodo(f"{col}_bajada", [col], lambda x: -np.clip(x, None, 0))
+
+# === FEATURES ===
+# Mismas formulas que el fea.py original (RSI con medias simples de subidas y bajadas)
+feature("ma_5", [media("close", 5)], _identidad)
+feature("ma_20", [media("close", 20)], _identidad)
+feature("rsi_14", [media(subidas(diferencia("close")), 14), media(bajadas(diferencia("close")), 14)],
+        lambda sube, baja: 100 - (100 / (1 + sube / baja)))
+feature("pos_rango_60", ["close", minimo("low", 60), maximo("high", 60)],
+        lambda close, bajo, alto: (close - bajo) / (alto - bajo))
+feature("volatilidad_20", [desviacion("close", 20)], _identidad)
+feature("cambio_1d", [retorno("close", 1)], _identidad)
+feature("cambio_3d", [retorno("close", 3)], _identidad)
+feature("volume", ["volume"], _identidad)
+
+# === GRAFO ===
+def features_registradas():
+    return [n for n, d in NODOS.items() if d["publica"]]
+
+def _validar(nombres):
+    desconocidas = [n for n in nombres if n not in NODOS or not NODOS[n]["publica"]]
+    if desconocidas:
+        raise ValueError(f"features desconocidas: {', '.join(desconocidas)}")
+
+def orden(nombres):
+    # Nodos necesarios para `nombres` en orden topologico (dependencias primero)
+    _validar(nombres)
+    visitados, salida = set(), []
+
+    def visitar(n):
+        if n in visitados:
+            return
+        visitados.add(n)
+        for e in NODOS[n]["entradas"]:
+            # Una entrada con nombre de columna base es siempre la columna ("volume")
+            if e not in COLUMNAS_BASE:
+                visitar(e)
+        salida.append(n)
+
+    for n in nombres:
+        visitar(n)
+    return salida
+
+def columnas(nombres):
+    # Columnas base que hay que leer para calcular `nombres`
+    necesarias = {e for n in orden(nombres) for e in NODOS[n]["entradas"] if e in COLUMNAS_BASE}
+    return [c for c in COLUMNAS_BASE if c in necesarias]
+
+def calentamiento(nombres):
+    """
+    Barras propias que necesita un simbolo para que todas las features de `nombres`
+    tengan valor en su ultima barra (60 para pos_rango_60, 15 para rsi_14).
+    """
+    barras = {}
+    for n in orden(nombres):
+        previas = [1 if e in COLUMNAS_BASE else barras[e] for e in NODOS[n]["entradas"]]
+        barras[n] = max(previas, default=1) + NODOS[n]["ventana"] - 1
+    return max((barras[n] for n in nombres), default=1)
+
+# === EVALUACION ===
+class Evaluador:
+    """
+    Calcula features sobre `datos` (Panel de my_modules.panel o dict columna ->
+    matriz barras x simbolos). Guarda cada nodo calculado: llamadas sucesivas con
+    otras features reutilizan los intermedios ya hechos.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.valores = {}
+
+    def _entrada(self, nombre):
+        if nombre in COLUMNAS_BASE:
+            return self.datos[nombre]
+        return self.valores[nombre]
+
+    def calcular(self, nombres):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for n in orden(nombres):
+                if n not in self.valores:
+                    definicion = NODOS[n]
+                    self.valores[n] = definicion["formula"](*(self._entrada(e) for e in definicion["entradas"]))
+        return {n: self.valores[n] for n in nombres}
+
+def calcular(datos, nombres=None):
+    return Evaluador(datos).calcular(nombres or features_registradas())
+
+def calcular_df(df, nombres=None):
+    # Un simbolo: mismas formulas sobre matrices de una columna
+    nombres = nombres or features_registradas()
+    datos = {c: df[[c]].to_numpy(dtype="float64") for c in columnas(nombres)}
+    return pd.DataFrame({n: m[:, 0] for n, m in calcular(datos, nombres).items()}, index=df.index)
+
+# === MAIN ===
+def main():
+    for n in features_registradas():
+        print(f"{n:<16} calentamiento {calentamiento([n]):>3}  columnas {','.join(columnas([n])):<16} "
+              f"nodos {' -> '.join(orden([n]))}")
+    todos = orden(features_registradas())
+    print(f"{len(features_registradas())} features - {len(todos)} nodos "
+          f"(sin compartir serian {sum(len(orden([n])) for n in features_registradas())})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# /home/ubuntu/tr/my_modules/senales.py
+"""
+Formato columnar de señales: un dataset Parquet particionado por fecha
+(reports/senales_heuristicas/dataset/fecha=AAAA-MM-DD/*.parquet).
+
+- signal como int8 (HOLD=0, BUY=1, SELL=-1)
+- simbolo y estrategia como columnas de diccionario
+- por defecto solo se guardan las filas distintas de HOLD
+
+shu_cro.py escribe con escribir_senales() y alc_v1.py lee una sola particion con
+leer_senales(fecha=...).
+"""
+
+import uuid
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# === CONFIGURACION ===
+SENALES_PATH = Path("/home/ubuntu/tr/reports/senales_heuristicas/dataset")
+HOLD, BUY, SELL = 0, 1, -1
+CODIGOS = {"hold": HOLD, "buy": BUY, "sell": SELL}
+NOMBRES = np.array(["sell", "hold", "buy"], dtype=object)   # indice = codigo + 1
+
+ESQUEMA = pa.schema([
+    ("fecha", pa.date32()),
+    ("simbolo", pa.dictionary(pa.int32(), pa.string())),
+    ("estrategia", pa.dictionary(pa.int16(), pa.string())),
+    ("signal", pa.int8()),
+])
+PARTICION = ds.partitioning(pa.schema([("fecha", pa.date32())]), flavor="hive")
+
+# === CODIFICACION ===
+def codificar(df, solo_activas=True):
+    # DataFrame ['fecha', 'signal', 'estrategia', 'simbolo'] (signal en texto o int) -> pa.Table
+    signal = df["signal"]
+    if not pd.api.types.is_numeric_dtype(signal):
+        signal = signal.str.lower().map(CODIGOS).fillna(HOLD)
+    signal = signal.to_numpy(dtype=np.int8)
+    if solo_activas:
+        mascara = signal != HOLD
+        df, signal = df[mascara], signal[mascara]
+    return pa.table({
+        "fecha": pa.array(pd.to_datetime(df["fecha"]).values.astype("datetime64[D]"), type=pa.date32()),
+        "simbolo": pa.array(df["simbolo"].astype(str).to_numpy(dtype=object)).dictionary_encode(),
+        "estrategia": pa.array(df["estrategia"].astype(str).to_numpy(dtype=object)).dictionary_encode()
+                        .cast(ESQUEMA.field("estrategia").type),
+        "signal": pa.array(signal, type=pa.int8()),
+    }, schema=ESQUEMA)
+
+def decodificar(df):
+    # signal int8 -> 'buy' / 'sell' / 'hold' y diccionarios -> texto
+    df = df.copy()
+    df["signal"] = NOMBRES[df["signal"].to_numpy(dtype=np.int64) + 1]
+    for col in ["simbolo", "estrategia"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    return df
+
+# === ESCRITURA ===
+def escribir_senales(df, base=SENALES_PATH, solo_activas=True):
+    """
+    Escribe las señales reemplazando las particiones de las fechas presentes en df.
+    Devuelve el numero de filas escritas.
+    """
+    tabla = codificar(df, solo_activas) if isinstance(df, pd.DataFrame) else df
+    if tabla.num_rows == 0:
+        return 0
+    Path(base).mkdir(parents=True, exist_ok=True)
+    ds.write_dataset(
+        tabla, str(base), format="parquet", partitioning=PARTICION,
+        existing_data_behavior="delete_matching",
+        basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+    return tabla.num_rows
+
+def actualizar_senales(tabla, reconstruidas=None, base=SENALES_PATH):
+    """
+    Modo incremental: añade las filas de `tabla` y sustituye las filas previas de
+    los pares (simbolo, estrategia) reconstruidos ({simbolo: [estrategias]}).
+    Solo se reescriben las particiones de las fechas afectadas.
+    """
+    nuevas = tabla.to_pandas(date_as_object=True) if isinstance(tabla, pa.Table) else tabla
+    fechas = set(nuevas["fecha"])
+    pares = {(s, e) for s, nombres in (reconstruidas or {}).items() for e in nombres}
+
+    def _de_pares(df):
+        return pd.Series([c in pares for c in zip(df["simbolo"].astype(str), df["estrategia"].astype(str))],
+                         index=df.index, dtype=bool)
+
+    if pares:
+        previas = leer_senales(base, simbolos=sorted({s for s, _ in pares}), decodificar_signal=False)
+        fechas |= set(previas.loc[_de_pares(previas), "fecha"])
+    if not fechas:
+        return 0
+
+    actuales = leer_senales(base, desde=min(fechas), decodificar_signal=False)
+    actuales = actuales[actuales["fecha"].isin(fechas)]
+    if pares:
+        actuales = actuales[~_de_pares(actuales)]
+    total = pd.concat([actuales, nuevas], ignore_index=True)
+    total = total.drop_duplicates(["fecha", "simbolo", "estrategia"], keep="last")
+    # Fechas que se quedan sin filas: delete_matching no las tocaria
+    borrar_particiones(fechas - set(total["fecha"]), base)
+    return escribir_senales(total, base, solo_activas=False)
+
+def borrar_particiones(fechas, base=SENALES_PATH):
+    for fecha in fechas:
+        directorio = Path(base) / f"fecha={_iso(fecha)}"
+        if directorio.exists():
+            for archivo in directorio.glob("*.parquet"):
+                archivo.unlink()
+            directorio.rmdir()
+
+# === LECTURA ===
+def _iso(fecha):
+    return fecha.isoformat() if isinstance(fecha, date) else str(fecha)[:10]
+
+def fechas_disponibles(base=SENALES_PATH):
+    # Solo lista directorios, no abre archivos
+    return sorted(p.name.split("=", 1)[1] for p in Path(base).glob("fecha=*") if p.is_dir())
+
+def leer_senales(base=SENALES_PATH, fecha=None, desde=None, hasta=None, simbolos=None,
+                 estrategias=None, decodificar_signal=True):
+    if not Path(base).exists():
+        return pd.DataFrame(columns=ESQUEMA.names)
+    dataset = ds.dataset(str(base), format="parquet", partitioning=PARTICION)
+    filtro = None
+    condiciones = []
+    if fecha is not None:
+        condiciones.append(ds.field("fecha") == pa.scalar(pd.Timestamp(_iso(fecha)).date(), pa.date32()))
+    if desde is not None:
+        condiciones.append(ds.field("fecha") >= pa.scalar(pd.Timestamp(_iso(desde)).date(), pa.date32()))
+    if hasta is not None:
+        condiciones.append(ds.field("fecha") <= pa.scalar(pd.Timestamp(_iso(hasta)).date(), pa.date32()))
+    if simbolos is not None:
+        condiciones.append(ds.field("simbolo").isin(list(simbolos)))
+    if estrategias is not None:
+        condiciones.append(ds.field("estrategia").isin(list(estrategias)))
+    for c in condiciones:
+        filtro = c if filtro is None else filtro & c
+
+    # El filtro por fecha poda particiones: solo se abren los archivos de esas fechas
+    df = dataset.to_table(columns=ESQUEMA.names, filter=filtro).to_pandas(date_as_object=True)
+    df = df.sort_values(["fecha", "simbolo", "estrategia"], kind="stable").reset_index(drop=True)
+    return decodificar(df) if decodificar_signal else df
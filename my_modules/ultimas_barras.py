@@ -0,0 +1,128 @@
+# /home/ubuntu/tr/my_modules/ultimas_barras.py
+"""
+Indice de ultimas barras: las K barras mas recientes de todos los simbolos en un
+unico Parquet pequeño (simbolo, fecha, open, high, low, close, volume), ordenado
+por simbolo y fecha.
+
+upd.py lo regenera al final de cada consolidacion a partir del panel reciente ya
+parcheado (sin releer historicos). Los consumidores que solo necesitan la ultima
+cotizacion (alc_v1.py) lo cargan una vez y consultan por simbolo en O(1), en vez
+de abrir el historico de cada simbolo con señal.
+
+Uso:
+    ultimas = UltimasBarras()
+    ultimas.cierre("AAPL")                  # ultimo cierre
+    ultimas.cierre("AAPL", fecha)           # cierre en esa fecha (None si no esta)
+    ultimas.ultima("AAPL")                  # {"fecha": ..., "open": ..., ...}
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from my_modules.historico import load_history
+from my_modules.panel_reciente import COLUMNAS
+
+# === CONFIGURACION ===
+ULTIMAS_PATH = Path("/home/ubuntu/tr/data/ultimas_barras.parquet")
+NUM_BARRAS = 5
+
+# === CONSTRUCCION ===
+def _barras_simbolo(simbolo, k, panel=None):
+    # Del panel reciente si lo tiene (vistas sobre el mmap); si no, del historico
+    if panel is not None and simbolo in panel:
+        arrays = panel.arrays(simbolo)
+        return {c: v[-k:] for c, v in arrays.items()}
+    df = load_history(simbolo, columns=COLUMNAS, ultimas=k)
+    if df.empty:
+        return None
+    arrays = {"fecha": pd.to_datetime(df["fecha"]).values.astype("datetime64[D]").astype("int32")}
+    for c in COLUMNAS:
+        arrays[c] = df[c].to_numpy(dtype="float64") if c in df.columns else np.full(len(df), np.nan)
+    return arrays
+
+def actualizar_ultimas(simbolos, panel=None, k=NUM_BARRAS, path=ULTIMAS_PATH):
+    """
+    Escribe el indice para `simbolos` con sus ultimas `k` barras. `panel` es un
+    PanelReciente abierto: los simbolos que contiene no tocan el historico.
+    Devuelve el numero de simbolos escritos.
+    """
+    nombres, partes = [], []
+    for simbolo in simbolos:
+        arrays = _barras_simbolo(simbolo, k, panel)
+        if arrays is None or len(arrays["fecha"]) == 0:
+            continue
+        nombres.append(simbolo)
+        partes.append(arrays)
+
+    longitudes = [len(p["fecha"]) for p in partes]
+    datos = {
+        "simbolo": pa.DictionaryArray.from_arrays(
+            pa.array(np.repeat(np.arange(len(nombres), dtype=np.int32), longitudes)), pa.array(nombres, pa.string())),
+        "fecha": pa.array(np.concatenate([p["fecha"] for p in partes]) if partes else np.array([], np.int32),
+                          pa.int32()).cast(pa.date32()),
+    }
+    for c in COLUMNAS:
+        datos[c] = pa.array(np.concatenate([p[c] for p in partes]) if partes else np.array([]), pa.float64())
+    tabla = pa.table(datos)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    pq.write_table(tabla, tmp, compression="zstd")
+    os.replace(tmp, path)
+    return len(nombres)
+
+# === LECTURA ===
+class UltimasBarras:
+    def __init__(self, path=ULTIMAS_PATH):
+        tabla = pq.read_table(str(path), read_dictionary=["simbolo"])
+        simbolo = tabla.column("simbolo").combine_chunks()
+        codigos = simbolo.indices.to_numpy()
+        # Filas contiguas por simbolo: indice simbolo -> (offset, longitud)
+        cortes = np.flatnonzero(np.diff(codigos)) + 1
+        inicios = np.concatenate([[0], cortes]) if len(codigos) else np.array([], dtype=int)
+        finales = np.concatenate([cortes, [len(codigos)]]) if len(codigos) else np.array([], dtype=int)
+        nombres = simbolo.dictionary.to_pylist()
+        self.indice = {nombres[codigos[i]]: (int(i), int(f - i)) for i, f in zip(inicios, finales)}
+        self.fechas = tabla.column("fecha").to_numpy().astype("datetime64[D]")
+        self.columnas = {c: tabla.column(c).to_numpy() for c in COLUMNAS}
+
+    def __contains__(self, simbolo):
+        return simbolo in self.indice
+
+    def simbolos(self):
+        return list(self.indice)
+
+    def _fila(self, simbolo, fecha=None):
+        if simbolo not in self.indice:
+            return None
+        o, l = self.indice[simbolo]
+        if fecha is None:
+            return o + l - 1
+        # Como mucho K barras: busqueda directa de la fecha exacta
+        fechas = self.fechas[o:o + l]
+        coincide = np.flatnonzero(fechas == np.datetime64(pd.Timestamp(fecha).date(), "D"))
+        return o + int(coincide[-1]) if len(coincide) else None
+
+    def ultima(self, simbolo, fecha=None):
+        i = self._fila(simbolo, fecha)
+        if i is None:
+            return None
+        fila = {"fecha": self.fechas[i].astype(object)}
+        fila.update({c: float(v[i]) for c, v in self.columnas.items()})
+        return fila
+
+    def cierre(self, simbolo, fecha=None):
+        i = self._fila(simbolo, fecha)
+        return None if i is None else float(self.columnas["close"][i])
+
+    def barras(self, simbolo):
+        o, l = self.indice[simbolo]
+        df = pd.DataFrame({c: v[o:o + l] for c, v in self.columnas.items()})
+        df.insert(0, "fecha", self.fechas[o:o + l].astype(object))
+        return df
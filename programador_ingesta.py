@@ -0,0 +1,179 @@
+# Programador de la ingesta: decide que simbolos refresca cada tick de EventBridge.
+# Se empaqueta junto a ingest_TwelveData.py en la Lambda y no depende de AWS,
+# asi que se puede simular offline:
+#   python programador_ingesta.py --simbolos 400 --dias 20 --creditos 100 --ticks 4
+
+import argparse
+import json
+import math
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# === CONFIGURACION ===
+MAX_ERRORES = 5            # a partir de aqui el simbolo solo se reintenta tras el backoff
+BACKOFF_HORAS = 6          # espera tras un error; se duplica con cada error consecutivo
+PAGINA = 5000              # barras por llamada time_series
+LATENCIA_DEFECTO = 1.5     # segundos por llamada si aun no hay historico
+MARGEN_TIEMPO = 30         # segundos reservados para guardar estado y logs
+ZONA_MERCADO = ZoneInfo("America/New_York")
+CIERRE_MERCADO = time(16, 30)   # hora de la bolsa: cierre 16:00 + margen para que el proveedor publique la barra
+
+# === CALENDARIO ===
+def es_habil(dia, feriados=()):
+    return dia.weekday() < 5 and dia.isoformat() not in feriados
+
+def ultimo_dia_habil(hoy, feriados=()):
+    dia = hoy
+    while not es_habil(dia, feriados):
+        dia -= timedelta(days=1)
+    return dia
+
+def ultima_sesion_cerrada(ahora, feriados=()):
+    # `ahora` en UTC sin tzinfo (datetime.utcnow()); la sesion del dia solo cuenta
+    # a partir de CIERRE_MERCADO en hora de la bolsa: antes su barra es parcial
+    local = ahora.replace(tzinfo=timezone.utc).astimezone(ZONA_MERCADO)
+    dia = local.date() if local.time() >= CIERRE_MERCADO else local.date() - timedelta(days=1)
+    return ultimo_dia_habil(dia, feriados)
+
+def barras_pendientes(ultima_fecha, hoy, feriados=()):
+    # Sesiones de mercado posteriores a ultima_fecha hasta el ultimo dia habil
+    if not ultima_fecha:
+        return None
+    dia = datetime.strptime(ultima_fecha[:10], "%Y-%m-%d").date() + timedelta(days=1)
+    fin = ultimo_dia_habil(hoy, feriados)
+    if dia > fin:
+        return 0
+    # Conteo aproximado rapido para huecos largos, exacto para los cortos
+    if (fin - dia).days > 60:
+        return math.ceil((fin - dia).days * 5 / 7)
+    n = 0
+    while dia <= fin:
+        n += es_habil(dia, feriados)
+        dia += timedelta(days=1)
+    return n
+
+# === PUNTUACION ===
+def evaluar_simbolo(estado, ahora, feriados=()):
+    """
+    Devuelve (prioridad, creditos, motivo). Prioridad None significa que no se refresca.
+    """
+    pendientes = barras_pendientes(estado.get("ultima_fecha"), ultima_sesion_cerrada(ahora, feriados), feriados)
+    errores = estado.get("errores", 0)
+
+    if errores and estado.get("ultimo_error"):
+        ultimo_error = datetime.fromisoformat(estado["ultimo_error"].rstrip("Z"))
+        espera = timedelta(hours=BACKOFF_HORAS * 2 ** (min(errores, MAX_ERRORES) - 1))
+        if ahora - ultimo_error < espera:
+            return None, 0, f"backoff {errores} errores"
+
+    if pendientes is None:
+        return 1000.0, 1, "sin historico"
+    if pendientes == 0:
+        return None, 0, "al dia"
+
+    creditos = 1 + pendientes // PAGINA
+    # Mas barras pendientes = mas prioridad; los errores recientes la reducen
+    prioridad = pendientes / (1 + errores)
+    return prioridad, creditos, f"{pendientes} barras pendientes"
+
+def tiempo_estimado(n_simbolos, creditos, lote, workers, creditos_min, latencia):
+    llamadas = math.ceil(n_simbolos / max(lote, 1))
+    espera_limitador = max(0, creditos - creditos_min) * 60.0 / creditos_min
+    return max(llamadas * latencia / max(workers, 1), espera_limitador)
+
+def planificar_tick(simbolos, estados, ahora, creditos_max, tiempo_max, lote=8, workers=4,
+                    creditos_min=8, feriados=()):
+    """
+    Ordena los simbolos por prioridad y llena el presupuesto de creditos y de tiempo.
+    Devuelve (simbolos seleccionados, decisiones [(simbolo, decision, motivo)]).
+    """
+    latencias = [e["latencia"] for e in estados.values() if e.get("latencia")]
+    latencia = sum(latencias) / len(latencias) if latencias else LATENCIA_DEFECTO
+
+    candidatos = []
+    decisiones = []
+    for simbolo in simbolos:
+        prioridad, creditos, motivo = evaluar_simbolo(estados.get(simbolo, {}), ahora, feriados)
+        if prioridad is None:
+            decisiones.append((simbolo, "OMITIDO", motivo))
+        else:
+            candidatos.append((prioridad, simbolo, creditos, motivo))
+
+    candidatos.sort(key=lambda c: (-c[0], c[1]))
+    seleccionados = []
+    creditos_usados = 0
+    for prioridad, simbolo, creditos, motivo in candidatos:
+        t = tiempo_estimado(len(seleccionados) + 1, creditos_usados + creditos, lote, workers,
+                            creditos_min, latencia)
+        if creditos_usados + creditos > creditos_max:
+            decisiones.append((simbolo, "DIFERIDO", f"{motivo} - sin creditos"))
+        elif t > tiempo_max:
+            decisiones.append((simbolo, "DIFERIDO", f"{motivo} - sin tiempo"))
+        else:
+            seleccionados.append(simbolo)
+            creditos_usados += creditos
+            decisiones.append((simbolo, "SELECCIONADO", f"{motivo} - prioridad {prioridad:.1f}"))
+    return seleccionados, decisiones
+
+def registrar_resultado(estado, ok, ahora, fecha_max=None, latencia=None, sin_datos=False, feriados=()):
+    if ok:
+        estado["errores"] = 0
+        estado.pop("ultimo_error", None)
+        if sin_datos:
+            # Sin barras nuevas en sesiones ya cerradas (feriado no listado, suspension): se
+            # avanza solo hasta la ultima cerrada, la de hoy se vuelve a pedir tras el cierre
+            fecha_max = max(fecha_max or "", ultima_sesion_cerrada(ahora, feriados).isoformat())
+        if fecha_max:
+            estado["ultima_fecha"] = max(estado.get("ultima_fecha", ""), fecha_max[:10])
+    else:
+        estado["errores"] = estado.get("errores", 0) + 1
+        estado["ultimo_error"] = ahora.isoformat() + "Z"
+    if latencia:
+        # Media movil exponencial de la latencia por llamada
+        previa = estado.get("latencia")
+        estado["latencia"] = round(latencia if previa is None else 0.8 * previa + 0.2 * latencia, 3)
+    estado["ultimo_intento"] = ahora.isoformat() + "Z"
+    return estado
+
+# === SIMULACION OFFLINE ===
+def simular(n_simbolos, dias, creditos_tick, ticks_dia, tiempo_tick=840, prob_error=0.02,
+            lote=8, workers=4, creditos_min=8, inicio=None, semilla=0):
+    rnd = random.Random(semilla)
+    inicio = inicio or date.today() - timedelta(days=dias)
+    simbolos = [f"S{i:04d}" for i in range(n_simbolos)]
+    estados = {s: {"ultima_fecha": (inicio - timedelta(days=rnd.randint(1, 10))).isoformat()} for s in simbolos}
+    resumen = []
+
+    for d in range(dias):
+        hoy = inicio + timedelta(days=d)
+        creditos_dia = 0
+        for t in range(ticks_dia):
+            ahora = datetime.combine(hoy, datetime.min.time()) + timedelta(hours=22 + t * (2 / max(ticks_dia, 1)))
+            seleccion, _ = planificar_tick(simbolos, estados, ahora, creditos_tick, tiempo_tick,
+                                           lote, workers, creditos_min)
+            for s in seleccion:
+                ok = rnd.random() >= prob_error
+                creditos_dia += 1
+                registrar_resultado(estados[s], ok, ahora, ultima_sesion_cerrada(ahora).isoformat() if ok else None,
+                                    LATENCIA_DEFECTO)
+        al_dia = sum(1 for s in simbolos if barras_pendientes(estados[s].get("ultima_fecha"), ultima_sesion_cerrada(ahora)) == 0)
+        resumen.append({"fecha": hoy.isoformat(), "habil": es_habil(hoy), "creditos": creditos_dia,
+                        "al_dia": al_dia, "pct_al_dia": round(100 * al_dia / n_simbolos, 1),
+                        "al_dia_por_credito": round(al_dia / creditos_dia, 2) if creditos_dia else None})
+    return resumen
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulacion offline del programador de ingesta")
+    parser.add_argument("--simbolos", type=int, default=400)
+    parser.add_argument("--dias", type=int, default=20)
+    parser.add_argument("--creditos", type=int, default=100, help="creditos por tick")
+    parser.add_argument("--ticks", type=int, default=4, help="ticks de EventBridge por dia")
+    parser.add_argument("--prob-error", type=float, default=0.02)
+    args = parser.parse_args()
+
+    for fila in simular(args.simbolos, args.dias, args.creditos, args.ticks, prob_error=args.prob_error):
+        print(json.dumps(fila))
+
+if __name__ == "__main__":
+    main()
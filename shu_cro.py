@@ -13,121 +13,429 @@ Mejoras implementadas:
 - Log de estrategias cargadas exitosamente
 - Log por símbolo de estrategias que generaron señales
 - Limpieza del directorio de salida antes de ejecutar
+- Modo paralelo por simbolos (--workers N), con resultados identicos al serial
+- Modo panel (--panel): las estrategias con generar_senales_panel se evaluan para
+  todo el universo en una pasada vectorizada (my_modules/panel.py)
+- Modo incremental (--modo incremental|ultima): solo barras nuevas + calentamiento,
+  con reconstruccion completa cuando cambia la VERSION de una estrategia
+- Registro de estrategias (--listar-estrategias): requisitos declarados sin importar
+  el modulo; solo se leen las columnas necesarias y se descartan antes de cargar
+  datos las estrategias que no pueden correr sobre un simbolo
+- Perfilado (--perfil, --perfil-memoria, --perfil-simbolo/--perfil-estrategia):
+  tiempos por estrategia, simbolo y fase en reports/perfilado (my_modules/perfilado.py)
+- Formato de salida (--formato csv|parquet|ambos): parquet escribe un unico dataset
+  particionado por fecha con señales int8 y solo filas BUY/SELL (my_modules/senales.py)
 
 Ubicación de estrategias:
 --------------------------
 - Directorio: /home/ubuntu/tr/my_modules/estrategias
 - Cada archivo .py debe contener una función: generar_senales(df)
+- Opcional: VERSION, WARMUP, COLUMNAS, MIN_HISTORIA y PARAMETROS como literales
+  (ver my_modules/registro_estrategias.py)
 
 ===========================================================================
 """
 
 import os
 import json
+import argparse
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+from datetime import datetime, date
 from pathlib import Path
-from importlib import import_module
+from multiprocessing import Pool
 import traceback
 import sys
 
 sys.path.append("/home/ubuntu/tr")
+from my_modules import historico
+from my_modules.historico import load_history
+from my_modules.indicadores import CacheIndicadores
+from my_modules.logs_async import configurar, salida_archivo
+from my_modules.panel import cargar_panel
+from my_modules.perfilado import Perfilador
+from my_modules.registro_estrategias import RegistroEstrategias, imprimir_registro
+from my_modules.senales import ESQUEMA, actualizar_senales, borrar_particiones, codificar, \
+    escribir_senales, fechas_disponibles
 
 # === CONFIGURACION ===
 CONFIG_PATH = Path("/home/ubuntu/tr/config/symbol_groups.json")
-HISTORIC_PATH = Path("/home/ubuntu/tr/data/historic")
 OUTPUT_PATH = Path("/home/ubuntu/tr/reports/senales_heuristicas/historicas")
 LOG_PATH = Path(f"/home/ubuntu/tr/logs/utils/shu_{datetime.now().date()}.csv")
 STATUS_PATH = Path("/home/ubuntu/tr/config/system_status.json")
-ESTRATEGIAS_DIR = "my_modules.estrategias"
+ESTADO_INCREMENTAL_PATH = Path("/home/ubuntu/tr/reports/senales_heuristicas/estado_incremental.json")
 ESTRATEGIAS_PATH = "/home/ubuntu/tr/my_modules/estrategias"
 
-# === CARGAR SIMBOLOS ===
-with open(CONFIG_PATH, "r") as f:
-    grupos = json.load(f)
+_SIN_PERFIL = Perfilador()
 
-SIMBOLOS = sorted(set(sum(grupos.values(), [])))
+# === CARGAR SIMBOLOS ===
+def cargar_simbolos():
+    with open(CONFIG_PATH, "r") as f:
+        grupos = json.load(f)
+    return sorted(set(sum(grupos.values(), [])))
 
 # === CARGAR FUNCIONES DE ESTRATEGIAS ===
-estrategias = {}
-estrategias_cargadas = []
+def cargar_estrategias():
+    # Solo lee las declaraciones: cada modulo se importa la primera vez que se ejecuta
+    registro = RegistroEstrategias(ESTRATEGIAS_PATH)
+    for nombre, error in registro.errores.items():
+        print(f"[ERROR] No se pudo cargar {nombre}.py: {error}")
+    estrategias = {nombre: registro.funcion(nombre) for nombre in registro.nombres()}
+    return estrategias, registro.nombres(), registro
 
-for archivo in os.listdir(ESTRATEGIAS_PATH):
-    if archivo.endswith(".py"):
-        try:
-            mod = import_module(f"{ESTRATEGIAS_DIR}.{archivo[:-3]}")
-            estrategias[archivo[:-3]] = mod.generar_senales
-            estrategias_cargadas.append(archivo[:-3])
-        except Exception as e:
-            print(f"[ERROR] No se pudo cargar {archivo}: {e}")
+# Escritura por lotes desde un hilo (my_modules/logs_async.py), tambien desde los workers
+eventos = configurar("shu_cro", [salida_archivo(LOG_PATH, columnas=["ts", "modulo", "status", "mensaje", "dur"])])
 
 # Loguear estrategias cargadas
-def log_event(modulo, status, mensaje, inicio):
-    fin = datetime.now()
-    dur = round((fin - inicio).total_seconds(), 2)
-    ts = fin.strftime("%Y-%m-%d %H:%M:%S")
-    linea = f"{ts},{modulo},{status},{mensaje},{dur}s\n"
-    with open(LOG_PATH, "a") as f:
-        f.write(linea)
+def log_event(modulo, status, mensaje, inicio, dur=None):
+    if dur is None:
+        dur = round((datetime.now() - inicio).total_seconds(), 2)
+    eventos.info(mensaje, extra={"campos": {"modulo": modulo, "status": status, "dur": f"{dur}s"}})
     print(f"[{modulo}] {status}: {mensaje} ({dur}s)")
 
-log_event("loader", "OK", f"Estrategias cargadas: {', '.join(estrategias_cargadas)}", datetime.now())
+# === ESTADO INCREMENTAL ===
+def cargar_estado_incremental():
+    if not ESTADO_INCREMENTAL_PATH.exists():
+        return {}
+    with open(ESTADO_INCREMENTAL_PATH, "r") as f:
+        return json.load(f)
 
-# === LIMPIAR OUTPUT ANTERIOR ===
-OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
-for f in OUTPUT_PATH.glob("*.csv"):
-    f.unlink()
+def guardar_estado_incremental(estado):
+    tmp = ESTADO_INCREMENTAL_PATH.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(estado, f, indent=1)
+    os.replace(tmp, ESTADO_INCREMENTAL_PATH)
 
-# === PROCESAR SIMBOLOS ===
-errores = []
-inicio_total = datetime.now()
+def _fechas(df_out):
+    return pd.to_datetime(df_out["fecha"]).dt.date
 
-for simbolo in SIMBOLOS:
+def planificar_incremental(estrategias, info, estado_simbolo):
+    # None = reconstruccion completa (sin estado, version nueva o sin WARMUP declarado)
+    plan = {}
+    for nombre in estrategias:
+        e = estado_simbolo.get(nombre)
+        if not e or e.get("version") != info[nombre]["version"] or info[nombre]["warmup"] is None:
+            plan[nombre] = None
+        else:
+            plan[nombre] = date.fromisoformat(e["ultima_fecha"])
+    return plan
+
+def cargar_entrada(simbolo, estrategias, info, plan, solo_ultima, columnas=None):
+    if any(ultima is None for ultima in plan.values()):
+        return load_history(simbolo, columns=columnas)
+    warmup = max(info[n]["warmup"] for n in estrategias)
+    if solo_ultima:
+        # Camino barato del dia: calentamiento + la ultima barra
+        df = load_history(simbolo, columns=columnas, ultimas=warmup + 1)
+        if len(df) < 2 or all(df["fecha"].iloc[-2] <= ultima for ultima in plan.values()):
+            return df
+    n_nuevas = len(load_history(simbolo, start=min(plan.values()), columns=["fecha"])) - 1
+    return load_history(simbolo, columns=columnas, ultimas=warmup + max(n_nuevas, 0) + 1)
+
+def escribir_incremental(simbolo, df_nuevo, reconstruidas):
+    ruta = OUTPUT_PATH / f"{simbolo}_senales.csv"
+    if reconstruidas and ruta.exists():
+        # Se sustituyen las filas de las estrategias con version nueva
+        df_previo = pd.read_csv(ruta)
+        df_previo = df_previo[~df_previo["estrategia"].isin(reconstruidas)]
+        df_total = pd.concat([df_previo, df_nuevo], ignore_index=True)
+        df_total = df_total.sort_values("fecha", kind="stable").reset_index(drop=True)
+        df_total.to_csv(ruta, index=False)
+    elif ruta.exists():
+        # Las filas nuevas son posteriores a todo lo guardado: basta con añadirlas
+        columnas = pd.read_csv(ruta, nrows=0).columns
+        df_nuevo.reindex(columns=columnas).to_csv(ruta, mode="a", header=False, index=False)
+    else:
+        df_nuevo.to_csv(ruta, index=False)
+
+# === PROCESAR SIMBOLO ===
+def procesar_simbolo(simbolo, estrategias, registro=None, modo="completo", estado_simbolo=None,
+                     df=None, precalculadas=None, formato="csv", perfil=None):
+    # Calcula y escribe las señales de un simbolo. No loguea: devuelve un resultado
+    # compacto que registrar_resultado() vuelca igual en modo serial y paralelo.
     inicio = datetime.now()
+    duracion = lambda: round((datetime.now() - inicio).total_seconds(), 2)
+    resultado = {"simbolo": simbolo, "status": None, "mensaje": None, "dur": None,
+                 "errores_estrategia": [], "traza": None, "estado": {}, "cache": None,
+                 "senales": None, "reconstruidas": [], "descartadas": {}, "perfil": None}
     estrategias_activas = []
+    incremental = modo != "completo"
+    info = registro.entradas if registro is not None else None
+    perfil = perfil or _SIN_PERFIL
     try:
-        archivo = HISTORIC_PATH / f"{simbolo}.parquet"
-        if not archivo.exists():
-            raise FileNotFoundError(f"{archivo} no encontrado")
+        columnas = None
+        if registro is not None:
+            # Requisitos declarados: se descarta antes de leer datos (manifest y footer)
+            if df is None:
+                filas, disponibles = historico.filas(simbolo), historico.columnas(simbolo)
+            else:
+                filas, disponibles = len(df), list(df.columns)
+            nombres, resultado["descartadas"] = registro.ejecutables(list(estrategias), filas, disponibles)
+            estrategias = {nombre: estrategias[nombre] for nombre in nombres}
+            if not estrategias and resultado["descartadas"]:
+                resultado["status"] = "SKIP"
+                resultado["mensaje"] = f"{simbolo} sin estrategias ejecutables"
+                resultado["dur"] = duracion()
+                return resultado
+            columnas = registro.columnas(nombres)
 
-        df = pd.read_parquet(archivo).reset_index(drop=True)
+        with perfil.fase(simbolo, "-", "lectura"):
+            if incremental:
+                plan = planificar_incremental(estrategias, info, estado_simbolo or {})
+                df = cargar_entrada(simbolo, estrategias, info, plan, modo == "ultima", columnas)
+            else:
+                plan = {nombre: None for nombre in estrategias}
+                df = load_history(simbolo, columns=columnas) if df is None else df
+        if df.empty:
+            raise FileNotFoundError(f"historico de {simbolo} no encontrado")
+        ultima_df = df["fecha"].max()
         resultados = []
+        reconstruidas = set()
+        # Indicadores compartidos por las estrategias que aceptan `cache`
+        cache = CacheIndicadores(df)
 
         for nombre_est, funcion in estrategias.items():
             try:
-                df_out = funcion(df.copy())
+                ultima = plan[nombre_est]
+                if ultima is not None:
+                    n_nuevas = int((df["fecha"] > ultima).sum())
+                    if n_nuevas == 0:
+                        continue
+                    entrada = df.tail(info[nombre_est]["warmup"] + n_nuevas)
+                else:
+                    entrada = df
+                with perfil.fase(simbolo, nombre_est, "calculo"), perfil.captura(simbolo, nombre_est):
+                    if precalculadas and nombre_est in precalculadas:
+                        # Salida ya calculada por la version panel de la estrategia
+                        df_out = precalculadas[nombre_est]
+                    elif info and info[nombre_est]["cache"]:
+                        df_out = funcion(entrada.copy(), cache=cache)
+                    else:
+                        df_out = funcion(entrada.copy())
+                if df_out is not None and ultima is not None:
+                    df_out = df_out[_fechas(df_out) > ultima]
+                elif df_out is not None and incremental:
+                    reconstruidas.add(nombre_est)
+                    reconstruidas.update(df_out["estrategia"].unique())
+                if info:
+                    resultado["estado"][nombre_est] = {"ultima_fecha": ultima_df.isoformat(),
+                                                       "version": info[nombre_est]["version"]}
                 if df_out is not None and not df_out.empty:
                     df_out["simbolo"] = simbolo
                     resultados.append(df_out)
                     estrategias_activas.append(nombre_est)
             except Exception as estr_err:
-                log_event(nombre_est, "ERROR", f"{simbolo} fallo interno: {estr_err}", inicio)
+                resultado["errores_estrategia"].append((nombre_est, f"{simbolo} fallo interno: {estr_err}", duracion()))
+
+        resultado["cache"] = cache.stats()
 
         if resultados:
-            df_result = pd.concat(resultados)
-            df_result["fecha"] = pd.to_datetime(df_result["fecha"])
-            df_result = df_result.sort_values("fecha").reset_index(drop=True)
-            df_result["fecha"] = df_result["fecha"].dt.strftime("%Y-%m-%d")
-            df_result.to_csv(OUTPUT_PATH / f"{simbolo}_senales.csv", index=False)
-            log_event(simbolo, "OK", f"{simbolo} procesado - estrategias: {', '.join(estrategias_activas)}", inicio)
+            with perfil.fase(simbolo, "-", "concat"):
+                df_result = pd.concat(resultados)
+                df_result["fecha"] = pd.to_datetime(df_result["fecha"])
+                df_result = df_result.sort_values("fecha").reset_index(drop=True)
+                if formato != "csv":
+                    # Solo filas BUY/SELL con codigos int8: es lo que viaja de vuelta al proceso principal
+                    resultado["senales"] = codificar(df_result)
+                    resultado["reconstruidas"] = sorted(reconstruidas)
+            if formato != "parquet":
+                with perfil.fase(simbolo, "-", "escritura"):
+                    df_result["fecha"] = df_result["fecha"].dt.strftime("%Y-%m-%d")
+                    if incremental:
+                        escribir_incremental(simbolo, df_result, reconstruidas)
+                    else:
+                        df_result.to_csv(OUTPUT_PATH / f"{simbolo}_senales.csv", index=False)
+            resultado["status"] = "OK"
+            resultado["mensaje"] = f"{simbolo} procesado - estrategias: {', '.join(estrategias_activas)}"
         else:
-            log_event(simbolo, "SKIP", f"{simbolo} sin señales generadas", inicio)
+            resultado["status"] = "SKIP"
+            resultado["mensaje"] = f"{simbolo} sin señales generadas"
 
     except Exception as e:
-        errores.append(simbolo)
-        log_event(simbolo, "ERROR", f"{simbolo} fallo global: {str(e)}", inicio)
-        traceback.print_exc()
-
-log_event("shu", "RESUMEN", f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente", inicio_total)
-
-# === ACTUALIZAR ESTADO ===
-estado = {
-    "fecha": datetime.now().strftime("%Y-%m-%d"),
-    "status": "OK" if not errores else "ERROR",
-    "mensaje": f"{len(SIMBOLOS)-len(errores)} de {len(SIMBOLOS)} procesados correctamente"
-}
-with open(STATUS_PATH, "r") as f:
-    status_json = json.load(f)
-status_json["senales_heuristicas"] = estado
-with open(STATUS_PATH, "w") as f:
-    json.dump(status_json, f, indent=2)
+        resultado["status"] = "ERROR"
+        resultado["mensaje"] = f"{simbolo} fallo global: {str(e)}"
+        resultado["traza"] = traceback.format_exc()
+
+    resultado["dur"] = duracion()
+    return resultado
+
+def registrar_resultado(resultado, errores, estado=None, stats_cache=None, salida=None, perfil=None):
+    if perfil is not None:
+        perfil.fusionar(resultado["perfil"])
+    if salida is not None and resultado["senales"] is not None:
+        salida["tablas"].append(resultado["senales"])
+        if resultado["reconstruidas"]:
+            salida["reconstruidas"][resultado["simbolo"]] = resultado["reconstruidas"]
+    if stats_cache is not None and resultado["cache"]:
+        for k in ["hits", "misses", "expulsiones"]:
+            stats_cache[k] = stats_cache.get(k, 0) + resultado["cache"][k]
+    if estado is not None and resultado["estado"]:
+        estado.setdefault(resultado["simbolo"], {}).update(resultado["estado"])
+    for nombre_est, motivo in resultado["descartadas"].items():
+        log_event(nombre_est, "SKIP", f"{resultado['simbolo']} descartada: {motivo}", None, 0)
+    for nombre_est, mensaje, dur in resultado["errores_estrategia"]:
+        log_event(nombre_est, "ERROR", mensaje, None, dur)
+    log_event(resultado["simbolo"], resultado["status"], resultado["mensaje"], None, resultado["dur"])
+    if resultado["status"] == "ERROR":
+        errores.append(resultado["simbolo"])
+        print(resultado["traza"], file=sys.stderr, end="")
+
+# === MODO PARALELO ===
+_estrategias_worker = None
+_registro_worker = None
+_perfil_worker = None
+
+def _inicializar_worker(config_perfil=None):
+    # Cada proceso lee el registro una sola vez e importa las estrategias al usarlas
+    global _estrategias_worker, _registro_worker, _perfil_worker
+    _estrategias_worker, _, _registro_worker = cargar_estrategias()
+    _perfil_worker = config_perfil
+
+def _procesar_en_worker(tarea):
+    simbolo, modo, estado_simbolo, formato = tarea
+    # Perfilador por tarea: sus tiempos viajan en el resultado y se fusionan en el principal
+    perfil = Perfilador(**_perfil_worker) if _perfil_worker else None
+    resultado = procesar_simbolo(simbolo, _estrategias_worker, _registro_worker, modo, estado_simbolo,
+                                 formato=formato, perfil=perfil)
+    if perfil is not None:
+        resultado["perfil"] = perfil.exportar()
+    return resultado
+
+# === DATASET PARQUET ===
+def escribir_dataset(salida, modo):
+    inicio = datetime.now()
+    tablas = [t for t in salida["tablas"] if t.num_rows]
+    if modo == "completo":
+        borrar_particiones(fechas_disponibles())
+        n = escribir_senales(pa.concat_tables(tablas).unify_dictionaries()) if tablas else 0
+    else:
+        tabla = pa.concat_tables(tablas).unify_dictionaries() if tablas else ESQUEMA.empty_table()
+        n = actualizar_senales(tabla, salida["reconstruidas"])
+    log_event("dataset", "OK", f"{n} filas BUY/SELL escritas en el dataset de señales", inicio)
+
+# === MODO PANEL ===
+def ejecutar_panel(simbolos, estrategias, registro, errores, estado, stats_cache, formato="csv", salida=None,
+                   perfil=_SIN_PERFIL):
+    inicio = datetime.now()
+    with perfil.fase("*", "-", "lectura_panel"):
+        panel = cargar_panel(simbolos, columnas=registro.columnas(list(estrategias)))
+    log_event("panel", "OK", f"Panel {panel.forma[0]}x{panel.forma[1]} cargado", inicio)
+
+    salidas = {}
+    for nombre_est in estrategias:
+        funcion_panel = registro.funcion_panel(nombre_est)
+        if funcion_panel is None:
+            continue
+        inicio_est = datetime.now()
+        try:
+            with perfil.fase("*", nombre_est, "calculo_panel"), perfil.captura("*", nombre_est):
+                df_largo = funcion_panel(panel)
+            salidas[nombre_est] = {s: g.reset_index(drop=True) for s, g in df_largo.groupby("simbolo", sort=False)}
+            log_event(nombre_est, "OK", f"panel evaluado para {len(panel.simbolos)} simbolos", inicio_est)
+        except Exception as e:
+            # Si la version panel falla, la estrategia se ejecuta simbolo a simbolo
+            log_event(nombre_est, "ERROR", f"panel fallo: {e}", inicio_est)
+
+    en_panel = set(panel.simbolos)
+    for simbolo in simbolos:
+        if simbolo in en_panel:
+            precalculadas = {n: por_simbolo[simbolo] for n, por_simbolo in salidas.items() if simbolo in por_simbolo}
+            resultado = procesar_simbolo(simbolo, estrategias, registro, "completo", None,
+                                         panel.frame(simbolo), precalculadas, formato, perfil)
+        else:
+            resultado = procesar_simbolo(simbolo, estrategias, registro, "completo", formato=formato,
+                                         perfil=perfil)
+        registrar_resultado(resultado, errores, estado, stats_cache, salida)
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Generacion de señales heuristicas")
+    parser.add_argument("--workers", type=int, default=1, help="procesos en paralelo (1 = serial)")
+    parser.add_argument("--modo", choices=["completo", "incremental", "ultima"], default="completo",
+                        help="completo: borra y recalcula todo; incremental: solo barras nuevas; "
+                             "ultima: camino rapido diario para la ultima barra")
+    parser.add_argument("--panel", action="store_true",
+                        help="evalua en bloque las estrategias con version panel (solo modo completo)")
+    parser.add_argument("--formato", choices=["csv", "parquet", "ambos"], default="csv",
+                        help="csv: un archivo por simbolo; parquet: dataset particionado por fecha")
+    parser.add_argument("--listar-estrategias", action="store_true",
+                        help="muestra el registro de estrategias y sus requisitos y termina")
+    parser.add_argument("--perfil", action="store_true",
+                        help="tiempos por estrategia, simbolo y fase (reports/perfilado)")
+    parser.add_argument("--perfil-memoria", action="store_true",
+                        help="ademas pico de memoria por fase con tracemalloc (mas lento)")
+    parser.add_argument("--perfil-simbolo", default=None,
+                        help="captura cProfile y tracemalloc de este simbolo ('*' = panel)")
+    parser.add_argument("--perfil-estrategia", default=None,
+                        help="limita la captura a esta estrategia")
+    args = parser.parse_args()
+    if args.listar_estrategias:
+        imprimir_registro(RegistroEstrategias(ESTRATEGIAS_PATH))
+        return
+    if args.panel and args.modo != "completo":
+        parser.error("--panel solo esta disponible con --modo completo")
+
+    simbolos = cargar_simbolos()
+    estrategias, estrategias_cargadas, registro = cargar_estrategias()
+    log_event("loader", "OK", f"Estrategias registradas: {', '.join(estrategias_cargadas)}", datetime.now())
+
+    # === LIMPIAR OUTPUT ANTERIOR ===
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    if args.modo == "completo":
+        if args.formato != "parquet":
+            for f in OUTPUT_PATH.glob("*.csv"):
+                f.unlink()
+        estado = {}
+    else:
+        estado = cargar_estado_incremental()
+
+    # === PROCESAR SIMBOLOS ===
+    errores = []
+    stats_cache = {}
+    salida = {"tablas": [], "reconstruidas": {}} if args.formato != "csv" else None
+    perfil = Perfilador(args.perfil, args.perfil_memoria, args.perfil_simbolo, args.perfil_estrategia)
+    inicio_total = datetime.now()
+
+    if args.panel:
+        ejecutar_panel(simbolos, estrategias, registro, errores, estado, stats_cache, args.formato, salida, perfil)
+    elif args.workers > 1:
+        # imap conserva el orden de SIMBOLOS: el log sale en el mismo orden que en serie
+        chunksize = max(1, len(simbolos) // (args.workers * 8))
+        tareas = [(simbolo, args.modo, estado.get(simbolo, {}), args.formato) for simbolo in simbolos]
+        config_perfil = perfil.config() if perfil.activo or args.perfil_simbolo else None
+        with Pool(args.workers, initializer=_inicializar_worker, initargs=(config_perfil,)) as pool:
+            for resultado in pool.imap(_procesar_en_worker, tareas, chunksize=chunksize):
+                registrar_resultado(resultado, errores, estado, stats_cache, salida, perfil)
+    else:
+        for simbolo in simbolos:
+            resultado = procesar_simbolo(simbolo, estrategias, registro, args.modo, estado.get(simbolo, {}),
+                                         formato=args.formato, perfil=perfil)
+            registrar_resultado(resultado, errores, estado, stats_cache, salida)
+
+    if salida is not None:
+        with perfil.fase("*", "-", "escritura_dataset"):
+            escribir_dataset(salida, args.modo)
+    if perfil.activo:
+        print(perfil.guardar())
+        log_event("perfil", "INFO", f"Informe de perfilado en {perfil.directorio}", inicio_total)
+
+    guardar_estado_incremental(estado)
+    log_event("cache", "INFO", f"Indicadores: {stats_cache.get('hits', 0)} hits - {stats_cache.get('misses', 0)} misses - "
+                               f"{stats_cache.get('expulsiones', 0)} expulsiones", inicio_total)
+
+    log_event("shu", "RESUMEN", f"{len(simbolos)-len(errores)} de {len(simbolos)} procesados correctamente", inicio_total)
+
+    # === ACTUALIZAR ESTADO ===
+    estado = {
+        "fecha": datetime.now().strftime("%Y-%m-%d"),
+        "status": "OK" if not errores else "ERROR",
+        "mensaje": f"{len(simbolos)-len(errores)} de {len(simbolos)} procesados correctamente"
+    }
+    with open(STATUS_PATH, "r") as f:
+        status_json = json.load(f)
+    status_json["senales_heuristicas"] = estado
+    with open(STATUS_PATH, "w") as f:
+        json.dump(status_json, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# /home/ubuntu/tr/tests/conftest.py
+"""
+Fixtures comunes: el repo en sys.path (my_modules, estrategias y scripts de la
+raiz), barras sinteticas reproducibles, un almacen de historicos temporal y una
+bandeja de salida de correo temporal. email_Sender.py se carga como
+my_modules.email_sender, igual que en la instancia.
+
+Uso:
+    python -m pytest -q
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+# boto3 solo esta en la instancia; los tests no hablan con AWS: sustituyen los clientes
+if importlib.util.find_spec("boto3") is None:
+    sys.modules["boto3"] = types.SimpleNamespace(client=lambda *a, **k: None, Session=lambda *a, **k: None)
+
+# my_modules/config.py no esta versionado: valores minimos para importar email_sender
+if importlib.util.find_spec("my_modules.config") is None:
+    config = types.ModuleType("my_modules.config")
+    config.MAX_EMAILS_PER_DAY = 50
+    config.SES_PROFILE_NAME = None
+    config.LOCAL_LOG_PATH = tempfile.gettempdir()
+    sys.modules["my_modules.config"] = config
+
+# email_Sender.py se despliega como my_modules/email_sender.py
+os.environ.setdefault("EMAIL_TRADING", "alertas@example.com")
+_spec = importlib.util.spec_from_file_location("my_modules.email_sender", RAIZ / "email_Sender.py")
+sys.modules["my_modules.email_sender"] = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sys.modules["my_modules.email_sender"])
+
+from my_modules import historico
+
+ESTRATEGIAS_DIR = RAIZ / "estrategias"
+
+def barras_sinteticas(n=600, semilla=0, desde="2022-01-03"):
+    # OHLCV de dias habiles con paseo aleatorio: mismas barras para la misma semilla
+    rng = np.random.default_rng(semilla)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.01, n))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, n))
+    return pd.DataFrame({
+        "fecha": pd.bdate_range(desde, periods=n).date,
+        "open": open_, "high": high, "low": low, "close": close,
+        "volume": rng.integers(1_000, 100_000, n).astype("float64"),
+    })
+
+@pytest.fixture
+def barras():
+    return barras_sinteticas
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    # Historico particionado vacio en tmp_path; almacen(simbolo, df) añade barras
+    monkeypatch.setattr(historico, "STORE_PATH", tmp_path / "historic_part")
+    monkeypatch.setattr(historico, "LEGACY_PATH", tmp_path / "historic")
+    (tmp_path / "historic").mkdir()
+
+    def guardar(simbolo, df):
+        historico.append_bars(simbolo, df)
+    return guardar
+
+@pytest.fixture
+def estrategias_repo(monkeypatch):
+    # RegistroEstrategias() sin argumentos lee las estrategias del repo (en la instancia: my_modules/estrategias)
+    from my_modules.registro_estrategias import RegistroEstrategias
+    monkeypatch.setattr(RegistroEstrategias.__init__, "__defaults__", (ESTRATEGIAS_DIR, "estrategias"))
+    return RegistroEstrategias()
+
+@pytest.fixture
+def bandeja(tmp_path, monkeypatch):
+    # Bandeja de salida temporal con los correos escritos a archivo; la de produccion no se toca
+    from my_modules import email_sender
+    monkeypatch.setattr(email_sender, "OUTBOX_DIR", tmp_path / "outbox")
+    monkeypatch.setattr(email_sender, "EMAIL_SINK", "archivo")
+    return tmp_path / "outbox"
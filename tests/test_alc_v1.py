@@ -0,0 +1,92 @@
+# /home/ubuntu/tr/tests/test_alc_v1.py
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alc_v1
+from my_modules import email_sender as es
+
+@pytest.fixture
+def job(bandeja, tmp_path, monkeypatch):
+    # alc_v1.main() sin logs ni estado de produccion, con el correo a la bandeja temporal
+    monkeypatch.setattr(alc_v1, "configurar_logger", lambda *a: None)
+    monkeypatch.setattr(alc_v1, "SUMMARY_PATH", str(tmp_path / "system_status.json"))
+    monkeypatch.setattr(alc_v1, "DESTINATARIO", "alertas@example.com")
+    monkeypatch.setattr(sys, "argv", ["alc_v1.py"])
+    return tmp_path / "system_status.json"
+
+def test_main_envia_por_la_bandeja_con_la_fecha_de_las_senales(job, bandeja, monkeypatch):
+    tabla = pd.DataFrame({"Simbolo": ["AAA"], "Cierre": [10.5], "Estrategias BUY": ["bollinger_breakout_v4"],
+                          "Estrategias SELL": [""]})
+    monkeypatch.setattr(alc_v1, "generar_alertas", lambda fecha=None: ("2025-04-22", tabla, {"BUY": 1, "SELL": 0}))
+    alc_v1.main()
+
+    correos = list((bandeja / es.ENVIADOS_LOCAL).iterdir())
+    assert len(correos) == 1
+    assert "Subject: Senales heuristicas del dia - 2025-04-22" in correos[0].read_text()
+    assert len(list((bandeja / es.ENVIADOS).glob("*.json"))) == 1
+    assert json.loads(job.read_text())["alertas"]["status"] == "OK"
+
+def test_main_sin_senales_no_envia(job, bandeja, monkeypatch):
+    monkeypatch.setattr(alc_v1, "generar_alertas", lambda fecha=None: ("2025-04-22", None, {"BUY": 0, "SELL": 0}))
+    alc_v1.main()
+    assert not (bandeja / es.ENVIADOS_LOCAL).exists()
+    assert json.loads(job.read_text())["alertas"]["mensaje"] == "0 senales encontradas"
+
+def agrupar_como_antes(filas, cierres):
+    # Logica anterior de alc_v1.py: diccionario por simbolo y fila a fila
+    senales = {}
+    for simbolo, estrategia, signal in filas:
+        datos = senales.setdefault(simbolo, {"buy": [], "sell": []})
+        datos[signal].append(estrategia)
+    tabla = pd.DataFrame([
+        {"Simbolo": simbolo, "Cierre": cierres.get(simbolo, "N/D"),
+         "Estrategias BUY": ", ".join(sorted(set(datos["buy"]))),
+         "Estrategias SELL": ", ".join(sorted(set(datos["sell"])))}
+        for simbolo, datos in sorted(senales.items())
+    ])
+    conteo = {"BUY": int(tabla["Estrategias BUY"].apply(lambda x: len(x.split(",")) if x else 0).sum()),
+              "SELL": int(tabla["Estrategias SELL"].apply(lambda x: len(x.split(",")) if x else 0).sum())}
+    return tabla, conteo
+
+def test_agrupar_igual_que_la_version_anterior(almacen, barras):
+    fecha = None
+    cierres = {}
+    for i, simbolo in enumerate(["AAA", "BBB", "CCC"]):
+        df = barras(30, i)
+        almacen(simbolo, df)
+        fecha = df["fecha"].iloc[-1]
+        cierres[simbolo] = round(df["close"].iloc[-1], 2)
+
+    rng = np.random.default_rng(0)
+    filas = [(str(rng.choice(["AAA", "BBB", "CCC", "ZZZ"])), f"e{rng.integers(4)}", str(rng.choice(["buy", "sell"])))
+             for _ in range(60)]
+    df = pd.DataFrame(filas, columns=["simbolo", "estrategia", "signal"])
+    df["signal"] = df["signal"].map({"buy": alc_v1.BUY, "sell": alc_v1.SELL}).astype("int8")
+
+    tabla, conteo = alc_v1.agrupar(df, fecha.isoformat())
+    esperada, conteo_esperado = agrupar_como_antes(filas, cierres)
+    assert conteo == conteo_esperado
+    pd.testing.assert_frame_equal(tabla.astype(str), esperada.astype(str))
+
+def test_dia_sin_senales_no_reenvia_el_anterior(almacen, barras, tmp_path):
+    from my_modules.senales import escribir_senales
+    from my_modules.ultimas_barras import UltimasBarras, actualizar_ultimas
+
+    df = barras(30, 1)
+    almacen("AAA", df)
+    ayer, hoy = df["fecha"].iloc[-2], df["fecha"].iloc[-1]
+    base = tmp_path / "dataset"
+    escribir_senales(pd.DataFrame({"fecha": [ayer], "signal": ["buy"], "estrategia": ["e1"], "simbolo": ["AAA"]}), base)
+    actualizar_ultimas(["AAA"], path=tmp_path / "ultimas.parquet")
+    ultimas = UltimasBarras(tmp_path / "ultimas.parquet")
+
+    # La ultima particion es de ayer, pero las barras procesadas son de hoy: no hay señales
+    fecha, senales = alc_v1.leer_dataset_dia(base=base, ultimas=ultimas)
+    assert fecha == hoy.isoformat() and senales.empty
+
+    fecha, senales = alc_v1.leer_dataset_dia(ayer, base=base, ultimas=ultimas)
+    assert fecha == ayer.isoformat() and list(senales["simbolo"]) == ["AAA"]
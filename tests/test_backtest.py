@@ -0,0 +1,25 @@
+# /home/ubuntu/tr/tests/test_backtest.py
+import os
+
+from my_modules import historico
+from my_modules.backtest import clave_datos
+
+def test_clave_datos_de_simbolo_migrado(almacen, barras):
+    df = barras(100, 1)
+    almacen("AAA", df[:-1])
+    antes = clave_datos("AAA")
+    almacen("AAA", df[-1:])
+    assert clave_datos("AAA") != antes
+    assert clave_datos("AAA") == f"100_{df['fecha'].iloc[-1].isoformat()}"
+
+def test_clave_datos_de_simbolo_legacy(almacen, barras):
+    ruta = historico.LEGACY_PATH / "OLD.parquet"
+    barras(100, 2).to_parquet(ruta, index=False)
+    antes = clave_datos("OLD")
+    assert antes == clave_datos("OLD")
+
+    # Mismo tamaño (p. ej. una barra corregida) pero archivo reescrito
+    barras(100, 3).to_parquet(ruta, index=False)
+    os.utime(ruta, ns=(os.stat(ruta).st_atime_ns, os.stat(ruta).st_mtime_ns + 1_000_000))
+    assert clave_datos("OLD") != antes
+    assert clave_datos("NADA") == "sin_datos"
@@ -0,0 +1,26 @@
+# /home/ubuntu/tr/tests/test_barrido.py
+import pytest
+
+from my_modules import barrido
+
+@pytest.mark.parametrize("estrategia", ["bollinger_breakout_v4", "gap_open_strategy_v5"])
+def test_barrido_igual_que_generar_senales(estrategia, estrategias_repo, almacen, barras):
+    almacen("AAA", barras(600, 11))
+    assert barrido.verificar(estrategia, "AAA")
+
+def test_checkpoint_depende_de_los_datos(estrategias_repo, almacen, barras, tmp_path):
+    df = barras(400, 5)
+    almacen("AAA", df[:-1])
+    grid = estrategias_repo.modulo("gap_open_strategy_v5").GRID_BARRIDO
+    config = {"estrategia": "gap_open_strategy_v5", "combinaciones": barrido.expandir_grid(grid),
+              "tp": 0.05, "sl": 0.03, "dias": 10, "directorio": str(tmp_path / "barrido")}
+
+    assert barrido.barrer_simbolo("AAA", config)[2] == "ok"
+    assert barrido.barrer_simbolo("AAA", config)[2] == "checkpoint"
+
+    # Barra nueva: el checkpoint anterior no vale y se sustituye
+    almacen("AAA", df[-1:])
+    _, acumulado, estado = barrido.barrer_simbolo("AAA", config)
+    assert estado == "ok"
+    assert len(list((tmp_path / "barrido" / "AAA").glob("*.npz"))) == 1
+    assert barrido.barrer_simbolo("AAA", config)[2] == "checkpoint"
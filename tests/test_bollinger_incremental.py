@@ -0,0 +1,40 @@
+# /home/ubuntu/tr/tests/test_bollinger_incremental.py
+import numpy as np
+import pytest
+
+from my_modules.indicadores import CacheIndicadores
+
+NUEVAS = 5
+
+@pytest.fixture
+def bollinger(estrategias_repo):
+    return estrategias_repo.modulo("bollinger_breakout_v4")
+
+def incremental(modulo, df, con_cache):
+    # Lo que hace shu_cro.py en modo incremental: cola de WARMUP + nuevas barras
+    # (la cache se construye sobre lo leido, una barra mas que la cola)
+    leido = df.tail(modulo.WARMUP + NUEVAS + 1).reset_index(drop=True)
+    entrada = leido.tail(modulo.WARMUP + NUEVAS)
+    cache = CacheIndicadores(leido) if con_cache else None
+    return modulo.generar_senales(entrada.copy(), debug=True, cache=cache).tail(NUEVAS)
+
+@pytest.mark.parametrize("semilla", range(6))
+@pytest.mark.parametrize("con_cache", [False, True])
+def test_incremental_igual_que_recalculo_completo(bollinger, barras, semilla, con_cache):
+    # Historia larga con un cambio de regimen de volatilidad antes de la cola
+    df = barras(1500, semilla)
+    df.loc[:900, ["open", "high", "low", "close"]] *= np.linspace(0.2, 1.0, 901)[:, None]
+    completo = bollinger.generar_senales(df.copy(), debug=True).tail(NUEVAS)
+    cola = incremental(bollinger, df, con_cache)
+
+    assert cola["fecha"].tolist() == completo["fecha"].tolist()
+    assert cola["signal"].tolist() == completo["signal"].tolist()
+    # Cota del ATR de Wilder: el error de arranque decae como (13/14)^n
+    np.testing.assert_allclose(cola["atr"].to_numpy(), completo["atr"].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(cola["bb_up"].to_numpy(), completo["bb_up"].to_numpy(), rtol=1e-12)
+
+def test_warmup_cubre_la_cota_del_atr(bollinger):
+    # Barras para que (13/14)^n < 1e-12, mas las 14 de la semilla del ATR y la ventana de Bollinger
+    n = int(np.ceil(np.log(1e-12) / np.log(13 / 14)))
+    assert bollinger.WARMUP >= n + 14
+    assert bollinger.WARMUP >= bollinger.PARAMETROS["window"]
@@ -0,0 +1,77 @@
+# /home/ubuntu/tr/tests/test_email_sender.py
+import json
+import multiprocessing as mp
+
+import pytest
+
+from my_modules import email_sender as es
+
+def test_digest_por_destinatario_y_grupo(bandeja):
+    es.encolar_alerta("upd: AAA", "error en AAA", destinatario="a@x", grupo="ingesta")
+    es.encolar_alerta("upd: BBB", "error en BBB", destinatario="a@x", grupo="ingesta")
+    es.encolar_alerta("senales", "<table></table>", destinatario="a@x", grupo="senales", html=True)
+    enviados = []
+
+    resumen = es.procesar_bandeja(enviar=lambda *args: enviados.append(args) or "id")
+    assert resumen == {"digests": 2, "mensajes": 3, "reintentos": 0, "sin_cuota": 0}
+    asuntos = sorted(asunto for asunto, _, _, _ in enviados)
+    assert asuntos[0].startswith("[ingesta] 2 alertas") and asuntos[1] == "senales"
+    digest = next(cuerpo for asunto, cuerpo, _, _ in enviados if asunto.startswith("[ingesta]"))
+    assert digest.index("error en AAA") < digest.index("error en BBB")
+    assert len(list((bandeja / es.ENVIADOS).glob("*.json"))) == 3
+    assert es.cuota_restante() == es.MAX_EMAILS_PER_DAY - 2
+
+def test_reintentos_con_espera_y_fallidos(bandeja, monkeypatch):
+    archivo = es.encolar_alerta("x", "y")
+    def falla(*args):
+        raise RuntimeError("SES caido")
+
+    assert es.procesar_bandeja(enviar=falla)["reintentos"] == 1
+    mensaje = json.loads((bandeja / es.PENDIENTES / archivo.name).read_text())
+    assert mensaje["intentos"] == 1 and mensaje["proximo"] > 0
+    # Aun en espera: la siguiente pasada no lo toca
+    assert es.procesar_bandeja(enviar=falla)["reintentos"] == 0
+
+    # Reloj que avanza un dia por consulta: cada pasada ya puede reintentar
+    reloj = iter(range(4 * 10 ** 9, 5 * 10 ** 9, 86_400))
+    monkeypatch.setattr(es.time, "time", lambda: next(reloj))
+    for _ in range(es.MAX_INTENTOS - 1):
+        es.procesar_bandeja(enviar=falla)
+    assert es.estado_mensaje(archivo) == es.FALLIDOS
+    # Los envios fallidos devuelven su cuota
+    assert es.cuota_restante() == es.MAX_EMAILS_PER_DAY
+
+def test_cuota_de_la_bandeja_indicada(bandeja, tmp_path, monkeypatch):
+    # Sin tocar la bandeja por defecto (ni su cuota) si se pasa otra
+    monkeypatch.setattr(es, "OUTBOX_DIR", tmp_path / "produccion")
+    otra = tmp_path / "pruebas"
+    es.encolar_alerta("x", "y", base=otra)
+    assert es.procesar_bandeja(base=otra)["digests"] == 1
+    assert json.loads((otra / es.CUOTA_NOMBRE).read_text())["enviados"] == 1
+    assert len(list((otra / es.ENVIADOS_LOCAL).iterdir())) == 1
+    assert not (tmp_path / "produccion").exists()
+
+def _reservar(base, n, cola):
+    cola.put(sum(es.reservar_cuota(base=base) for _ in range(n)))
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="sin fork")
+def test_cuota_compartida_entre_procesos(bandeja):
+    ctx = mp.get_context("fork")
+    cola = ctx.Queue()
+    procesos = [ctx.Process(target=_reservar, args=(bandeja, 20, cola)) for _ in range(5)]
+    for p in procesos:
+        p.start()
+    total = sum(cola.get(timeout=30) for _ in procesos)
+    for p in procesos:
+        p.join()
+    assert total == es.MAX_EMAILS_PER_DAY
+    assert es.cuota_restante(bandeja) == 0
+
+def test_cartero_envia_lo_encolado_al_detenerse(bandeja):
+    cartero = es.iniciar_cartero(intervalo=3600)
+    archivo = es.encolar_alerta("senales", "cuerpo")
+    cartero.detener()
+    assert es.estado_mensaje(archivo) == es.ENVIADOS
+    # Detenido el anterior, se crea uno nuevo
+    assert es.iniciar_cartero(intervalo=3600) is not cartero
+    es.iniciar_cartero().detener(ultima_pasada=False)
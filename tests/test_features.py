@@ -0,0 +1,67 @@
+# /home/ubuntu/tr/tests/test_features.py
+import numpy as np
+import pandas as pd
+
+from my_modules import features
+from my_modules import panel as pn
+from my_modules import registro_features as rf
+
+def reciente(simbolos):
+    # Como el panel reciente de fea.py: solo las ultimas WARMUP barras
+    return pn.cargar_panel(simbolos, columnas=rf.columnas(features.FEATURES), ultimas=features.WARMUP)
+
+def comparar(obtenido, esperado):
+    obtenido = obtenido.sort_values(["fecha", "simbolo"]).reset_index(drop=True)
+    esperado = esperado.sort_values(["fecha", "simbolo"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(obtenido[["simbolo", "fecha"]], esperado[["simbolo", "fecha"]])
+    for nombre in features.FEATURES:
+        np.testing.assert_allclose(obtenido[nombre].to_numpy(dtype="float64"),
+                                   esperado[nombre].to_numpy(dtype="float64"), rtol=1e-9, equal_nan=True)
+
+def test_simbolo_que_llega_tarde_a_una_fecha(almacen, barras, tmp_path):
+    base = tmp_path / "features"
+    aaa, bbb = barras(300, 1), barras(300, 2)
+    almacen("aaa", aaa[:-1])
+    almacen("bbb", bbb[:-2])
+    features.backfill(["aaa", "bbb"], base=base)
+
+    # aaa trae la ultima fecha antes que bbb
+    almacen("aaa", aaa[-1:])
+    df, _, _ = features.actualizar(reciente(["aaa", "bbb"]), base=base)
+    assert list(df["simbolo"]) == ["aaa"]
+
+    almacen("bbb", bbb[-2:])
+    df, _, _ = features.actualizar(reciente(["aaa", "bbb"]), base=base)
+    assert list(df["simbolo"]) == ["bbb", "bbb"]
+    assert features.ultimas_fechas(base) == {"aaa": str(aaa["fecha"].iloc[-1]), "bbb": str(bbb["fecha"].iloc[-1])}
+
+    esperado = tmp_path / "esperado"
+    features.backfill(["aaa", "bbb"], base=esperado)
+    comparar(features.leer_features(base=base), features.leer_features(base=esperado))
+
+def test_simbolo_nuevo_entra_con_toda_su_historia(almacen, barras, tmp_path):
+    base = tmp_path / "features"
+    almacen("aaa", barras(200, 1))
+    features.backfill(["aaa"], base=base)
+
+    almacen("ccc", barras(200, 3))
+    df, _, _ = features.actualizar(reciente(["aaa", "ccc"]), base=base)
+    assert set(df["simbolo"]) == {"ccc"}
+    assert len(df) == 200 - features.WARMUP + 1
+
+    esperado = tmp_path / "esperado"
+    features.backfill(["aaa", "ccc"], base=esperado)
+    comparar(features.leer_features(base=base), features.leer_features(base=esperado))
+
+def test_repetir_la_actualizacion_no_duplica(almacen, barras, tmp_path):
+    base = tmp_path / "features"
+    aaa = barras(150, 1)
+    almacen("aaa", aaa[:-1])
+    features.backfill(["aaa"], base=base)
+    almacen("aaa", aaa[-1:])
+    features.actualizar(reciente(["aaa"]), base=base)
+    # Sin el archivo de ultimas fechas se deducen del almacen
+    (base / features.ULTIMAS_NOMBRE).unlink()
+    df, _, _ = features.actualizar(reciente(["aaa"]), base=base)
+    assert df.empty
+    assert len(features.leer_features(base=base)) == 150 - features.WARMUP + 1
@@ -0,0 +1,38 @@
+# /home/ubuntu/tr/tests/test_historico.py
+from datetime import date
+
+from my_modules import historico
+
+def test_ultimas_cuenta_solo_filas_del_rango(almacen, barras):
+    almacen("X", barras(520, 0, desde="2023-01-02"))
+    df = historico.load_history("X", end=date(2024, 1, 10), ultimas=100)
+    assert len(df) == 100
+    assert df["fecha"].iloc[-1] == date(2024, 1, 10)
+    assert df["fecha"].is_monotonic_increasing
+
+    df = historico.load_history("X", start=date(2023, 6, 1), end=date(2024, 1, 10), ultimas=1000)
+    assert df["fecha"].iloc[0] == date(2023, 6, 1)
+
+def test_compactar_no_borra_partes_que_un_lector_puede_estar_usando(almacen, barras, monkeypatch):
+    df = barras(60, 0, desde="2024-01-02")
+    for i in range(0, 60, 20):
+        almacen("X", df[i:i + 20])
+    anterior = historico.cargar_manifest("X")
+
+    assert historico.compactar("X") == 1
+    # Un lector que cargo el manifest anterior sigue encontrando sus partes
+    for p in anterior["particiones"]["2024"]:
+        assert (historico.STORE_PATH / "X" / p["archivo"]).exists()
+
+    # Pasada la gracia, la siguiente compactacion las borra
+    monkeypatch.setattr(historico, "GRACIA_BORRADO", 0)
+    assert historico.compactar("X") == 0
+    assert not any((historico.STORE_PATH / "X" / p["archivo"]).exists() for p in anterior["particiones"]["2024"])
+    assert historico.cargar_manifest("X")["obsoletas"] == []
+
+    # Lector con el manifest anterior y las partes ya barridas: relee el manifest
+    actual = historico.cargar_manifest
+    manifests = iter([anterior])
+    monkeypatch.setattr(historico, "cargar_manifest", lambda simbolo, base=None: next(manifests, None) or actual(simbolo, base))
+    leido = historico.load_history("X")
+    assert list(leido["fecha"]) == list(df["fecha"])
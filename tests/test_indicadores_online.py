@@ -0,0 +1,69 @@
+# /home/ubuntu/tr/tests/test_indicadores_online.py
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+from my_modules.indicadores_online import (ATRWilder, MediaMovil, MinMaxMovil, PosicionRango, RSIMedia,
+                                           RSIWilder, a_estado, desde_estado)
+
+N = 1500
+
+@pytest.fixture(scope="module")
+def serie():
+    rng = np.random.default_rng(3)
+    close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, N))))
+    high = close * (1 + rng.uniform(0, 0.02, N))
+    low = close * (1 - rng.uniform(0, 0.02, N))
+    return close, high, low
+
+def correr(kernel, paso, corte=N // 2):
+    # Barra a barra, guardando y restaurando el estado a mitad de la serie
+    salida = []
+    for i in range(N):
+        if i == corte:
+            kernel = desde_estado(json.loads(json.dumps(a_estado(kernel))))
+        salida.append(paso(kernel, i))
+    return np.array(salida, dtype="float64")
+
+def iguales(online, lote):
+    np.testing.assert_allclose(online, np.asarray(lote, dtype="float64"), rtol=1e-8, atol=1e-8, equal_nan=True)
+
+def test_media_y_std(serie):
+    close, _, _ = serie
+    salida = correr(MediaMovil(20), lambda k, i: (k.actualizar(close[i]), k.std()))
+    iguales(salida[:, 0], close.rolling(20).mean())
+    iguales(salida[:, 1], close.rolling(20).std())
+
+def test_media_con_nan_en_la_ventana(serie):
+    close = serie[0].copy()
+    close.iloc[[100, 101, 900]] = np.nan
+    iguales(correr(MediaMovil(20), lambda k, i: k.actualizar(close[i])), close.rolling(20).mean())
+
+def test_min_max(serie):
+    _, _, low = serie
+    salida = correr(MinMaxMovil(60), lambda k, i: k.actualizar(low[i]))
+    iguales(salida[:, 0], low.rolling(60).min())
+    iguales(salida[:, 1], low.rolling(60).max())
+
+def test_posicion_rango(serie):
+    close, high, low = serie
+    lote = (close - low.rolling(60).min()) / (high.rolling(60).max() - low.rolling(60).min())
+    iguales(correr(PosicionRango(60), lambda k, i: k.actualizar(high[i], low[i], close[i])), lote)
+
+def test_rsi_media(serie):
+    close, _, _ = serie
+    delta = close.diff()
+    lote = 100 - 100 / (1 + delta.clip(lower=0).rolling(14).mean() / (-delta.clip(upper=0)).rolling(14).mean())
+    iguales(correr(RSIMedia(14), lambda k, i: k.actualizar(close[i])), lote)
+
+def test_atr_igual_que_ta(serie):
+    close, high, low = serie
+    lote = ta.volatility.average_true_range(high, low, close, window=14)
+    iguales(correr(ATRWilder(14), lambda k, i: k.actualizar(high[i], low[i], close[i])), lote)
+
+def test_rsi_wilder_igual_que_ta(serie):
+    close, _, _ = serie
+    iguales(correr(RSIWilder(14), lambda k, i: k.actualizar(close[i])), ta.momentum.rsi(close, window=14))
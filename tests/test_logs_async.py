@@ -0,0 +1,66 @@
+# /home/ubuntu/tr/tests/test_logs_async.py
+import csv
+import logging
+import multiprocessing
+import uuid
+
+import pytest
+
+from my_modules import logs_async
+
+POR_WORKER = 200
+fork = multiprocessing.get_context("fork")
+
+@pytest.fixture
+def logger(tmp_path):
+    # Un logger nuevo por test: configurar() devuelve tal cual uno ya configurado
+    ruta = tmp_path / "eventos.csv"
+    nombre = f"test_{uuid.uuid4().hex}"
+    salida = logs_async.salida_archivo(ruta, columnas=["ts", "mensaje", "origen"])
+    yield logs_async.configurar(nombre, [salida]), ruta
+    logs_async.vaciar()
+
+def leer(ruta):
+    with open(ruta, newline="") as f:
+        return list(csv.reader(f))
+
+def registrar(args):
+    nombre, tarea = args
+    log = logging.getLogger(nombre)
+    for i in range(POR_WORKER):
+        log.info("tarea %s registro %s", tarea, i, extra={"campos": {"origen": "hijo"}})
+    return tarea
+
+def contar(filas, origen):
+    return sum(1 for f in filas if f[2] == origen)
+
+@pytest.mark.parametrize("cierre", ["join", "terminate"])
+def test_pool_fork_vacia_la_cola_de_los_hijos(logger, cierre):
+    log, ruta = logger
+    log.info("padre antes", extra={"campos": {"origen": "padre"}})
+    tareas = [(log.name, t) for t in range(8)]
+    if cierre == "join":
+        pool = fork.Pool(3)
+        assert sorted(pool.map(registrar, tareas)) == list(range(8))
+        pool.close()
+        pool.join()
+    else:
+        # "with Pool" termina los workers con SIGTERM: el handler vacia la cola antes de morir
+        with fork.Pool(3) as pool:
+            assert sorted(pool.map(registrar, tareas)) == list(range(8))
+    log.info("padre despues", extra={"campos": {"origen": "padre"}})
+    logs_async.vaciar()
+
+    filas = leer(ruta)
+    assert contar(filas, "hijo") == 8 * POR_WORKER
+    # Lo encolado por el padre antes del fork no se duplica en los hijos
+    assert contar(filas, "padre") == 2
+    assert {f[1] for f in filas if f[2] == "hijo"} == {f"tarea {t} registro {i}" for t in range(8) for i in range(POR_WORKER)}
+
+def test_proceso_hijo_escribe_al_salir(logger):
+    log, ruta = logger
+    hijo = fork.Process(target=registrar, args=((log.name, 0),))
+    hijo.start()
+    hijo.join()
+    assert hijo.exitcode == 0
+    assert contar(leer(ruta), "hijo") == POR_WORKER
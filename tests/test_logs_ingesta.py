@@ -0,0 +1,57 @@
+# /home/ubuntu/tr/tests/test_logs_ingesta.py
+from io import BytesIO
+
+import pytest
+
+from my_modules import logs_ingesta
+
+class S3Falso:
+    class exceptions:
+        NoSuchKey = KeyError
+
+    def __init__(self):
+        self.objetos = {}
+        self.tras_listar = []   # acciones a ejecutar justo despues de cada listado
+
+    def get_paginator(self, nombre):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        pagina = {"Contents": [{"Key": k} for k in sorted(self.objetos) if k.startswith(Prefix)]}
+        if self.tras_listar:
+            self.tras_listar.pop(0)()
+        yield pagina
+
+    def get_object(self, Bucket, Key):
+        return {"Body": BytesIO(self.objetos[Key])}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objetos[Key] = Body
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objetos.pop(obj["Key"], None)
+
+def segmento(s3, fecha, hora, mensaje):
+    clave = f"{logs_ingesta.LOG_FOLDER}/{fecha}/{hora}_x.csv"
+    s3.objetos[clave] = f"timestamp,proceso,estatus,mensaje\n{fecha} {hora[:2]}:{hora[2:4]}:00,p,OK,{mensaje}\n".encode()
+
+@pytest.fixture
+def s3(monkeypatch):
+    falso = S3Falso()
+    monkeypatch.setattr(logs_ingesta, "s3", falso)
+    return falso
+
+def test_segmento_que_llega_durante_la_compactacion(s3):
+    fecha = "2025-06-10"
+    segmento(s3, fecha, "080000", "uno")
+    segmento(s3, fecha, "090000", "dos")
+    # Llega un segmento nuevo entre el listado de compactar_dia y la escritura del parquet
+    s3.tras_listar.append(lambda: segmento(s3, fecha, "100000", "tres"))
+
+    assert logs_ingesta.compactar_dia(fecha) == 2
+    assert list(logs_ingesta.leer_dia(fecha)["mensaje"]) == ["uno", "dos", "tres"]
+
+    assert logs_ingesta.compactar_dia(fecha) == 1
+    assert list(logs_ingesta.leer_dia(fecha)["mensaje"]) == ["uno", "dos", "tres"]
+    assert list(s3.objetos) == [f"{logs_ingesta.LOG_FOLDER}/{fecha}.parquet"]
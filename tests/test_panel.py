@@ -0,0 +1,52 @@
+# /home/ubuntu/tr/tests/test_panel.py
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+from my_modules import panel as pn
+
+@pytest.fixture
+def panel(almacen, barras):
+    # Historias de distinta longitud; "ccc" sin la ultima barra (no refrescada) y "ddd" mas corta que la semilla
+    datos = {"aaa": barras(300, 1), "bbb": barras(120, 2, desde="2022-06-01"),
+             "ccc": barras(200, 3)[:-1], "ddd": barras(10, 4)}
+    for simbolo, df in datos.items():
+        almacen(simbolo, df)
+    return pn.cargar_panel(list(datos)), datos
+
+def test_atr_wilder_igual_que_ta(panel):
+    panel, datos = panel
+    atr = pn.atr_wilder(panel, window=14)
+    for j, simbolo in enumerate(panel.simbolos):
+        df = datos[simbolo]
+        filas = slice(panel.inicio[j], None)
+        assert np.isnan(atr[:panel.inicio[j], j]).all()
+        if len(df) < 14:
+            assert (atr[filas, j] == 0).all()
+            continue
+        esperado = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14).to_numpy()
+        np.testing.assert_allclose(atr[filas, j], esperado, rtol=1e-12, err_msg=simbolo)
+
+@pytest.mark.parametrize("estrategia", ["bollinger_breakout_v4", "gap_open_strategy_v5"])
+def test_panel_igual_que_por_simbolo(panel, estrategias_repo, estrategia):
+    panel, datos = panel
+    modulo = estrategias_repo.modulo(estrategia)
+    largo = modulo.generar_senales_panel(panel)
+    for simbolo, df in datos.items():
+        esperado = modulo.generar_senales(df.copy())
+        obtenido = largo[largo["simbolo"] == simbolo]
+        assert obtenido["fecha"].tolist() == esperado["fecha"].tolist()
+        assert obtenido["signal"].tolist() == esperado["signal"].tolist(), simbolo
+
+def test_alinear_fechas(panel):
+    panel, datos = panel
+    fechas, close = pn.alinear_fechas(panel, panel["close"])
+    union = sorted(set().union(*(df["fecha"] for df in datos.values())))
+    assert fechas.astype(object).tolist() == union
+    for j, simbolo in enumerate(panel.simbolos):
+        serie = pd.Series(close[:, j], index=fechas.astype(object)).dropna()
+        assert serie.index.tolist() == datos[simbolo]["fecha"].tolist()
+        assert serie.tolist() == datos[simbolo]["close"].tolist()
+    # "ccc" no tiene la ultima fecha: en la ultima fila es NaN en vez de su barra anterior
+    assert np.isnan(close[-1, panel.simbolos.index("ccc")])
@@ -0,0 +1,60 @@
+from datetime import date, datetime
+
+import pytest
+
+from programador_ingesta import evaluar_simbolo, planificar_tick, registrar_resultado, ultima_sesion_cerrada
+
+
+def test_sin_datos_deja_el_simbolo_al_dia():
+    # Lunes 2025-07-07 por la noche; el viernes 2025-07-04 es feriado
+    ahora = datetime(2025, 7, 7, 22)
+    estado = {"ultima_fecha": "2025-07-02"}
+    registrar_resultado(estado, True, ahora, latencia=1.0, sin_datos=True, feriados={"2025-07-04"})
+    assert estado["ultima_fecha"] == "2025-07-07"
+    assert evaluar_simbolo(estado, ahora, {"2025-07-04"})[2] == "al dia"
+    seleccion, _ = planificar_tick(["AAA"], {"AAA": estado}, ahora, 100, 840, feriados={"2025-07-04"})
+    assert seleccion == []
+
+
+def test_sin_datos_en_fin_de_semana_usa_el_ultimo_habil():
+    estado = {"ultima_fecha": "2025-07-01"}
+    registrar_resultado(estado, True, datetime(2025, 7, 6, 10), sin_datos=True, feriados={"2025-07-04"})
+    assert estado["ultima_fecha"] == "2025-07-03"
+
+
+def test_sin_datos_no_retrocede_la_fecha():
+    estado = {"ultima_fecha": "2025-07-08"}
+    registrar_resultado(estado, True, datetime(2025, 7, 7, 22), sin_datos=True)
+    assert estado["ultima_fecha"] == "2025-07-08"
+
+
+@pytest.mark.parametrize("ahora, esperado", [
+    (datetime(2026, 10, 13, 2), date(2026, 10, 12)),     # lunes 22:00 en Nueva York
+    (datetime(2026, 10, 13, 15), date(2026, 10, 12)),    # martes en plena sesion
+    (datetime(2026, 10, 13, 20, 29), date(2026, 10, 12)),
+    (datetime(2026, 10, 13, 20, 30), date(2026, 10, 13)),  # 16:30 EDT
+    (datetime(2026, 12, 1, 21), date(2026, 11, 30)),     # 16:00 EST: horario de invierno
+    (datetime(2026, 12, 1, 21, 30), date(2026, 12, 1)),
+    (datetime(2026, 10, 17, 15), date(2026, 10, 16)),    # sabado
+])
+def test_ultima_sesion_cerrada(ahora, esperado):
+    assert ultima_sesion_cerrada(ahora) == esperado
+
+def test_sesion_abierta_no_se_planifica():
+    estado = {"ultima_fecha": "2026-10-12"}
+    # Martes intradia: la barra del martes aun es parcial
+    assert evaluar_simbolo(estado, datetime(2026, 10, 13, 15))[2] == "al dia"
+    seleccion, _ = planificar_tick(["AAA"], {"AAA": estado}, datetime(2026, 10, 13, 15), 100, 840)
+    assert seleccion == []
+    # Tras el cierre ya es una barra pendiente
+    assert evaluar_simbolo(estado, datetime(2026, 10, 13, 21))[2] == "1 barras pendientes"
+
+def test_sin_datos_no_avanza_sobre_una_sesion_abierta():
+    # Martes 02:00 UTC (lunes por la noche en Nueva York): no hay barra del martes todavia
+    estado = {"ultima_fecha": "2026-10-12"}
+    registrar_resultado(estado, True, datetime(2026, 10, 13, 2), sin_datos=True)
+    assert estado["ultima_fecha"] == "2026-10-12"
+    registrar_resultado(estado, True, datetime(2026, 10, 13, 15), sin_datos=True)
+    assert estado["ultima_fecha"] == "2026-10-12"
+    # El miercoles el martes vuelve a estar pendiente
+    assert evaluar_simbolo(estado, datetime(2026, 10, 14, 21))[2] == "2 barras pendientes"
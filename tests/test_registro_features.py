@@ -0,0 +1,63 @@
+# /home/ubuntu/tr/tests/test_registro_features.py
+import numpy as np
+import pytest
+
+from my_modules import features
+from my_modules import panel as pn
+from my_modules import registro_features as rf
+
+def fea_original(df):
+    # Formulas del fea.py anterior al registro, tal cual
+    def calcular_rsi(series, window=14):
+        delta = series.diff()
+        up = delta.clip(lower=0)
+        down = -delta.clip(upper=0)
+        ma_up = up.rolling(window).mean()
+        ma_down = down.rolling(window).mean()
+        rs = ma_up / ma_down
+        return 100 - (100 / (1 + rs))
+
+    df = df.sort_values("fecha").copy()
+    df["ma_5"] = df["close"].rolling(5).mean()
+    df["ma_20"] = df["close"].rolling(20).mean()
+    df["rsi_14"] = calcular_rsi(df["close"], 14)
+    df["pos_rango_60"] = (df["close"] - df["low"].rolling(60).min()) / (df["high"].rolling(60).max() - df["low"].rolling(60).min())
+    df["volatilidad_20"] = df["close"].rolling(20).std()
+    df["cambio_1d"] = df["close"].pct_change(1)
+    df["cambio_3d"] = df["close"].pct_change(3)
+    return df
+
+def con_tramos_planos(df):
+    # Rango nulo (pos_rango_60 = 0/0) y rachas sin bajadas (rsi_14 = 100)
+    df = df.copy()
+    df.loc[100:170, ["open", "high", "low", "close"]] = 50.0
+    df.loc[200:220, "close"] = np.linspace(60, 80, 21)
+    return df
+
+@pytest.mark.parametrize("semilla", range(4))
+def test_registro_igual_que_fea_original(barras, semilla):
+    df = con_tramos_planos(barras(400, semilla))
+    esperado = fea_original(df)
+    obtenido = rf.calcular_df(df)
+    assert list(obtenido.columns) == features.FEATURES
+    for nombre in features.FEATURES:
+        np.testing.assert_allclose(obtenido[nombre].to_numpy(), esperado[nombre].to_numpy(dtype="float64"),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=nombre)
+
+def test_fila_diaria_del_panel_igual_que_fea_original(almacen, barras):
+    # Panel con historias de distinta longitud, como el panel reciente de fea.py
+    datos = {"aaa": barras(300, 1), "bbb": con_tramos_planos(barras(250, 2)), "ccc": barras(80, 3)}
+    for simbolo, df in datos.items():
+        almacen(simbolo, df)
+    panel = pn.cargar_panel(list(datos), columnas=rf.columnas(features.FEATURES), ultimas=features.WARMUP)
+    matrices = features.calcular_features(panel)
+
+    for j, simbolo in enumerate(panel.simbolos):
+        ultima = fea_original(datos[simbolo]).iloc[-1]
+        for nombre in features.FEATURES:
+            assert matrices[nombre][-1, j] == pytest.approx(float(ultima[nombre]), rel=1e-9, nan_ok=True), (simbolo, nombre)
+
+def test_calentamiento_igual_que_el_minimo_de_fea_original():
+    # fea.py saltaba los simbolos con menos de 60 filas
+    assert features.WARMUP == 60
+    assert rf.calentamiento(["rsi_14"]) == 15
@@ -0,0 +1,134 @@
+# /home/ubuntu/tr/tests/test_upd.py
+import json
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+
+import upd
+from my_modules import historico
+
+class S3Falso:
+    def __init__(self):
+        self.objetos = {}
+        self.modificado = {}
+        self.reloj = datetime(2025, 7, 1)
+
+    def get_paginator(self, nombre):
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=""):
+        yield {"Contents": [{"Key": k, "LastModified": self.modificado[k]} for k in sorted(self.objetos)
+                            if k.startswith(Prefix) and k > StartAfter]}
+
+    def get_object(self, Bucket, Key, VersionId=None):
+        return {"Body": BytesIO(self.objetos[Key])}
+
+    def put_object(self, Bucket, Key, Body):
+        self.reloj += timedelta(minutes=1)
+        self.objetos[Key] = Body
+        self.modificado[Key] = self.reloj
+
+def csv_delta(df):
+    # Mismo formato que guardar_en_s3 de la Lambda: datetime primero, de mas reciente a mas antigua
+    df = df.iloc[::-1].rename(columns={"fecha": "datetime"})
+    return df[["datetime", "open", "high", "low", "close", "volume"]].to_csv(index=False).encode()
+
+def publicar(s3, simbolo, df):
+    clave = f"{upd.S3_CSV_PATH}/{simbolo}/{df['fecha'].min()}_{df['fecha'].max()}.csv"
+    s3.put_object(Bucket=None, Key=clave, Body=csv_delta(df))
+    return clave
+
+@pytest.fixture
+def s3(monkeypatch):
+    falso = S3Falso()
+    monkeypatch.setattr(upd, "s3", falso)
+    return falso
+
+def test_completo_fusiona_todos_los_deltas(s3, almacen, barras):
+    df = barras(30)
+    # Dos ejecuciones de la Lambda antes de que corra upd.py: ninguna pisa a la otra
+    publicar(s3, "AAA", df.iloc[:20])
+    publicar(s3, "AAA", df.iloc[20:])
+
+    stats = upd.procesar_simbolo("AAA")
+    assert stats["status"] == "OK" and stats["filas"] == 30
+    guardado = historico.load_history("AAA")
+    assert list(guardado["fecha"]) == list(df["fecha"])
+
+    assert upd.procesar_simbolo("AAA")["status"] == "SKIP"
+
+def test_deltas_solapados_gana_el_mas_reciente(s3, almacen, barras):
+    df = barras(10)
+    publicar(s3, "AAA", df)
+    corregido = df.iloc[5:].copy()
+    corregido["close"] += 1
+    publicar(s3, "AAA", corregido)
+
+    combinado = upd.descargar_reciente("AAA")
+    assert len(combinado) == 10
+    assert combinado["close"].tolist()[5:] == pytest.approx(corregido["close"].tolist())
+
+def test_simbolo_sin_deltas(s3, almacen):
+    assert upd.procesar_simbolo("ZZZ")["status"] == "SKIP"
+
+def manifest(s3, sello, entradas):
+    clave = f"{upd.S3_CAMBIOS_PATH}/{sello}_x.json"
+    s3.put_object(Bucket=None, Key=clave, Body=json.dumps({"entradas": entradas}).encode())
+    return clave
+
+def entrada(s3, simbolo, df):
+    return {"simbolo": simbolo, "key": publicar(s3, simbolo, df), "version": None}
+
+def test_feed_fusiona_todas_las_entradas_del_simbolo(s3, almacen, barras):
+    df = barras(30)
+    manifest(s3, "20250701220000000000", [entrada(s3, "AAA", df.iloc[:20])])
+    manifest(s3, "20250701230000000000", [entrada(s3, "AAA", df.iloc[20:])])
+
+    entradas, _, _ = upd.leer_cambios({})
+    assert [e["key"] for e in entradas["AAA"]] == sorted(k for k in s3.objetos if k.endswith(".csv"))
+    stats = upd.ejecutar_serial(["AAA"], entradas)[0]
+    assert stats["status"] == "OK" and stats["filas"] == 30
+
+def test_feed_recoge_manifests_publicados_tarde(s3, barras):
+    df = barras(30)
+    manifest(s3, "20250701220000000000", [entrada(s3, "AAA", df.iloc[:10])])
+    entradas, ultima, aplicadas = upd.leer_cambios({})
+    cursor = {"ultima_clave": ultima, "aplicadas": aplicadas, "pendientes": {}}
+
+    # Invocacion solapada: su clave es anterior a la ultima consumida pero aparece despues
+    manifest(s3, "20250701215500000000", [entrada(s3, "BBB", df.iloc[10:20])])
+    manifest(s3, "20250701223000000000", [entrada(s3, "CCC", df.iloc[20:])])
+    entradas, ultima, aplicadas = upd.leer_cambios(cursor)
+    assert sorted(entradas) == ["BBB", "CCC"]
+    assert ultima.endswith("20250701223000000000_x.json")
+
+    # Nada se aplica dos veces
+    cursor = {"ultima_clave": ultima, "aplicadas": aplicadas, "pendientes": {}}
+    assert upd.leer_cambios(cursor)[0] == {}
+
+def test_cursor_con_pendientes_de_una_sola_entrada(s3, barras):
+    previa = entrada(s3, "AAA", barras(5))
+    entradas, _, _ = upd.leer_cambios({"ultima_clave": "", "pendientes": {"AAA": previa}})
+    assert entradas == {"AAA": [previa]}
+
+def publicar_parquet(s3, simbolo, df):
+    # Como guardar_parquet_s3 de la Lambda: fecha date32 y volumen float64 (puede ser fraccionario)
+    clave = f"{upd.S3_CSV_PATH}/{simbolo}/{df['fecha'].min()}_{df['fecha'].max()}.parquet"
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False)
+    s3.put_object(Bucket=None, Key=clave, Body=buffer.getvalue())
+    return clave
+
+def test_formato_segun_la_clave(s3, almacen, barras):
+    df = barras(30)
+    df["volume"] += 0.25
+    publicar(s3, "AAA", df.iloc[:10])
+    publicar_parquet(s3, "AAA", df.iloc[10:20])
+    # Por el feed tambien: la extension de la clave decide el parser
+    entradas = [{"simbolo": "AAA", "key": publicar_parquet(s3, "AAA", df.iloc[20:]), "version": None}]
+
+    assert upd.procesar_simbolo("AAA", entradas)["filas"] == 10
+    assert upd.procesar_simbolo("AAA")["filas"] == 20
+    guardado = historico.load_history("AAA")
+    assert guardado["volume"].tolist() == pytest.approx(df["volume"].tolist())
@@ -1,32 +1,50 @@
 # con este script se consolidan los historicos en el disco local de la instancia vm01 (AWS EC2)
 import os
+import json
+import time
 import boto3
+import argparse
+import threading
 import pandas as pd
-from io import StringIO
-from datetime import datetime
-from pathlib import Path
+from io import StringIO, BytesIO
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import sys
+
+sys.path.append("/home/ubuntu/tr")
+from my_modules import historico
+from my_modules.logs_async import configurar, salida_archivo
+from my_modules.panel_reciente import PanelReciente, actualizar_panel
+from my_modules.ultimas_barras import actualizar_ultimas
 
 # === CONFIGURACION ===
 BUCKET_NAME = "bucket-name"
 S3_CONFIG_PATH = "config/symbol_groups.json"
 LOCAL_CONFIG_PATH = "/home/ubuntu/tr/config/symbol_groups.json"
-S3_CSV_PATH = "data/historic"
-LOCAL_PARQUET_PATH = "/home/ubuntu/tr/data/historic"
-RECORTE_PARQUET_PATH = "/home/ubuntu/tr/data/historic_reciente"
+S3_CSV_PATH = "data/historic"          # deltas de la Lambda: <SIMBOLO>/<desde>_<hasta>.<ext>
+EXTENSIONES = (".csv", ".parquet")     # formatos de la Lambda (OUTPUT_FORMAT); se parsea segun la clave
 LOG_DIR = "/home/ubuntu/tr/logs/ing"
 LOG_FILE = f"{LOG_DIR}/upd_{datetime.now().date()}.csv"
-NUM_DIAS = 60
+NUM_DIAS = 60                          # barras por simbolo en el panel reciente
+NUM_ULTIMAS = 5                        # barras por simbolo en el indice de ultimas barras
+S3_CAMBIOS_PATH = "data/cambios"        # feed de cambios publicado por la Lambda
+CURSOR_PATH = "/home/ubuntu/tr/config/cursor_cambios.json"
+VENTANA_CAMBIOS = timedelta(minutes=30)  # solape al releer el feed: manifests de invocaciones que publican tarde
+WORKERS_S3 = 16                        # descargas concurrentes
+WORKERS_CPU = max(1, (os.cpu_count() or 2) - 1)
+LOTE_CPU = 8                           # simbolos por tarea enviada al pool de procesos
 
 # === CLIENTES AWS ===
 s3 = boto3.client("s3")
 
 # === LOGGING ===
+# Escritura por lotes desde un hilo (my_modules/logs_async.py), tambien desde los workers
+eventos = configurar("upd", [salida_archivo(LOG_FILE, columnas=["ts", "simbolo", "status", "mensaje", "filas"])])
+
 def log_event(simbolo, status, mensaje, filas_agregadas):
+    eventos.info(mensaje, extra={"campos": {"simbolo": simbolo, "status": status, "filas": filas_agregadas}})
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    linea = f"{ts},{simbolo},{status},{mensaje},{filas_agregadas}\n"
-    with open(LOG_FILE, "a") as f:
-        f.write(linea)
-    print(linea.strip())
+    print(f"{ts},{simbolo},{status},{mensaje},{filas_agregadas}")
 
 # === UTILIDADES ===
 def convertir_fecha(df):
@@ -35,58 +53,256 @@ def convertir_fecha(df):
         df.drop(columns=["datetime"], inplace=True)
     return df
 
-def cargar_parquet_local(simbolo):
-    path = Path(f"{LOCAL_PARQUET_PATH}/{simbolo}.parquet")
-    if path.exists():
-        return pd.read_parquet(path)
-    else:
-        return pd.DataFrame()
+def listar_deltas(simbolo):
+    # Todos los deltas publicados para el simbolo, del mas antiguo al mas reciente
+    objetos = []
+    paginador = s3.get_paginator("list_objects_v2")
+    for pagina in paginador.paginate(Bucket=BUCKET_NAME, Prefix=f"{S3_CSV_PATH}/{simbolo}/"):
+        objetos.extend(obj for obj in pagina.get("Contents", []) if obj["Key"].endswith(EXTENSIONES))
+    return [obj["Key"] for obj in sorted(objetos, key=lambda o: (o["LastModified"], o["Key"]))]
 
-def guardar_parquet_local(simbolo, df):
-    df = df.sort_values("fecha").drop_duplicates("fecha")
-    df.to_parquet(f"{LOCAL_PARQUET_PATH}/{simbolo}.parquet", index=False)
+def descargar_bytes(simbolo, entradas=None):
+    """
+    Devuelve la lista de (clave, contenido) a fusionar. Con entradas del feed se
+    descarga exactamente cada version publicada, en orden; sin ellas, todos los
+    deltas del simbolo.
+    """
+    if entradas:
+        contenidos = []
+        for entrada in entradas:
+            params = {"Bucket": BUCKET_NAME, "Key": entrada["key"]}
+            if entrada.get("version"):
+                params["VersionId"] = entrada["version"]
+            contenidos.append((entrada["key"], s3.get_object(**params)["Body"].read()))
+        return contenidos
+    return [(clave, s3.get_object(Bucket=BUCKET_NAME, Key=clave)["Body"].read()) for clave in listar_deltas(simbolo)]
 
-def guardar_recorte(simbolo, df):
-    df = df.sort_values("fecha").drop_duplicates("fecha").tail(NUM_DIAS)
-    os.makedirs(RECORTE_PARQUET_PATH, exist_ok=True)
-    df.to_parquet(f"{RECORTE_PARQUET_PATH}/{simbolo}.parquet", index=False)
+def parsear_reciente(clave, contenido):
+    # El parquet de la Lambda ya trae 'fecha' como date32 y precios float64: sin parseo de texto
+    if clave.endswith(".parquet"):
+        return pd.read_parquet(BytesIO(contenido))
+    if not clave.endswith(".csv"):
+        raise ValueError(f"formato desconocido: {clave}")
+    df_csv = pd.read_csv(StringIO(contenido.decode("utf-8")))
+    return convertir_fecha(df_csv)
+
+def parsear_deltas(contenidos):
+    # Si dos deltas repiten fecha gana el mas reciente
+    partes = [parsear_reciente(clave, contenido) for clave, contenido in contenidos]
+    if len(partes) == 1:
+        return partes[0]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    if "fecha" in df.columns:
+        df = df.drop_duplicates("fecha", keep="last").sort_values("fecha").reset_index(drop=True)
+    return df
+
+def descargar_reciente(simbolo):
+    return parsear_deltas(descargar_bytes(simbolo))
 
 # === PROCESAR SIMBOLO ===
-def procesar_simbolo(simbolo):
+def fusionar_simbolo(simbolo, contenidos):
+    # Parseo + merge + escritura de los deltas ya descargados de un simbolo. Devuelve metricas por fase.
+    stats = {"simbolo": simbolo, "status": "ERROR", "filas": 0, "bytes_out": 0,
+             "t_parse": 0.0, "t_merge": 0.0, "t_write": 0.0}
+    if not contenidos:
+        stats["status"] = "SKIP"
+        log_event(simbolo, "SKIP", "Sin deltas publicados", 0)
+        return stats
     try:
-        # Descargar .csv reciente desde S3
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=f"{S3_CSV_PATH}/{simbolo}.csv")
-        df_csv = pd.read_csv(StringIO(obj["Body"].read().decode("utf-8")))
-        df_csv = convertir_fecha(df_csv)
+        t0 = time.perf_counter()
+        df_csv = parsear_deltas(contenidos)
+        stats["t_parse"] = time.perf_counter() - t0
 
         if "fecha" not in df_csv.columns or df_csv.empty:
             log_event(simbolo, "ERROR", "CSV sin columna 'fecha' o vacio", 0)
-            return
+            return stats
 
-        df_parquet = cargar_parquet_local(simbolo)
-        fechas_existentes = set(df_parquet["fecha"]) if not df_parquet.empty else set()
+        t0 = time.perf_counter()
+        # Solo se leen las particiones que solapan las fechas descargadas
+        fechas_existentes = historico.fechas_existentes(simbolo, df_csv["fecha"].min(), df_csv["fecha"].max())
 
         # Filtrar solo fechas nuevas
         df_nuevo = df_csv[~df_csv["fecha"].isin(fechas_existentes)]
 
         if df_nuevo.empty:
+            stats["t_merge"] = time.perf_counter() - t0
+            stats["status"] = "SKIP"
             log_event(simbolo, "SKIP", "Sin fechas nuevas", 0)
-            return
+            return stats
+        stats["t_merge"] = time.perf_counter() - t0
 
-        # Merge y guardar historico completo
-        df_combined = pd.concat([df_parquet, df_nuevo], ignore_index=True)
-        df_combined = df_combined.sort_values("fecha").drop_duplicates("fecha")
-
-        guardar_parquet_local(simbolo, df_combined)
-        guardar_recorte(simbolo, df_combined)
+        # Append de una particion pequeña en lugar de reescribir el historico completo
+        t0 = time.perf_counter()
+        rutas = historico.append_bars(simbolo, df_nuevo)
+        stats["t_write"] = time.perf_counter() - t0
+        stats["bytes_out"] = sum(os.path.getsize(p) for p in rutas)
 
+        stats["status"] = "OK"
+        stats["filas"] = len(df_nuevo)
         log_event(simbolo, "OK", "Actualizacion exitosa", len(df_nuevo))
 
     except Exception as e:
         log_event(simbolo, "ERROR", str(e), 0)
+    return stats
+
+def fusionar_lote(lote):
+    # Unidad de trabajo del pool de procesos: varios simbolos por envio para amortizar el IPC
+    return [fusionar_simbolo(simbolo, contenidos) for simbolo, contenidos in lote]
+
+def procesar_simbolo(simbolo, entradas=None):
+    try:
+        # Descargar barras recientes desde S3
+        t0 = time.perf_counter()
+        contenidos = descargar_bytes(simbolo, entradas)
+        t_s3 = time.perf_counter() - t0
+    except Exception as e:
+        log_event(simbolo, "ERROR", str(e), 0)
+        return None
+    stats = fusionar_simbolo(simbolo, contenidos)
+    stats["t_s3"] = t_s3
+    stats["bytes_in"] = sum(len(c) for _, c in contenidos)
+    return stats
+
+# === FEED DE CAMBIOS ===
+def cargar_cursor():
+    if not os.path.exists(CURSOR_PATH):
+        return {"ultima_clave": "", "aplicadas": [], "pendientes": {}}
+    with open(CURSOR_PATH, "r") as f:
+        return json.load(f)
+
+def guardar_cursor(cursor):
+    tmp = f"{CURSOR_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cursor, f, indent=2)
+    os.replace(tmp, CURSOR_PATH)
+
+def _inicio_ventana(clave):
+    # Los manifests se llaman <prefix>/<AAAAMMDDHHMMSSffffff>_<id>.json: se relee desde
+    # VENTANA_CAMBIOS antes de la ultima clave consumida
+    try:
+        sello = datetime.strptime(clave.rsplit("/", 1)[-1][:20], "%Y%m%d%H%M%S%f")
+    except ValueError:
+        return clave
+    return f"{S3_CAMBIOS_PATH}/{(sello - VENTANA_CAMBIOS).strftime('%Y%m%d%H%M%S%f')}"
+
+def _clave_entrada(entrada):
+    return entrada["key"], entrada.get("version")
+
+def leer_cambios(cursor):
+    """
+    Lee los manifests publicados desde VENTANA_CAMBIOS antes de cursor["ultima_clave"]
+    y devuelve (entradas por simbolo en orden de publicacion, ultima clave leida,
+    claves aplicadas dentro de la ventana). Un manifest de una invocacion solapada
+    que aparece tarde con una clave anterior se recoge en la siguiente pasada; los
+    ya aplicados (cursor["aplicadas"]) no se releen. Las entradas que fallaron en la
+    ejecucion anterior (cursor["pendientes"]) se reintentan primero.
+    """
+    entradas = {}
+    for simbolo, previas in cursor.get("pendientes", {}).items():
+        # Cursores antiguos guardaban una sola entrada por simbolo
+        entradas[simbolo] = list(previas) if isinstance(previas, list) else [previas]
+    aplicadas = set(cursor.get("aplicadas", []))
+    ultima = cursor.get("ultima_clave", "")
+    paginador = s3.get_paginator("list_objects_v2")
+    params = {"Bucket": BUCKET_NAME, "Prefix": f"{S3_CAMBIOS_PATH}/"}
+    if ultima:
+        params["StartAfter"] = _inicio_ventana(ultima)
+    claves = []
+    for pagina in paginador.paginate(**params):
+        claves.extend(obj["Key"] for obj in pagina.get("Contents", []))
+    for clave in sorted(claves):
+        if clave in aplicadas or (ultima and clave == ultima):
+            continue
+        manifest = json.loads(s3.get_object(Bucket=BUCKET_NAME, Key=clave)["Body"].read())
+        for entrada in manifest.get("entradas", []):
+            lista = entradas.setdefault(entrada["simbolo"], [])
+            if _clave_entrada(entrada) not in {_clave_entrada(e) for e in lista}:
+                lista.append(entrada)
+        aplicadas.add(clave)
+        ultima = max(ultima, clave)
+    # Solo hace falta recordar las claves que la proxima lectura volvera a listar
+    inicio = _inicio_ventana(ultima) if ultima else ""
+    return entradas, ultima, sorted(c for c in aplicadas if c > inicio)
+
+# === PIPELINE ===
+def ejecutar_serial(simbolos, entradas=None):
+    entradas = entradas or {}
+    return [s for s in (procesar_simbolo(simbolo, entradas.get(simbolo)) for simbolo in simbolos) if s is not None]
+
+def ejecutar_pipeline(simbolos, workers_s3=WORKERS_S3, workers_cpu=WORKERS_CPU, lote=LOTE_CPU, entradas=None):
+    """
+    Descargas S3 en un pool de hilos solapadas con merge/escritura en un pool de procesos.
+    Los simbolos descargados pendientes de procesar estan acotados para limitar memoria.
+    """
+    en_vuelo = threading.BoundedSemaphore(lote * (workers_cpu + 2))
+    entradas = entradas or {}
+    resultados = []
+    descargas_info = {}
+
+    def descargar(simbolo):
+        en_vuelo.acquire()
+        t0 = time.perf_counter()
+        try:
+            return simbolo, descargar_bytes(simbolo, entradas.get(simbolo)), None, time.perf_counter() - t0
+        except Exception as e:
+            return simbolo, None, e, time.perf_counter() - t0
+
+    def liberar(n):
+        return lambda _: [en_vuelo.release() for _ in range(n)]
+
+    with ThreadPoolExecutor(max_workers=workers_s3) as io_pool, \
+         ProcessPoolExecutor(max_workers=workers_cpu) as cpu_pool:
+        futuros_cpu = []
+        buffer = []
+        for futuro in as_completed([io_pool.submit(descargar, s) for s in simbolos]):
+            simbolo, contenidos, error, t_s3 = futuro.result()
+            if error is not None:
+                en_vuelo.release()
+                log_event(simbolo, "ERROR", str(error), 0)
+                continue
+            descargas_info[simbolo] = (t_s3, sum(len(c) for _, c in contenidos))
+            buffer.append((simbolo, contenidos))
+            if len(buffer) >= lote:
+                f = cpu_pool.submit(fusionar_lote, buffer)
+                f.add_done_callback(liberar(len(buffer)))
+                futuros_cpu.append(f)
+                buffer = []
+        if buffer:
+            f = cpu_pool.submit(fusionar_lote, buffer)
+            f.add_done_callback(liberar(len(buffer)))
+            futuros_cpu.append(f)
+
+        for f in futuros_cpu:
+            resultados.extend(f.result())
+
+    for stats in resultados:
+        stats["t_s3"], stats["bytes_in"] = descargas_info[stats["simbolo"]]
+    return resultados
+
+def resumen_throughput(resultados, duracion):
+    n = len(resultados)
+    total = lambda k: sum(r.get(k, 0) for r in resultados)
+    estados = {s: sum(1 for r in resultados if r["status"] == s) for s in ["OK", "SKIP", "ERROR"]}
+    return (f"{n} simbolos en {duracion:.1f}s ({n / duracion if duracion else 0:.1f} simb/s) - "
+            f"OK {estados['OK']} SKIP {estados['SKIP']} ERROR {estados['ERROR']} - "
+            f"in {total('bytes_in') / 1e6:.1f}MB out {total('bytes_out') / 1e6:.1f}MB - "
+            f"s3 {total('t_s3'):.1f}s parse {total('t_parse'):.1f}s merge {total('t_merge'):.1f}s "
+            f"write {total('t_write'):.1f}s")
 
 # === MAIN ===
 def main():
+    parser = argparse.ArgumentParser(description="Consolidacion de historicos desde S3")
+    parser.add_argument("--modo", choices=["serial", "pipeline"], default="serial")
+    parser.add_argument("--workers-s3", type=int, default=WORKERS_S3)
+    parser.add_argument("--workers-cpu", type=int, default=WORKERS_CPU)
+    parser.add_argument("--lote", type=int, default=LOTE_CPU, help="simbolos por tarea del pool de procesos")
+    parser.add_argument("--compactar", action="store_true", help="compacta las particiones anuales al terminar")
+    parser.add_argument("--fuente", choices=["cambios", "completo"], default="cambios",
+                        help="cambios: solo el feed publicado por la Lambda; completo: todos los deltas de todo el universo")
+    args = parser.parse_args()
+
     os.makedirs(LOG_DIR, exist_ok=True)
     try:
         obj = s3.get_object(Bucket=BUCKET_NAME, Key=S3_CONFIG_PATH)
@@ -96,10 +312,48 @@ def main():
             f.write(simbolos_json)
 
         grupos = pd.read_json(StringIO(simbolos_json))
-        simbolos = sorted(set(sum(grupos.values.tolist(), [])))
+        universo = sorted(set(sum(grupos.values.tolist(), [])))
+
+        if args.fuente == "cambios":
+            # Solo los simbolos que la Lambda escribio desde la ultima ejecucion
+            cursor = cargar_cursor()
+            entradas, ultima_clave, aplicadas = leer_cambios(cursor)
+            simbolos = sorted(entradas)
+            log_event("GLOBAL", "INFO", f"Feed de cambios: {len(simbolos)} simbolos nuevos de {len(universo)}", 0)
+        else:
+            entradas, simbolos = {}, universo
+
+        inicio = time.perf_counter()
+        if args.modo == "pipeline":
+            resultados = ejecutar_pipeline(simbolos, args.workers_s3, args.workers_cpu, args.lote, entradas)
+        else:
+            resultados = ejecutar_serial(simbolos, entradas)
+        log_event("GLOBAL", "RESUMEN", resumen_throughput(resultados, time.perf_counter() - inicio),
+                  sum(r["filas"] for r in resultados))
+
+        # Panel reciente: solo se releen los simbolos con barras nuevas
+        t0 = time.perf_counter()
+        cambiados = [r["simbolo"] for r in resultados if r["status"] == "OK"]
+        n_panel = actualizar_panel(universo, cambiados, NUM_DIAS)
+        log_event("GLOBAL", "PANEL", f"Panel reciente con {n_panel} simbolos ({len(cambiados)} actualizados) en {time.perf_counter() - t0:.1f}s", 0)
+
+        # Indice de ultimas barras (ultima cotizacion en O(1)) a partir del panel recien escrito
+        t0 = time.perf_counter()
+        n_ultimas = actualizar_ultimas(universo, PanelReciente(), NUM_ULTIMAS)
+        log_event("GLOBAL", "ULTIMAS", f"Indice de ultimas barras con {n_ultimas} simbolos en {time.perf_counter() - t0:.1f}s", 0)
+
+        if args.fuente == "cambios":
+            procesados = {r["simbolo"] for r in resultados if r["status"] != "ERROR"}
+            guardar_cursor({
+                "ultima_clave": ultima_clave,
+                "aplicadas": aplicadas,
+                "pendientes": {s: e for s, e in entradas.items() if s not in procesados},
+                "actualizado": datetime.now().isoformat()
+            })
 
-        for simbolo in simbolos:
-            procesar_simbolo(simbolo)
+        if args.compactar:
+            compactados = sum(historico.compactar(simbolo) for simbolo in universo)
+            log_event("GLOBAL", "COMPACTAR", f"{compactados} particiones anuales compactadas", 0)
 
     except Exception as e:
         log_event("GLOBAL", "ERROR", f"No se pudo iniciar: {e}", 0)